@@ -1,3 +1,7 @@
 """Simplify imports."""
 
-from .appclassdoc import generate_appclassdoc
+from .appclassdoc import (DependencyGraph, ModelDatabase, check_appclassdoc,
+                          diff_appclassdoc, generate_appclassdoc,
+                          impact_appclassdoc, merge_appclassdoc,
+                          serve_appclassdoc, shard_appclassdoc,
+                          versions_appclassdoc)
@@ -6,19 +6,44 @@ Inspired by Javadoc.
 # pylint: disable=not-callable
 
 import argparse
+import cProfile
+import fnmatch
 import glob
+import hashlib
+import itertools
+import json
 import logging
+import mimetypes
+import multiprocessing
 import os
 import os.path
+import pickle
+import pstats
+import queue
 import re
 import shutil
+import sqlite3
+import statistics
+import subprocess
 import sys
+import tarfile
+import tempfile
+import threading
 import time
-from collections import defaultdict, namedtuple
+import traceback
+import zipfile
+import zlib
+from collections import OrderedDict, defaultdict, namedtuple
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from multiprocessing.connection import wait
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote, urlsplit
 
-from antlr4 import CommonTokenStream, FileStream
+from antlr4 import CommonTokenStream, InputStream, ParserRuleContext, Token
+from antlr4.error.ErrorListener import ErrorListener
 
 from lxml import etree
 
@@ -28,15 +53,142 @@ from peoplecodeparser.PeopleCodeParserVisitor import PeopleCodeParserVisitor
 
 from pkg_resources import resource_filename, resource_stream
 
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
 # GLOBAL VARIABLES
 _verbose = False
+_report_memory = False
+_last_peak_rss = 0.0
+_tracer = None
+_profiler = None
 _logger = logging.getLogger('appclassdoc')
 _re_api = re.compile(r'/\*\*+\s*(.+)\s*\*+/', flags=re.DOTALL)
+_manifest_file = 'build-manifest.json'
+_manifest_format = 1
+_shard_file = 'shard.pkl'
+_shard_format = 6
+_graph_file = 'dependency-graph.json'
+_tree_file = 'overview-tree.html'
+_package_tree_file = 'package-tree.html'
+_source_dir = 'src-html'
+_graph_format = 1
+_profile_file = 'appclassdoc.prof'
+_collapsed_stacks_file = 'appclassdoc.collapsed'
+_min_stack_share = 0.0001
+_profile_names = re.compile(
+    r'(?:(?:scan|parse|resolve|clean|render|indexes|write)(?:-\d+)?'
+    r'|worker-\d+)\.prof(?:\.tmp)?')
+_database_format = 2
+_store_dir = '.store'
+_pretty_print = True
+_resource_manifest_file = 'resource-manifest.json'
+_re_hashed_name = re.compile(r'\.[0-9a-f]{10}(\.[^./]+)$')
+_re_css_url = re.compile(r'url\((\'|"?)([^\'")?#]+)([^\'")]*)\1\)')
+_compressible_extensions = ('.html', '.css', '.js', '.svg', '.txt', '.xml',
+                            '.json')
+_output_formats = ('html', 'stubs', 'source')
+_archive_extensions = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2',
+                       '.tar.xz', '.txz')
+_archive_separator = '!/'
+_archive_lock = threading.Lock()
+_open_archives = OrderedDict()
+_max_open_archives = 8
+_max_syntax_errors = 20
+_source_escapes = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;',
+                                 '\r': None})
+_source_token_classes = {
+    **{token_type: 'keyword'
+       for token_type in range(PeopleCodeLexer.ABSTRACT,
+                               PeopleCodeLexer.METADATA + 1)},
+    **{getattr(PeopleCodeLexer, name): None
+       for name in ('ADD', 'AT', 'COLON', 'COMMA', 'DIV', 'DOT', 'EQ', 'EXP',
+                    'GE', 'GT', 'LBRACKET', 'LE', 'LPAREN', 'LT', 'NEQ',
+                    'PIPE', 'RBRACKET', 'RPAREN', 'SEMI', 'STAR', 'SUBTR')},
+    **{getattr(PeopleCodeLexer, name): 'comment'
+       for name in ('BLOCK_COMMENT_SLASH', 'BLOCK_COMMENT_NEST',
+                    'BLOCK_COMMENT_PLUS', 'LINE_COMMENT')},
+    PeopleCodeLexer.API_COMMENT: 'apiComment',
+    **{getattr(PeopleCodeLexer, name): 'directive'
+       for name in ('DIR_IF', 'DIR_ELSE', 'DIR_END_IF', 'DIR_THEN',
+                    'DIR_ATOM')},
+    **{getattr(PeopleCodeLexer, name): 'literal'
+       for name in ('DecimalLiteral', 'IntegerLiteral', 'StringLiteral',
+                    'BooleanLiteral')},
+    **{getattr(PeopleCodeLexer, name): 'system'
+       for name in ('SYSTEM_VARIABLE', 'SYSTEM_CONSTANT', 'SUPER')},
+    PeopleCodeLexer.USER_VARIABLE: 'variable'}
+_metrics_channels = (Token.DEFAULT_CHANNEL, PeopleCodeLexer.DIRECTIVES)
+_metrics_branches = (
+    PeopleCodeParser.IfStatementContext, PeopleCodeParser.ForStatementContext,
+    PeopleCodeParser.WhileStatementContext,
+    PeopleCodeParser.RepeatStatementContext,
+    PeopleCodeParser.WhenClauseContext, PeopleCodeParser.CatchClauseContext,
+    PeopleCodeParser.AndOrExprContext)
+_metrics_blocks = (
+    PeopleCodeParser.IfStatementContext, PeopleCodeParser.ForStatementContext,
+    PeopleCodeParser.WhileStatementContext,
+    PeopleCodeParser.RepeatStatementContext,
+    PeopleCodeParser.EvaluateStatementContext,
+    PeopleCodeParser.TryCatchBlockContext)
 
 
 # MODEL
 SuperclassIndexItem = namedtuple('SuperclassIndexItem', ['fqcn', 'superclass'])
+ParseResult = namedtuple('ParseResult', ['file_path', 'app_class', 'error',
+                                         'elapsed', 'diagnostics'])
+Diagnostic = namedtuple('Diagnostic', ['file_path', 'line', 'column',
+                                       'message', 'phase'])
+TypeUsage = namedtuple('TypeUsage', ['package', 'name', 'member', 'role',
+                                     'anchor'])
+QuarantineItem = namedtuple('QuarantineItem', ['file_path', 'reason',
+                                               'elapsed', 'error'])
+SiteUpdate = namedtuple('SiteUpdate', ['classes', 'packages', 'removed'])
+BrokenLink = namedtuple('BrokenLink', ['page', 'target', 'reason'])
+
+
+class Metrics(namedtuple('Metrics', ['loc', 'statements', 'complexity',
+                                     'nesting', 'throws'])):
+    """The metrics of a method, getter or setter implementation.
+
+    loc is the number of lines with code, statements the number of
+    statements (nested ones included), complexity the cyclomatic
+    complexity, nesting the maximum depth of nested control structures
+    and throws the number of throw statements.
+    """
+
+    __slots__ = ()
+
+    def get_xml(self):
+        """Return an XML representation of the metrics."""
+        return etree.Element('metrics', {field: str(value) for field, value
+                                         in zip(self._fields, self)})
+
+
+def _fingerprint(*parts):
+    """Return a stable fingerprint for a sequence of JSON-friendly parts."""
+    data = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def _add_member_blocks(lines, *blocks):
+    """Add the non-empty blocks of members to lines, a blank line apart."""
+    first = True
+    for block in blocks:
+        if block:
+            if not first:
+                lines.append('')
+            for member in block:
+                lines.append(f'   {member}')
+            first = False
 
 
 class Scope(Enum):
@@ -47,24 +199,79 @@ class Scope(Enum):
     PRIVATE = 'private'
 
 
+class Package(tuple):
+    """An interned Application Package, as a tuple of its parts.
+
+    Creating a Package returns the shared instance for the given parts,
+    so that the classes and types of a package all refer to the same
+    tuple. The package name and the fully qualified names of the
+    classes in the package are computed once and cached. The registry
+    is shared by all threads, and emptied by AppClass.reset_indexes.
+    """
+
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, parts=()):
+        """Return the shared instance for the given parts."""
+        if type(parts) is cls:
+            return parts
+        parts = tuple(parts)
+        package = cls._instances.get(parts)
+        if package is None:
+            with cls._lock:
+                package = cls._instances.get(parts)
+                if package is None:
+                    package = super().__new__(cls, map(sys.intern, parts))
+                    package.name = sys.intern(':'.join(package))
+                    package._fqcns = {}
+                    cls._instances[parts] = package
+        return package
+
+    def __reduce__(self):
+        """Intern the package again when unpickled."""
+        return Package, (tuple(self),)
+
+    def fqcn(self, name):
+        """Return the fully qualified name of a class in the package."""
+        try:
+            return self._fqcns[name]
+        except KeyError:
+            fqcn = sys.intern(f'{self.name}:{name}' if self else name)
+            with Package._lock:
+                return self._fqcns.setdefault(name, fqcn)
+
+    @classmethod
+    def clear(cls):
+        """Empty the registry of packages."""
+        with cls._lock:
+            cls._instances = {}
+
+
 class AppClass:
     """Representation of an Application Class for documentation purposes."""
 
     __slots__ = ('name', 'package', 'type', 'superclasses', 'subclasses',
                  'is_abstract', 'constructor', 'methods', 'properties',
-                 'constants', 'description')
+                 'constants', 'description', 'source_file', 'imports',
+                 'source')
     package_index = defaultdict(list)
     subclass_index = {}
+    symbol_table = None
+    usage_index = {}
+    dependency_graph = None
+    resource_names = {}
     xsl_class_index = None
     xsl_package_index = None
     xsl_package_overview = None
     xsl_class = None
+    xsl_api_diff = None
 
     def __init__(self, name, package, the_type='class', verb=None,
                  superclass=None):
         """Create a new Application Class object."""
         self.name = name
-        self.package = package
+        self.package = Package(package)
         self.type = the_type
         self.superclasses = []
         self.subclasses = []
@@ -74,17 +281,27 @@ class AppClass:
         self.properties = []
         self.constants = []
         self.description = None
+        self.source_file = None
+        self.imports = []
+        self.source = None
 
         if verb and superclass:
             self.superclasses.append(Superclass(verb, superclass))
+
+    def register(self):
+        """Add the Application Class to the class-level indexes.
+
+        This is kept separate from object creation so that classes
+        parsed in worker processes can be indexed by the parent.
+        """
+        superclass = self.superclass
+        if superclass:
+            descr = ClassDescr(self.package, self.name, self.type)
             try:
-                descr = ClassDescr(package, name, the_type)
-                AppClass.subclass_index[superclass].append(descr)
+                AppClass.subclass_index[superclass.fqcn].append(descr)
             except KeyError:
-                AppClass.subclass_index[superclass] = [ClassDescr(package,
-                                                                  name,
-                                                                  the_type)]
-        descr = ClassDescr(None, name, the_type)
+                AppClass.subclass_index[superclass.fqcn] = [descr]
+        descr = ClassDescr(None, self.name, self.type)
         AppClass.package_index[self.package_name].append(descr)
 
     def is_same_as(self, app_class):
@@ -103,7 +320,7 @@ class AppClass:
     @property
     def package_name(self):
         """Return the package name as a concatenated string."""
-        return ':'.join(self.package)
+        return self.package.name
 
     @property
     def superclass(self):
@@ -116,7 +333,7 @@ class AppClass:
     @property
     def fqcn(self):
         """Return the fully qualified Application Class name."""
-        return f'{self.package_name}:{self.name}'
+        return self.package.fqcn(self.name)
 
     def find_method(self, name):
         """Find a method by name."""
@@ -135,11 +352,77 @@ class AppClass:
         self.constants.sort(key=lambda member: member.name.lower())
         self.subclasses.sort(key=lambda c: c.sort_key.lower())
 
+    def get_type_usages(self):
+        """Generate the Application Class types used by the members.
+
+        Yields tuples with the lowercase fully qualified name of the
+        type and a TypeUsage describing where it is used.
+        """
+        package = self.package
+        members = []
+        if self.constructor:
+            members.append((self.constructor, 'rDetail'))
+        members.extend((m, f'm{m.name}') for m in self.methods)
+        for member, anchor in members:
+            if member.type and member.type.package:
+                yield (member.type.fqcn.lower(),
+                       TypeUsage(package, self.name, member.name,
+                                 'return', anchor))
+            for arg in member.args or []:
+                if arg.type.package:
+                    yield (arg.type.fqcn.lower(),
+                           TypeUsage(package, self.name, member.name,
+                                     'argument', anchor))
+        for prop in self.properties:
+            if prop.type.package:
+                if prop.is_private:
+                    anchor = f'i{prop.name[1:]}'
+                else:
+                    anchor = f'p{prop.name}'
+                yield (prop.type.fqcn.lower(),
+                       TypeUsage(package, self.name, prop.name,
+                                 'property', anchor))
+
+    def get_manifest_entry(self):
+        """Return the fingerprints of the class and its members.
+
+        The declaration fingerprint covers the class type, abstractness,
+        superclass and description, whereas the overall fingerprint also
+        covers the fingerprints of every member.
+        """
+        superclass = self.superclass
+        declaration = _fingerprint(
+            self.type, self.is_abstract,
+            [superclass.verb, superclass.fqcn] if superclass else None,
+            Description.canonical_of(self.description))
+        members = {}
+        if self.constructor:
+            members['constructor'] = self.constructor.get_manifest_entry()
+        for const in self.constants:
+            members[f'constant:{const.name}'] = const.get_manifest_entry()
+        for prop in self.properties:
+            members[f'property:{prop.name}'] = prop.get_manifest_entry()
+        for method in self.methods:
+            members[f'method:{method.name}'] = method.get_manifest_entry()
+        fingerprint = _fingerprint(declaration,
+                                   sorted((key, member['fingerprint'])
+                                          for key, member in members.items()))
+        return {'type': self.type,
+                'fingerprint': fingerprint,
+                'declaration': declaration,
+                'members': members}
+
     def get_xml(self):
-        """Return an XML representation of the Application Class."""
+        """Return an XML representation of the Application Class.
+
+        If the class has a source page, the implementations of its
+        members are referenced by line number.
+        """
         node = etree.Element('class', type=self.type)
         if self.is_abstract:
             node.set('abstract', 'true')
+        if self.source:
+            node.set('source', 'true')
         level = str(len(self.package))
         etree.SubElement(node, 'package', level=level).text = self.package_name
         etree.SubElement(node, 'name').text = self.name
@@ -151,12 +434,54 @@ class AppClass:
             subs = etree.SubElement(node, 'subclasses')
             for sub in self.subclasses:
                 sc = etree.SubElement(subs, 'subclass', type=sub.type)
-                etree.SubElement(sc, 'package').text = ':'.join(sub.package)
+                etree.SubElement(sc, 'package').text = sub.package.name
                 etree.SubElement(sc, 'name').text = sub.name
+        usages = AppClass.usage_index.get(self.fqcn.lower())
+        if usages:
+            usages_node = etree.SubElement(node, 'usages')
+            for usage in usages:
+                u_node = etree.SubElement(usages_node, 'usage',
+                                          role=usage.role,
+                                          anchor=usage.anchor)
+                etree.SubElement(u_node, 'package').text = \
+                    usage.package.name
+                etree.SubElement(u_node, 'name').text = usage.name
+                etree.SubElement(u_node, 'member').text = usage.member
+        graph = AppClass.dependency_graph
+        if self.imports:
+            imports_node = etree.SubElement(node, 'imports')
+            for path in self.imports:
+                i_node = etree.SubElement(imports_node, 'import', path=path)
+                key = path.lower()
+                if graph and key.endswith(':*') \
+                        and key[:-2] in graph.packages:
+                    i_node.set('kind', 'package')
+                    etree.SubElement(i_node, 'package').text = \
+                        graph.packages[key[:-2]]
+                elif graph and key in graph.names:
+                    package, name = graph.names[key].rsplit(':', 1)
+                    i_node.set('kind', 'class')
+                    etree.SubElement(i_node, 'package').text = package
+                    etree.SubElement(i_node, 'name').text = name
+                else:
+                    i_node.set('kind', 'external')
+        if graph and self.fqcn.lower() in graph.names:
+            importers = graph.get_importers(self.fqcn)
+        else:
+            importers = None
+        if importers:
+            importers_node = etree.SubElement(node, 'importers')
+            for fqcn in importers:
+                package, name = fqcn.rsplit(':', 1)
+                i_node = etree.SubElement(importers_node, 'importer')
+                etree.SubElement(i_node, 'package').text = package
+                etree.SubElement(i_node, 'name').text = name
         if self.description:
             node.append(self.description.get_xml(version=True, authors=True))
         if self.constructor:
-            node.append(self.constructor.get_xml(is_constructor=True))
+            node.append(self._set_line(
+                self.constructor.get_xml(is_constructor=True),
+                self.constructor.line))
         if self.constants:
             consts = etree.SubElement(node, 'constants')
             for const in self.constants:
@@ -168,9 +493,11 @@ class AppClass:
             for prop in self.properties:
                 props.append(prop.get_prop_xml())
                 if prop.is_get:
-                    getters.append(prop.get_get_set_xml(True))
+                    getters.append(self._set_line(prop.get_get_set_xml(True),
+                                                  prop.get_line))
                 if prop.is_set:
-                    setters.append(prop.get_get_set_xml(False))
+                    setters.append(self._set_line(
+                        prop.get_get_set_xml(False), prop.set_line))
         if getters:
             gets = etree.SubElement(node, 'getters')
             for gt in getters:
@@ -182,101 +509,146 @@ class AppClass:
         if self.methods:
             methods_node = etree.SubElement(node, 'methods')
             for method in self.methods:
-                methods_node.append(method.get_xml())
+                methods_node.append(self._set_line(method.get_xml(),
+                                                   method.line))
         return node
 
-    def get_html(self):
-        """Return an HTML representation of the Application Class."""
+    def _set_line(self, node, line):
+        """Set the line of a member's implementation on its XML node.
+
+        Lines are only set if the class has a source page to link to.
+        """
+        if self.source and line:
+            node.set('line', str(line))
+        return node
+
+    def get_html(self, xml=None):
+        """Return an HTML representation of the Application Class.
+
+        xml is the XML representation of the class, if already built.
+        """
         if AppClass.xsl_class is None:
             xslt_file = resource_stream(__name__, 'xslt/class.xsl')
             xslt = etree.parse(xslt_file)
             AppClass.xsl_class = etree.XSLT(xslt)
-        return AppClass.xsl_class(etree.ElementTree(self.get_xml()))
+        if xml is None:
+            xml = self.get_xml()
+        return AppClass.xsl_class(etree.ElementTree(xml),
+                                  **AppClass.get_resource_params())
 
-    def __str__(self):
-        """Return a string representation of the Application Class header."""
-        if self.type == 'interface':
-            public_methods = [member for member in self.methods
-                              if member.scope == 'public']
-            protected_methods = [member for member in self.methods
-                                 if member.scope == 'protected']
-            private_methods = [member for member in self.methods
-                               if member.scope == 'private']
-        else:
-            public_methods = [member for member in self.methods
-                              if member.scope == 'public']
-            protected_methods = [member for member in self.methods
-                                 if member.scope == 'protected']
-            private_methods = [member for member in self.methods
-                               if member.scope == 'private']
-        public_properties = [member for member in self.properties
-                             if member.scope == 'public']
-        protected_properties = [member for member in self.properties
-                                if member.scope == 'protected']
-        private_properties = [member for member in self.properties
-                              if member.scope == 'private']
-        out = f'package {self.package_name}\n\n'
+    def _group_members(self):
+        """Return the methods and properties grouped by scope.
+
+        Returns a dictionary of (methods, properties) tuples keyed by
+        scope, built in a single pass over each list.
+        """
+        groups = {'public': ([], []), 'protected': ([], []),
+                  'private': ([], [])}
+        for method in self.methods:
+            groups[method.scope][0].append(method)
+        for prop in self.properties:
+            groups[prop.scope][1].append(prop)
+        return groups
+
+    def _get_declaration(self):
+        """Return the declaration line of the Application Class."""
+        declaration = f'{self.type} {self.name}'
         if self.is_abstract:
-            out += 'abstract '
-        out += f'{self.type} {self.name}'
+            declaration = f'abstract {declaration}'
         if self.superclasses:
-            out += f' {self.superclasses[0].verb} {self.superclasses[0].fqcn}'
-        out += '\n'
-        if self.constructor and self.constructor.scope == 'public':
-            out += f'   {str(self.constructor)}\n'
-            if public_methods or public_properties:
-                out += '\n'
-        if public_methods:
-            for method in public_methods:
-                out += f'   {str(method)}\n'
-            if public_properties:
-                out += '\n'
-        if public_properties:
-            for prop in public_properties:
-                out += f'   {str(prop)}\n'
-        if ((self.constructor and self.constructor.scope == 'protected')
-                or protected_methods
-                or protected_properties):
-            if ((self.constructor and self.constructor.scope == 'public')
-                    or public_methods
-                    or public_properties):
-                out += '\n'
-            out += 'protected\n'
-            if self.constructor and self.constructor.scope == 'protected':
-                out += f'   {str(self.constructor)}\n'
-                if protected_methods or protected_properties:
-                    out += '\n'
-            if protected_methods or protected_properties:
-                for method in protected_methods:
-                    out += f'   {str(method)}\n'
-                if protected_properties:
-                    if protected_methods:
-                        out += '\n'
-                    for prop in protected_properties:
-                        out += f'   {str(prop)}\n'
+            superclass = self.superclasses[0]
+            declaration += f' {superclass.verb} {superclass.fqcn}'
+        return declaration
+
+    def get_stub(self):
+        """Return a PeopleCode stub of the Application Class.
+
+        The stub holds the imports and the class declaration, with every
+        member and API comment but no method bodies, and is built in a
+        single pass. It is meant to be saved under the same name as the
+        source file.
+        """
+        lines = [f'import {path};' for path in self.imports]
+        if lines:
+            lines.append('')
+        if self.description:
+            lines.extend(self.description.get_comment())
+        lines.append(self._get_declaration())
+        groups = self._group_members()
+        for scope, (methods, properties) in groups.items():
+            members = []
+            if self.constructor and self.constructor.scope == scope:
+                members.append(self.constructor)
+            members.extend(methods)
+            members.extend(properties)
+            if scope == 'private':
+                members.extend(self.constants)
+            if members and scope != 'public':
+                lines.append(scope)
+            for member in members:
+                if member.description:
+                    lines.extend(member.description.get_comment('   '))
+                lines.append(f'   {member};')
+        lines.append(f'end-{self.type};')
+        return '\n'.join(lines) + '\n'
+
+    def __str__(self):
+        """Return a string representation of the Application Class header."""
+        groups = self._group_members()
+        public_methods, public_properties = groups['public']
+        protected_methods, protected_properties = groups['protected']
+        private_methods, private_properties = groups['private']
+        constructor = self.constructor
+        lines = [f'package {self.package_name}', '',
+                 self._get_declaration()]
+        public_ctor = [constructor] if constructor \
+            and constructor.scope == 'public' else []
+        protected_ctor = [constructor] if constructor \
+            and constructor.scope == 'protected' else []
+        _add_member_blocks(lines, public_ctor, public_methods,
+                           public_properties)
+        if protected_ctor or protected_methods or protected_properties:
+            if public_ctor or public_methods or public_properties:
+                lines.append('')
+            lines.append('protected')
+            _add_member_blocks(lines, protected_ctor, protected_methods,
+                               protected_properties)
         if private_methods or private_properties:
-            if (self.constructor
-                    or public_methods
-                    or public_properties
-                    or protected_methods
-                    or protected_properties):
-                out += '\n'
-            out += 'private\n'
-            if private_methods or private_properties:
-                if private_methods:
-                    for method in private_methods:
-                        out += f'   {str(method)}\n'
-                    if private_properties or self.constants:
-                        out += '\n'
-                if private_properties:
-                    for prop in private_properties:
-                        out += f'   {str(prop)}\n'
-                    if self.constants:
-                        out += '\n'
-                if self.constants:
-                    for const in self.constants:
-                        out += f'   {str(const)}\n'
-        return out
+            if (constructor or public_methods or public_properties
+                    or protected_methods or protected_properties):
+                lines.append('')
+            lines.append('private')
+            _add_member_blocks(lines, private_methods, private_properties,
+                               self.constants)
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def reset_indexes(cls):
+        """Clear the class-level indexes.
+
+        The registries of packages and types are emptied as well, so
+        that those no longer used can be freed.
+        """
+        Package.clear()
+        Type.clear()
+        AppClass.package_index = defaultdict(list)
+        AppClass.subclass_index = {}
+        AppClass.symbol_table = None
+        AppClass.usage_index = {}
+        AppClass.dependency_graph = None
+        AppClass.resource_names = {}
+
+    @classmethod
+    def get_resource_params(cls):
+        """Return the XSLT parameters naming the linked resources.
+
+        Names are taken from resource_names, which maps the original
+        paths of fingerprinted resources to their hashed paths.
+        """
+        return {param: etree.XSLT.strparam(
+                    AppClass.resource_names.get(name, name))
+                for param, name in (('stylesheet', 'stylesheet.css'),
+                                    ('script', 'script.js'))}
 
     @classmethod
     def find_subclasses_by_fqcn(cls, fqcn):
@@ -286,6 +658,30 @@ class AppClass:
         except KeyError:
             return None
 
+    @classmethod
+    def build_cross_references(cls, symbols, usages, imports=None):
+        """Set up the symbol table, reverse type usage index and imports.
+
+        symbols is a dictionary of known classes keyed by lowercase
+        fully qualified name, and usages an iterable of (key, TypeUsage)
+        tuples as yielded by get_type_usages. Only usages of known
+        classes are indexed. imports is an iterable of (key, imports)
+        tuples with the imports of each class, keyed like symbols, from
+        which the dependency graph is built.
+        """
+        AppClass.symbol_table = symbols
+        AppClass.dependency_graph = DependencyGraph.build(symbols,
+                                                          imports or ())
+        usage_index = defaultdict(set)
+        for key, usage in usages:
+            if key in symbols:
+                usage_index[key].add(usage)
+        AppClass.usage_index = {
+            key: sorted(lst, key=lambda u: (u.name.lower(),
+                                            u.package.name.lower(),
+                                            u.member.lower(), u.role))
+            for key, lst in usage_index.items()}
+
     @classmethod
     def _get_package_xml(cls, package):
         """Return an XML representation of a given package."""
@@ -309,7 +705,8 @@ class AppClass:
             xslt = etree.parse(xslt_file)
             AppClass.xsl_package_overview = etree.XSLT(xslt)
         html_tree = etree.ElementTree(AppClass._get_package_xml(package))
-        return AppClass.xsl_package_overview(html_tree)
+        return AppClass.xsl_package_overview(
+            html_tree, **AppClass.get_resource_params())
 
     @classmethod
     def _get_class_index_xml(cls, classes):
@@ -336,7 +733,8 @@ class AppClass:
             AppClass.xsl_class_index = etree.XSLT(xslt)
         html_tree = etree.ElementTree(AppClass._get_class_index_xml(classes))
         return AppClass.xsl_class_index(html_tree,
-                                        target=etree.XSLT.strparam(target))
+                                        target=etree.XSLT.strparam(target),
+                                        **AppClass.get_resource_params())
 
     @classmethod
     def get_package_index_xml(cls, packages):
@@ -354,33 +752,33 @@ class AppClass:
             xslt = etree.parse(xslt_file)
             AppClass.xsl_package_index = etree.XSLT(xslt)
         html_tree = etree.ElementTree(AppClass.get_package_index_xml(packages))
-        return AppClass.xsl_package_index(html_tree)
+        return AppClass.xsl_package_index(html_tree,
+                                          **AppClass.get_resource_params())
 
 
 class ClassDescr:
     """A lightweight class descriptor for use in indexes."""
 
-    __slots__ = ('package', 'name', 'type')
+    __slots__ = ('package', 'name', 'type', 'is_abstract')
 
-    def __init__(self, package, name, the_type):
+    def __init__(self, package, name, the_type, is_abstract=False):
         """Initialize the object."""
         self.package = package
         self.name = name
         self.type = the_type
+        self.is_abstract = is_abstract
 
     @property
     def package_name(self):
         """Return the package name as a concatenated string."""
-        return ':'.join(self.package)
+        return self.package.name
 
     @property
     def fqcn(self):
         """Return the fully qualified Application Class name."""
         if self.package:
-            fqcn = f'{self.package_name}:{self.name}'
-        else:
-            fqcn = self.name
-        return fqcn
+            return self.package.fqcn(self.name)
+        return self.name
 
     @property
     def sort_key(self):
@@ -399,7 +797,7 @@ class Superclass:
         self.fqcn = fqcn
         if fqcn.find(':') >= 0:
             split_fqcn = fqcn.split(sep=':')
-            self.package = split_fqcn[:-1]
+            self.package = Package(split_fqcn[:-1])
             self.name = split_fqcn[-1]
         else:
             self.package = None
@@ -409,7 +807,7 @@ class Superclass:
         """Return an XML representation of the superclass."""
         node = etree.Element('superclass', verb=self.verb)
         if self.package:
-            etree.SubElement(node, 'package').text = ':'.join(self.package)
+            etree.SubElement(node, 'package').text = self.package.name
         etree.SubElement(node, 'name').text = self.name
         return node
 
@@ -453,6 +851,14 @@ class Constant:
         self.value = value
         self.description = None
 
+    def get_manifest_entry(self):
+        """Return the signature and fingerprint of the constant."""
+        return {'scope': 'private',
+                'signature': str(self),
+                'fingerprint': _fingerprint(
+                    self.name, self.value,
+                    Description.canonical_of(self.description))}
+
     def get_xml(self):
         """Return an XML representation of the constant."""
         node = etree.Element('constant')
@@ -495,6 +901,14 @@ class Description:
                     or self.exceptions
                     or self.returns)
 
+    @classmethod
+    def canonical_of(cls, descr):
+        """Return a JSON-friendly canonical form of a description."""
+        if descr is None:
+            return None
+        return [descr.summary, descr.full, descr.version, descr.authors,
+                descr.params, descr.exceptions, descr.returns]
+
     def get_xml(self, version=False, authors=False, params=False,
                 exceptions=False, returns=False):
         """Return an XML representation of the API description."""
@@ -523,6 +937,28 @@ class Description:
             etree.SubElement(node, 'return').text = etree.CDATA(self.returns)
         return node
 
+    def get_comment(self, indent=''):
+        """Return the lines of the API description as a PeopleCode comment."""
+        body = []
+        for para in self.full:
+            if body:
+                body.append('')
+            body.extend(para.splitlines())
+        tags = [('version', self.version)]
+        tags.extend(('author', author) for author in self.authors)
+        tags.extend(('param', param) for param in self.params)
+        tags.extend(('exception', ex) for ex in self.exceptions)
+        tags.append(('return', self.returns))
+        tags = [f'@{tag} {text}' for tag, text in tags if text]
+        if body and tags:
+            body.append('')
+        body.extend(tags)
+        lines = [f'{indent}/**']
+        lines.extend(f'{indent} * {line}'.rstrip().replace('*/', '* /')
+                     for line in body)
+        lines.append(f'{indent} */')
+        return lines
+
     def __str__(self):
         """Return a string representation of the API description."""
         return self.summary
@@ -531,7 +967,8 @@ class Description:
 class Method:
     """A representation of an Application Class method or constructor."""
 
-    __slots__ = ('name', 'args', 'type', 'scope', 'is_abstract', 'description')
+    __slots__ = ('name', 'args', 'type', 'scope', 'is_abstract', 'description',
+                 'line', 'metrics')
 
     def __init__(self, name, scope, args=None, the_type=None,
                  is_abstract=False):
@@ -542,6 +979,8 @@ class Method:
         self.is_abstract = is_abstract
         self.scope = scope
         self.description = None
+        self.line = None
+        self.metrics = None
 
     @property
     def sort_key(self):
@@ -554,6 +993,15 @@ class Method:
             order = '3'
         return f'{order}{self.name.lower()}'
 
+    def get_manifest_entry(self):
+        """Return the signature and fingerprint of the method."""
+        signature = str(self)
+        return {'scope': self.scope,
+                'signature': signature,
+                'fingerprint': _fingerprint(
+                    signature, self.scope, self.is_abstract,
+                    Description.canonical_of(self.description))}
+
     def get_xml(self, is_constructor=False):
         """Return an XML representation of the method or construtor."""
         member_type = 'constructor' if is_constructor else 'method'
@@ -572,17 +1020,14 @@ class Method:
             descr_xml = self.description.get_xml(params=True, exceptions=True,
                                                  returns=True)
             node.append(descr_xml)
+        if self.metrics:
+            node.append(self.metrics.get_xml())
         return node
 
     def __str__(self):
         """Return a string representation of the method or construtor."""
-        out = f'method {self.name}('
-        if self.args:
-            for i, arg in enumerate(self.args):
-                if i > 0:
-                    out += ', '
-                out += str(arg)
-        out += ')'
+        args = ', '.join(map(str, self.args)) if self.args else ''
+        out = f'method {self.name}({args})'
         if self.type:
             out += f' Returns {str(self.type)}'
         if self.is_abstract:
@@ -595,7 +1040,8 @@ class Property:
 
     __slots__ = ('name', 'type', 'scope', 'is_abstract', 'is_readonly',
                  'is_get', 'is_set', 'is_private', 'definition', 'description',
-                 'get_descr', 'set_descr')
+                 'get_descr', 'set_descr', 'get_line', 'set_line',
+                 'get_metrics', 'set_metrics')
 
     def __init__(self, name, the_type, scope, is_abstract=False,
                  is_readonly=False, is_get=False, is_set=False):
@@ -612,6 +1058,10 @@ class Property:
         self.description = None
         self.get_descr = None
         self.set_descr = None
+        self.get_line = None
+        self.set_line = None
+        self.get_metrics = None
+        self.set_metrics = None
 
     @property
     def sort_key(self):
@@ -624,6 +1074,17 @@ class Property:
             order = '3'
         return f'{order}{self.name.lower()}'
 
+    def get_manifest_entry(self):
+        """Return the signature and fingerprint of the property."""
+        signature = str(self)
+        return {'scope': self.scope,
+                'signature': signature,
+                'fingerprint': _fingerprint(
+                    signature, self.scope, self.is_abstract,
+                    Description.canonical_of(self.description),
+                    Description.canonical_of(self.get_descr),
+                    Description.canonical_of(self.set_descr))}
+
     def get_prop_xml(self):
         """Return an XML representation of the property definition."""
         node = etree.Element('property', scope=self.scope)
@@ -650,10 +1111,14 @@ class Property:
         node.append(self.type.get_xml())
         if get:
             descr = self.get_descr or self.description
+            metrics = self.get_metrics
         else:
             descr = self.set_descr or self.description
+            metrics = self.set_metrics
         if descr:
             node.append(descr.get_xml(returns=True))
+        if metrics:
+            node.append(metrics.get_xml())
         return node
 
     def __str__(self):
@@ -672,30 +1137,47 @@ class Property:
 
 
 class Type:
-    """A model of a PeopleCode built-in or Application Class type."""
+    """A model of a PeopleCode built-in or Application Class type.
 
-    __slots__ = ('name', 'package', 'array_dimension')
+    Types are immutable and interned like packages: creating a Type
+    returns the shared instance for the given name and dimension.
+    """
 
-    def __init__(self, name, array_dimension=0):
-        """Initialize the object."""
-        parts = name.split(sep=':')
-        self.name = parts[-1]
-        self.package = parts[:-1]
-        self.array_dimension = array_dimension
+    __slots__ = ('name', 'package', 'array_dimension', 'fqcn')
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, name, array_dimension=0):
+        """Return the shared instance for the given name and dimension."""
+        key = (name, array_dimension)
+        the_type = cls._instances.get(key)
+        if the_type is None:
+            with cls._lock:
+                the_type = cls._instances.get(key)
+                if the_type is None:
+                    the_type = super().__new__(cls)
+                    parts = name.split(sep=':')
+                    the_type.name = sys.intern(parts[-1])
+                    the_type.package = Package(parts[:-1])
+                    the_type.array_dimension = array_dimension
+                    the_type.fqcn = the_type.package.fqcn(the_type.name)
+                    cls._instances[key] = the_type
+        return the_type
+
+    @classmethod
+    def clear(cls):
+        """Empty the registry of types."""
+        with cls._lock:
+            cls._instances = {}
+
+    def __reduce__(self):
+        """Intern the type again when unpickled."""
+        return Type, (self.fqcn, self.array_dimension)
 
     @property
     def package_name(self):
         """Return the package name as a concatenated string."""
-        return ':'.join(self.package)
-
-    @property
-    def fqcn(self):
-        """Return the fully qualified type name."""
-        if self.package:
-            fqcn = f'{self.package_name}:{self.name}'
-        else:
-            fqcn = self.name
-        return fqcn
+        return self.package.name
 
     def get_xml(self):
         """Return an XML representation of the type."""
@@ -703,7 +1185,10 @@ class Type:
         if self.array_dimension > 0:
             node.set('array_dimension', str(self.array_dimension))
         if self.package:
-            etree.SubElement(node, 'package').text = ':'.join(self.package)
+            etree.SubElement(node, 'package').text = self.package.name
+            symbols = AppClass.symbol_table
+            if symbols is not None and self.fqcn.lower() not in symbols:
+                node.set('unresolved', 'true')
         etree.SubElement(node, 'name').text = self.name
         return node
 
@@ -716,13 +1201,19 @@ class Type:
 class AppClassDocVisitor(PeopleCodeParserVisitor):
     """A PeopleCode parser visitor for Application Classes."""
 
-    def __init__(self, stream, package, include_private=False):
-        """Create the visitor."""
+    def __init__(self, stream, package, include_private=False,
+                 with_metrics=False):
+        """Create the visitor.
+
+        If with_metrics is True, the Metrics of every method, getter and
+        setter implementation are computed from its parse tree.
+        """
         if isinstance(package, list):
             if 1 <= len(package) <= 3:
                 self.stream = stream
                 self.package = package
                 self.include_private = include_private
+                self.with_metrics = with_metrics
                 self.private_methods = set()
                 self.app_class = None
             else:
@@ -842,11 +1333,43 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
                     #     _logger.debug(f'API comment: {descr}')
         return descr
 
+    def _get_metrics(self, ctx):
+        """Return the Metrics of an implementation's parse tree."""
+        tokens = self.stream.tokens[ctx.start.tokenIndex:
+                                    ctx.stop.tokenIndex + 1]
+        loc = len({token.line for token in tokens
+                   if token.channel in _metrics_channels})
+        statements = throws = nesting = 0
+        complexity = 1
+        stack = [(ctx, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if isinstance(node, PeopleCodeParser.StatementContext):
+                statements += 1
+                if isinstance(node, PeopleCodeParser.ThrowStmtContext):
+                    throws += 1
+            elif isinstance(node, _metrics_branches):
+                complexity += 1
+            if isinstance(node, _metrics_blocks):
+                depth += 1
+                nesting = max(nesting, depth)
+            if node.children:
+                stack.extend((child, depth) for child in node.children
+                             if isinstance(child, ParserRuleContext))
+        return Metrics(loc, statements, complexity, nesting, throws)
+
+    def _add_imports(self, ctx_imports):
+        """Record the imports of the class, as written."""
+        if self.app_class:
+            self.app_class.imports = [self.visit(ctx_import)
+                                      for ctx_import in ctx_imports]
+
     # Visit a parse tree produced by PeopleCodeParser#AppClassProgram.
     def visitAppClassProgram(
             self, ctx: PeopleCodeParser.AppClassProgramContext):
-        """Limit visitor to class declaration and body."""
+        """Limit visitor to imports, class declaration and body."""
         self.visit(ctx.classDeclaration())
+        self._add_imports(ctx.importDeclaration())
         ctx_class_body = ctx.classBody()
         if ctx_class_body:
             self.visit(ctx_class_body)
@@ -856,11 +1379,19 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
     # Visit a parse tree produced by PeopleCodeParser#InterfaceProgram.
     def visitInterfaceProgram(
             self, ctx: PeopleCodeParser.InterfaceProgramContext):
-        """Limit visitor to interface declaration."""
+        """Limit visitor to imports and interface declaration."""
         self.visit(ctx.interfaceDeclaration())
+        self._add_imports(ctx.importDeclaration())
         # _logger.debug(etree.tostring(self.app_class.get_xml(),
         #               encoding='utf-8', pretty_print=True).decode())
 
+    # Visit a parse tree produced by PeopleCodeParser#importDeclaration.
+    def visitImportDeclaration(
+            self, ctx: PeopleCodeParser.ImportDeclarationContext):
+        """Return the imported class or package (ending in ":*")."""
+        ctx_path = ctx.appClassPath() or ctx.appPackageAll()
+        return ctx_path.getText()
+
     # Visit a parse tree produced by
     # PeopleCodeParser#ClassDeclarationExtension.
     def visitClassDeclarationExtension(
@@ -868,8 +1399,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         """Visiting a class declaration with a superclass."""
         name = ctx.genericID().getText()
         superclass = ctx.superclass().getText()
-        _logger.debug('>>> #ClassDeclarationExtension: '
-                      f'{name} extends {superclass}')
         self.app_class = AppClass(name, self.package, verb='extends',
                                   superclass=superclass)
         self.app_class.description = self._find_api_comment(ctx.start)
@@ -882,8 +1411,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         """Visiting a class declaration with an implemented interface."""
         name = ctx.genericID().getText()
         interface = ctx.appClassPath().getText()
-        _logger.debug('>>> #ClassDeclarationImplementation: '
-                      f'{name} implements {interface}')
         self.app_class = AppClass(name, self.package, verb='implements',
                                   superclass=interface)
         self.app_class.description = self._find_api_comment(ctx.start)
@@ -895,7 +1422,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
             self, ctx: PeopleCodeParser.ClassDeclarationPlainContext):
         """Visiting a standalone class declaration."""
         name = ctx.genericID().getText()
-        _logger.debug(f'>>> #ClassDeclarationPlain: {name}')
         self.app_class = AppClass(name, self.package)
         self.app_class.description = self._find_api_comment(ctx.start)
         self.visit(ctx.classHeader())
@@ -907,8 +1433,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         """Visiting an interface declaration with a superclass."""
         name = ctx.genericID().getText()
         superclass = ctx.superclass().getText()
-        _logger.debug('>>> #InterfaceDeclarationExtension: '
-                      f'{name} extends {superclass}')
         self.app_class = AppClass(name, self.package, the_type='interface',
                                   verb='extends', superclass=superclass)
         self.app_class.description = self._find_api_comment(ctx.start)
@@ -920,7 +1444,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
             self, ctx: PeopleCodeParser.InterfaceDeclarationPlainContext):
         """Visiting a standalone interface declaration."""
         name = ctx.genericID().getText()
-        _logger.debug(f'>>> #InterfaceDeclarationPlain: {name}')
         self.app_class = AppClass(name, self.package, the_type='interface')
         self.app_class.description = self._find_api_comment(ctx.start)
         self.visit(ctx.classHeader())
@@ -928,7 +1451,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
     # Visit a parse tree produced by PeopleCodeParser#publicHeader.
     def visitPublicHeader(self, ctx: PeopleCodeParser.PublicHeaderContext):
         """Starting the public header section."""
-        _logger.debug('>>> #publicHeader')
         self._scope = Scope.PUBLIC
         self.visitChildren(ctx)
 
@@ -936,14 +1458,12 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
     def visitProtectedHeader(
             self, ctx: PeopleCodeParser.ProtectedHeaderContext):
         """Starting the protected header section."""
-        _logger.debug('>>> #protectedHeader')
         self._scope = Scope.PROTECTED
         self.visitChildren(ctx)
 
     # Visit a parse tree produced by PeopleCodeParser#privateHeader.
     def visitPrivateHeader(self, ctx: PeopleCodeParser.PrivateHeaderContext):
         """Starting the private header section."""
-        _logger.debug('>>> #privateHeader')
         if self.include_private:
             self._scope = Scope.PRIVATE
             self.visitChildren(ctx)
@@ -954,8 +1474,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         method_name = ctx.genericID().getText()
         if self._scope == Scope.PRIVATE:
             self.private_methods.add(method_name.lower())
-        _logger.debug(f'>>> #methodHeader: [{self._scope.value}] '
-                      f'{method_name}')
         ctx_args = ctx.methodArguments()
         args = None if ctx_args is None else self.visit(ctx_args)
         the_type = self._get_type(ctx.typeT())
@@ -963,8 +1481,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
                         the_type=the_type,
                         is_abstract=(ctx.ABSTRACT() is not None))
         method.description = self._find_api_comment(ctx.start)
-        if _logger.isEnabledFor(logging.DEBUG):
-            _logger.debug(f'<<< #methodHeader: {method}')
         if method_name.lower() == self.app_class.name.lower():
             self.app_class.constructor = method
         else:
@@ -975,10 +1491,7 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
             self, ctx: PeopleCodeParser.MethodArgumentsContext):
         """Return a list of method arguments."""
         ctx_args = ctx.methodArgument()
-        if _logger.isEnabledFor(logging.DEBUG):
-            _logger.debug(f'>>> #methodArguments ({len(ctx_args)})')
         args = [self.visit(ctx_arg) for ctx_arg in ctx_args]
-        _logger.debug('<<< #methodArguments')
         return args
 
     # Visit a parse tree produced by PeopleCodeParser#methodArgument.
@@ -987,8 +1500,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         the_type = self._get_type(ctx.typeT())
         arg = Argument(ctx.USER_VARIABLE().getText(), the_type,
                        is_out=(ctx.OUT() is not None))
-        if _logger.isEnabledFor(logging.DEBUG):
-            _logger.debug(f'>>> #methodArgument: {arg}')
         return arg
 
     def _get_type(self, ctx):
@@ -1010,8 +1521,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         else:
             base_type = 'any'
         the_type = Type(base_type, array_dimension=len(ctx.ARRAY()))
-        if _logger.isEnabledFor(logging.DEBUG):
-            _logger.debug(f'>>> #ArrayType: {the_type}')
         return the_type
 
     # Visit a parse tree produced by PeopleCodeParser#BaseExceptionType.
@@ -1019,21 +1528,18 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
             self, ctx: PeopleCodeParser.BaseExceptionTypeContext):
         """Return a string representation of an Exception type."""
         base_type = 'Exception'
-        _logger.debug(f'>>> #BaseExceptionType: {base_type}')
         return base_type
 
     # Visit a parse tree produced by PeopleCodeParser#AppClassType.
     def visitAppClassType(self, ctx: PeopleCodeParser.AppClassTypeContext):
         """Return a string representation of an Application Class type."""
         base_type = ctx.getText()
-        _logger.debug(f'>>> #AppClassType: {base_type}')
         return base_type
 
     # Visit a parse tree produced by PeopleCodeParser#SimpleTypeType.
     def visitSimpleTypeType(self, ctx: PeopleCodeParser.SimpleTypeTypeContext):
         """Return a string representation of a simple (built-in) type."""
         base_type = ctx.getText()
-        _logger.debug(f'>>> #SimpleTypeType: {base_type}')
         return base_type
 
     # Visit a parse tree produced by PeopleCodeParser#PropertyGetSet.
@@ -1043,8 +1549,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         prop = Property(ctx.genericID().getText(), the_type, self._scope.value,
                         is_get=True, is_set=(ctx.SET() is not None))
         prop.description = self._find_api_comment(ctx.start)
-        if _logger.isEnabledFor(logging.DEBUG):
-            _logger.debug(f'>>> #PropertyGetSet: {prop}')
         self.app_class.properties.append(prop)
 
     # Visit a parse tree produced by PeopleCodeParser#PropertyDirect.
@@ -1055,8 +1559,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
                         is_abstract=(ctx.ABSTRACT() is not None),
                         is_readonly=(ctx.READONLY() is not None))
         prop.description = self._find_api_comment(ctx.start)
-        if _logger.isEnabledFor(logging.DEBUG):
-            _logger.debug(f'>>> #PropertyDirect: {prop}')
         self.app_class.properties.append(prop)
 
     # Visit a parse tree produced by PeopleCodeParser#InstanceDecl.
@@ -1068,11 +1570,9 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         """
         the_type = self._get_type(ctx.typeT())
         descr = self._find_api_comment(ctx.start)
-        for i, t in enumerate(ctx.USER_VARIABLE(), start=1):
+        for t in ctx.USER_VARIABLE():
             prop = Property(t.getText(), the_type, self._scope.value)
             prop.description = descr
-            if _logger.isEnabledFor(logging.DEBUG):
-                _logger.debug(f'>>> #InstanceDecl: [{i}] {prop}')
             self.app_class.properties.append(prop)
 
     # Visit a parse tree produced by
@@ -1083,8 +1583,6 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
         const = Constant(ctx.USER_VARIABLE().getText(),
                          ctx.literal().getText())
         const.description = self._find_api_comment(ctx.start)
-        if _logger.isEnabledFor(logging.DEBUG):
-            _logger.debug(f'>>> #enterConstantDeclaration: {const}')
         self.app_class.constants.append(const)
 
     # Visit a parse tree produced by
@@ -1093,18 +1591,24 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
             self, ctx: PeopleCodeParser.MethodImplementationContext):
         """Visiting a method implementation.
 
-        This is only used to override the API comments in case they're
+        This is used to record the line and metrics of the
+        implementation, and to override the API comments in case they're
         defined here instead of (or in addition to) the header method
         declaration.
         """
         method_name = ctx.method().genericID().getText()
-        _logger.debug(f'>>> #MethodImplementation: {method_name}')
+        method = self.app_class.find_method(method_name)
+        implemented = method
+        if not method and method_name.lower() == self.app_class.name.lower():
+            implemented = self.app_class.constructor
+        if implemented:
+            implemented.line = ctx.start.line
+            if self.with_metrics:
+                implemented.metrics = self._get_metrics(ctx.method())
         if self.include_private or method_name.lower() in self.private_methods:
             descr = self._find_api_comment(ctx.start)
-            if descr:
-                method = self.app_class.find_method(method_name)
-                if method:
-                    method.description = descr
+            if descr and method:
+                method.description = descr
 
     # Visit a parse tree produced by
     # PeopleCodeParser#GetterImplementation.
@@ -1112,13 +1616,15 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
             self, ctx: PeopleCodeParser.GetterImplementationContext):
         """Visiting a getter implementation.
 
-        This is only used to assign get-specific API comments to the
-        property.
+        This is used to record the line and metrics of the getter and
+        to assign get-specific API comments to the property.
         """
         property_name = ctx.getter().genericID().getText()
-        _logger.debug(f'>>> #GetterImplementation: {property_name}')
         prop = self.app_class.find_property(property_name)
         if prop:
+            prop.get_line = ctx.start.line
+            if self.with_metrics:
+                prop.get_metrics = self._get_metrics(ctx.getter())
             prop.get_descr = self._find_api_comment(ctx.start)
 
     # Visit a parse tree produced by
@@ -1127,256 +1633,4988 @@ class AppClassDocVisitor(PeopleCodeParserVisitor):
             self, ctx: PeopleCodeParser.SetterImplementationContext):
         """Visiting a setter implementation.
 
-        This is only used to assign set-specific API comments to the
-        property.
+        This is used to record the line and metrics of the setter and
+        to assign set-specific API comments to the property.
         """
         property_name = ctx.setter().genericID().getText()
-        _logger.debug(f'>>> #SetterImplementation: {property_name}')
         prop = self.app_class.find_property(property_name)
         if prop:
+            prop.set_line = ctx.start.line
+            if self.with_metrics:
+                prop.set_metrics = self._get_metrics(ctx.setter())
             prop.set_descr = self._find_api_comment(ctx.start)
 
 
-# PRIVATE FUNCTIONS
-def _print_verbose(text, end='\n', flush=True):
-    """Print to stdout if verbose output is enabled."""
-    if _verbose:
-        print(text, end=end, flush=flush)
+def _traced(rule, method):
+    """Wrap a visitor method so that it records a trace of its node."""
+    def visit(self, ctx):
+        trace = self.trace
+        index = len(trace)
+        trace.append(None)
+        self.depth += 1
+        start_time = time.perf_counter()
+        try:
+            return method(self, ctx)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.depth -= 1
+            trace[index] = (rule, self.depth, ctx.start.line,
+                            ctx.start.column, elapsed)
+    visit.__name__ = method.__name__
+    visit.__doc__ = method.__doc__
+    return visit
+
+
+class _TracingVisitor(AppClassDocVisitor):
+    """A visitor that records every node visited and its timing.
+
+    The trace is a list of (rule, depth, line, column, elapsed) tuples
+    in the order in which the nodes are entered, elapsed being the time
+    spent in the node and its descendants. This subclass is only used
+    when tracing is enabled, so that the plain visitor pays nothing.
+    """
+
+    def __init__(self, stream, package, include_private=False,
+                 with_metrics=False):
+        """Create the visitor."""
+        super().__init__(stream, package, include_private=include_private,
+                         with_metrics=with_metrics)
+        self.trace = []
+        self.depth = 0
+
+
+for _name in dir(PeopleCodeParserVisitor):
+    if _name.startswith('visit') and _name not in (
+            'visit', 'visitChildren', 'visitTerminal', 'visitErrorNode'):
+        setattr(_TracingVisitor, _name,
+                _traced(_name[5:], getattr(AppClassDocVisitor, _name)))
+del _name
+
+
+class _Tracer:
+    """Writes visitor traces as JSON Lines and summarizes them by rule."""
+
+    def __init__(self, file_path):
+        """Open the trace file."""
+        self.file = open(file_path, 'w', encoding='utf-8')
+        self.rules = defaultdict(lambda: [0, 0.0])
+        self.files = 0
+        self.elapsed = 0.0
+
+    def add(self, file_path, trace):
+        """Write the trace of a source file."""
+        self.files += 1
+        lines = []
+        for rule, depth, line, column, elapsed in trace:
+            stats = self.rules[rule]
+            stats[0] += 1
+            stats[1] += elapsed
+            if depth == 0:
+                self.elapsed += elapsed
+            lines.append(json.dumps({'file': file_path, 'rule': rule,
+                                     'depth': depth, 'line': line,
+                                     'column': column,
+                                     'elapsed': round(elapsed, 7)}))
+        if lines:
+            self.file.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        """Close the trace file."""
+        self.file.close()
+
+    def get_report(self, top=10):
+        """Return a text summary of the rules taking the most time.
+
+        Times include those of nested nodes, so they add up to more than
+        the total.
+        """
+        lines = [f'Visited {sum(s[0] for s in self.rules.values())} '
+                 f'node(s) in {self.files} file(s) in '
+                 f'{self.elapsed * 1000:.1f} ms:']
+        rules = sorted(self.rules.items(), key=lambda item: -item[1][1])
+        for rule, (count, elapsed) in rules[:top]:
+            lines.append(f'  {rule}: {count} node(s), '
+                         f'{elapsed * 1000:.1f} ms')
+        return '\n'.join(lines)
+
+
+# PROFILING
+class _Profiler:
+    """Profiles a build with cProfile, phase by phase.
+
+    The main thread is profiled one phase at a time (see switch), while
+    writer threads and parser worker processes each have a profile of
+    their own. Every profile is dumped to the profile directory as it
+    ends, and close merges them into a single pstats file and a file
+    of collapsed stacks for flame graph tools. The time the main thread
+    spends waiting for parser workers (see pause) is left out of its
+    profiles, and totalled in waited instead.
+    """
 
+    def __init__(self, directory):
+        """Prepare the profile directory, removing previous profiles.
 
-def _flatten(lst):
-    """Generate individual items from a multiple-level list."""
-    for elem in lst:
-        if isinstance(elem, Iterable) and not isinstance(elem, (str, bytes)):
-            yield from _flatten(elem)
-        else:
-            yield elem
+        The directory must not hold any other files, so that none of
+        them is removed or merged by mistake.
+        """
+        self.directory = _prepare_dir(directory)
+        names = os.listdir(self.directory)
+        ours = {_profile_file, _collapsed_stacks_file}
+        others = [name for name in names if name not in ours
+                  and not _profile_names.fullmatch(name)]
+        if others:
+            raise ValueError(f'The profile directory "{self.directory}" '
+                             f'holds other files (e.g. "{others[0]}")')
+        for name in names:
+            os.remove(os.path.join(self.directory, name))
+        self.lock = threading.Lock()
+        self.names = defaultdict(int)
+        self.phase = None
+        self.profile = None
+        self.waited = 0.0
+        self.pause_time = None
+
+    def switch(self, phase):
+        """End the current phase of the main thread and start another."""
+        if self.profile is not None:
+            self.profile.disable()
+            self.dump(self.profile, self.phase)
+        self.phase = phase
+        self.profile = None
+        if phase:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def pause(self):
+        """Stop profiling the main thread while it waits."""
+        if self.profile is not None:
+            self.profile.disable()
+        self.pause_time = time.monotonic()
+
+    def resume(self):
+        """Profile the main thread again after a pause."""
+        self.waited += time.monotonic() - self.pause_time
+        if self.profile is not None:
+            self.profile.enable()
+
+    def start_thread(self):
+        """Return an enabled profile for the current thread, if possible.
+
+        Where profilers cannot run in several threads at once (as with
+        Python 3.12 and later), None is returned.
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None
+        return profile
+
+    def dump(self, profile, name):
+        """Write a profile to the directory under an unused name."""
+        with self.lock:
+            self.names[name] += 1
+            count = self.names[name]
+        if count > 1:
+            name = f'{name}-{count}'
+        _dump_profile(profile, os.path.join(self.directory, f'{name}.prof'))
+
+    def close(self):
+        """End the last phase and merge all the profiles.
+
+        Profiles that cannot be read (as those of parser workers killed
+        while writing them) are skipped. Return the merged pstats.Stats,
+        or None if nothing was profiled.
+        """
+        self.switch(None)
+        file_names = sorted(name for name in os.listdir(self.directory)
+                            if name.endswith('.prof')
+                            and name != _profile_file)
+        merged = None
+        stacks = defaultdict(float)
+        for file_name in file_names:
+            file_path = os.path.join(self.directory, file_name)
+            try:
+                stats = pstats.Stats(file_path)
+            except (EOFError, TypeError, ValueError, OSError) as e:
+                _logger.warning(f'Profile "{file_path}" could not be read, '
+                                f'skipping: {e}')
+                continue
+            _add_collapsed_stacks(stacks, stats.stats, file_name[:-5])
+            if merged is None:
+                merged = stats
+            else:
+                merged.add(stats)
+        if merged is None:
+            return None
+        with open(os.path.join(self.directory, _collapsed_stacks_file), 'w',
+                  encoding='utf-8') as file:
+            for stack, elapsed in sorted(stacks.items()):
+                microseconds = round(elapsed * 1000000)
+                if microseconds:
+                    file.write(f'{stack} {microseconds}\n')
+        merged.dump_stats(os.path.join(self.directory, _profile_file))
+        return merged
 
 
-def _process_file(file_path, include_private):
-    """Process an input file to retrieve its structure."""
-    _logger.info(f'Processing input file "{file_path}"')
-    input_stream = FileStream(file_path, encoding='utf-8')
-    lexer = PeopleCodeLexer(input_stream)
-    token_stream = CommonTokenStream(lexer)
-    parser = PeopleCodeParser(token_stream)
-    parse_tree = parser.appClass()
-    package = os.path.basename(file_path).split(sep='.')[:-2]
-    visitor = AppClassDocVisitor(token_stream, package,
-                                 include_private=include_private)
-    visitor.visit(parse_tree)
-    return visitor.app_class
+def _dump_profile(profile, file_path):
+    """Write a profile under a temporary name, then move it into place.
 
+    A process killed meanwhile leaves no truncated profile behind.
+    """
+    profile.dump_stats(f'{file_path}.tmp')
+    os.replace(f'{file_path}.tmp', file_path)
 
-def _process_input(args):
-    """Process an input argument.
 
-    Globs files and directories where applicable.
+def _profile_phase(phase):
+    """Switch the profiler, if any, to a new phase of the build."""
+    if _profiler is not None:
+        _profiler.switch(phase)
+
+
+def _get_frame_label(func):
+    """Return the label of a pstats function key in collapsed stacks."""
+    file_name, line, name = func
+    if file_name == '~':
+        label = name
+    else:
+        module = '/'.join(file_name.replace(os.sep, '/').split('/')[-2:])
+        label = f'{name} ({module}:{line})'
+    return label.replace(';', ',')
+
+
+def _add_collapsed_stacks(stacks, stats, root):
+    """Add the call stacks of pstats data to a dictionary of times.
+
+    cProfile only records pairs of caller and callee, so stacks are
+    rebuilt from the functions without callers down, the time of a
+    function being split between its callers in proportion to the time
+    of each pair. Recursion is cut at the first repeated function, and
+    calls taking less than _min_stack_share of the total time of the
+    profile are counted in the time of their caller instead of being
+    followed.
     """
-    for arg in _flatten([glob.glob(file) for file in args]):
-        if os.path.exists(arg):
-            if os.path.isfile(arg):
-                yield arg
-            elif os.path.isdir(arg):
-                directory = os.walk(arg)
-                for adir in directory:
-                    base_dir = adir[0]
-                    for filename in adir[2]:
-                        yield os.path.join(base_dir, filename)
-            else:
-                _logger.warning(f'"{arg}" is neither a file nor a directory, '
-                                'skipping.')
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, pair in callers.items():
+            callees[caller].append((func, pair[3]))
+    pending = [(func, stat[3], (root, _get_frame_label(func)),
+                frozenset([func]))
+               for func, stat in stats.items() if not stat[4]]
+    min_time = max(sum(item[1] for item in pending) * _min_stack_share,
+                   0.000001)
+    while pending:
+        func, elapsed, path, seen = pending.pop()
+        total, internal = stats[func][3], stats[func][2]
+        ratio = min(elapsed / total, 1.0) if total else 0.0
+        elapsed = internal * ratio
+        for callee, pair_time in callees[func]:
+            callee_time = pair_time * ratio
+            if callee in seen:
+                continue
+            if callee_time < min_time:
+                elapsed += callee_time
+                continue
+            pending.append((callee, callee_time,
+                            path + (_get_frame_label(callee),),
+                            seen.union([callee])))
+        stacks[';'.join(path)] += elapsed
+
+
+def _get_profile_report(stats, waited=0.0, top=10):
+    """Return a text summary of the functions taking the most time.
+
+    waited is the time the main thread spent waiting for the parser
+    workers, which is not part of the profiles.
+    """
+    functions = sorted(stats.stats.items(), key=lambda item: -item[1][2])
+    wait_text = (f', not counting {waited:.1f} s spent waiting for parser '
+                 'workers' if waited >= 0.05 else '')
+    lines = [f'Profiled {stats.total_calls} call(s) in '
+             f'{stats.total_tt:.1f} s{wait_text}; most internal time spent '
+             'in:']
+    for func, (_, calls, internal, _, _) in functions[:top]:
+        lines.append(f'  {_get_frame_label(func)}: {calls} call(s), '
+                     f'{internal:.2f} s')
+    return '\n'.join(lines)
+
+
+# SOURCE ARCHIVES
+class _SourceArchive:
+    """A zip or tar archive of source files, read without extraction.
+
+    Members are addressed as "archive!/member" paths (see
+    _split_archive_path), so that the package of their class is still
+    derived from their file name. Archives are kept open by
+    _get_archive, and the member list is read once.
+    """
+
+    __slots__ = ['path', 'stamp', 'archive', 'members']
+
+    def __init__(self, path, stamp):
+        """Open an archive and read its list of regular files."""
+        self.path = path
+        self.stamp = stamp
+        if zipfile.is_zipfile(path):
+            self.archive = zipfile.ZipFile(path)
+            self.members = {info.filename: info
+                            for info in self.archive.infolist()
+                            if not info.is_dir()}
         else:
-            _logger.warning(f'"{arg}" not found, skipping.')
+            self.archive = tarfile.open(path)
+            self.members = {info.name: info
+                            for info in self.archive.getmembers()
+                            if info.isfile()}
+
+    def read(self, member):
+        """Return the contents of a member."""
+        info = self.members[member]
+        if isinstance(self.archive, zipfile.ZipFile):
+            return self.archive.read(info)
+        with self.archive.extractfile(info) as file:
+            return file.read()
+
+    def get_mtime(self, member):
+        """Return the modification time of a member, or None if absent."""
+        info = self.members.get(member)
+        if info is None:
+            return None
+        if isinstance(info, zipfile.ZipInfo):
+            return int(time.mktime(info.date_time + (0, 0, -1))) * 10**9
+        return int(info.mtime) * 10**9
 
+    def close(self):
+        """Close the archive."""
+        self.archive.close()
 
-def _write_package_index(packages, file_path):
-    """Write the package index file."""
-    with open(file_path, 'wb') as file:
-        html = AppClass.get_package_index_html(packages)
-        html.write(file, method='html', pretty_print=True, encoding='utf-8')
 
+def _is_archive(file_path):
+    """Return whether a file is a source archive, from its name."""
+    return file_path.lower().endswith(_archive_extensions)
 
-def _write_class_index(classes, file_path, target=''):
-    """Write the class index file."""
-    with open(file_path, 'wb') as file:
-        html = AppClass.get_class_index_html(classes, target=target)
-        html.write(file, method='html', pretty_print=True, encoding='utf-8')
 
+def _split_archive_path(file_path):
+    """Split the path of an archive member into the archive and member.
 
-def _write_package_overview(package, file_path):
-    """Write a package overview file."""
-    with open(file_path, 'wb') as file:
-        html = AppClass.get_package_html(package)
-        html.write(file, method='html', pretty_print=True, encoding='utf-8')
+    Returns the file path and None for files outside archives.
+    """
+    index = file_path.find(_archive_separator)
+    while index >= 0:
+        if _is_archive(file_path[:index]):
+            return (file_path[:index],
+                    file_path[index + len(_archive_separator):])
+        index = file_path.find(_archive_separator, index + 1)
+    return file_path, None
 
 
-def _write_class_file_xml(outputdir, app_class):
-    """Write a class file as XML."""
-    file_path = os.path.join(outputdir, 'api', *app_class.package,
-                             f'{app_class.name}.xml')
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, 'wb') as file:
-        doc = etree.ElementTree(app_class.get_xml())
-        doc.write(file, pretty_print=True, xml_declaration=True,
-                  encoding='utf-8')
+def _get_archive(path):
+    """Return an open _SourceArchive, reopening it if it changed.
 
+    The most recently used archives are kept open, so that reading
+    their members does not require reading their index again. This must
+    be called while holding _archive_lock.
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    archive = _open_archives.pop(path, None)
+    if archive and archive.stamp != stamp:
+        archive.close()
+        archive = None
+    if archive is None:
+        archive = _SourceArchive(path, stamp)
+        while len(_open_archives) >= _max_open_archives:
+            _open_archives.popitem(last=False)[1].close()
+    _open_archives[path] = archive
+    return archive
+
+
+def _reset_archives():
+    """Forget the archives opened by the parent of a worker process.
+
+    The files inherited share their offsets with the parent's, so they
+    must not be read from.
+    """
+    global _archive_lock, _open_archives
+    _archive_lock = threading.Lock()
+    _open_archives = OrderedDict()
 
-def _write_class_file_html(outputdir, app_class):
-    """Write a class file as HTML."""
-    file_path = os.path.join(outputdir, 'api', *app_class.package,
-                             f'{app_class.name}.html')
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, 'wb') as file:
-        html = app_class.get_html()
-        html.write(file, method='html', pretty_print=True, encoding='utf-8')
 
+def _list_archive(path):
+    """Yield the paths of the members of a source archive."""
+    with _archive_lock:
+        members = list(_get_archive(path).members)
+    for member in members:
+        yield f'{path}{_archive_separator}{member}'
 
-def _app_classes_with_superclass(lst):
-    """Yield all classes that extend/implement from another."""
-    for app_class in lst:
-        if app_class.superclass:
-            yield app_class
 
+def _read_source(file_path):
+    """Return the contents of a source file or archive member."""
+    archive, member = _split_archive_path(file_path)
+    if member is None:
+        with open(file_path, 'rb') as file:
+            return file.read()
+    with _archive_lock:
+        return _get_archive(archive).read(member)
 
-def _get_superclasses_for_class(superclass_index, superclass):
-    """Return a list with the hierarchy of a superclass."""
-    lst = []
-    key = superclass
-    while key and key.package:
-        superclasses = (sc.superclass for sc in superclass_index
-                        if sc.fqcn.lower() == key.fqcn.lower())
-        key = next(superclasses, None)
-        if key:
-            lst.append(key)
-    return lst
 
+# PARSE DIAGNOSTICS
+class _SyntaxErrorLimit(Exception):
+    """Raised to abort the parsing of a file with too many errors."""
 
-def _remove_dir(path):
-    """Delete a directory recursively."""
-    if os.path.exists(path):
-        if os.path.isdir(path):
-            shutil.rmtree(path)
-        else:
-            raise NotADirectoryError(f'"{path}" is not a directory')
 
+class _DiagnosticListener(ErrorListener):
+    """An error listener recording the syntax errors of a file.
 
-# PUBLIC FUNCTIONS
-def generate_appclassdoc(outputdir, include_private, do_deletes, files,
-                         verbose_output=False):
-    """Perform the main functionality of this module."""
-    global _verbose
-    _verbose = verbose_output
-    if files:
-        if type(files) is str:
-            file_list = [files]
-        else:
-            file_list = files
-    else:
-        raise ValueError('No files or directories provided')
-    outputdir = outputdir.rstrip(os.sep)
-    _logger.info(f'Output directory: "{outputdir}"')
-    if os.path.exists(outputdir) and not os.path.isdir(outputdir):
-        raise ValueError(f'"{outputdir}" is not a directory')
-    else:
-        os.makedirs(outputdir, exist_ok=True)
-    start_time = time.time()
-    app_classes = []
-    parse_errors = 0
-    _print_verbose('Parsing source files...')
-    for file_path in _process_input(file_list):
-        app_class = _process_file(file_path, include_private)
-        if app_class:
-            app_classes.append(app_class)
+    It replaces ANTLR's console listener on both the lexer and the
+    parser, so that errors are kept as Diagnostic tuples instead of
+    being printed. Once _max_syntax_errors have been recorded, parsing
+    is aborted by raising _SyntaxErrorLimit.
+    """
+
+    def __init__(self, file_path):
+        """Create the listener."""
+        self.file_path = file_path
+        self.diagnostics = []
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg,
+                    e):
+        """Record a syntax error."""
+        phase = 'lexer' if isinstance(recognizer, PeopleCodeLexer) \
+            else 'parser'
+        self.diagnostics.append(Diagnostic(self.file_path, line, column, msg,
+                                           phase))
+        if len(self.diagnostics) >= _max_syntax_errors:
+            raise _SyntaxErrorLimit()
+
+
+def _log_diagnostics(file_path, diagnostics):
+    """Log a one-line summary of the syntax errors of a file."""
+    first = diagnostics[0]
+    aborted = ', parsing aborted' \
+        if len(diagnostics) >= _max_syntax_errors else ''
+    _logger.warning(f'File "{file_path}" has {len(diagnostics)} syntax '
+                    f'error(s){aborted}; first at line {first.line}:'
+                    f'{first.column}: {first.message}')
+    for diagnostic in diagnostics:
+        _logger.debug(f'{file_path}:{diagnostic.line}:{diagnostic.column}: '
+                      f'{diagnostic.phase}: {diagnostic.message}')
+
+
+def _write_diagnostics_report(diagnostics, file_path):
+    """Write the syntax errors found, by file, as JSON or JUnit XML.
+
+    The JUnit format is used if file_path ends with ".xml", every file
+    with errors being a failed test case.
+    """
+    by_file = OrderedDict()
+    for diagnostic in diagnostics:
+        by_file.setdefault(diagnostic.file_path, []).append(diagnostic)
+    if not file_path.lower().endswith('.xml'):
+        items = [{'file': source,
+                  'aborted': len(lst) >= _max_syntax_errors,
+                  'errors': [{'line': d.line, 'column': d.column,
+                              'phase': d.phase, 'message': d.message}
+                             for d in lst]}
+                 for source, lst in by_file.items()]
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(items, file, indent=2)
+        return
+    count = str(len(by_file))
+    suite = etree.Element('testsuite', name='appclassdoc', tests=count,
+                          failures=count, errors='0')
+    for source, lst in by_file.items():
+        case = etree.SubElement(suite, 'testcase',
+                                classname=_get_file_package(source),
+                                name=source)
+        failure = etree.SubElement(
+            case, 'failure', type='SyntaxError',
+            message=f'{len(lst)} syntax error(s)')
+        failure.text = '\n'.join(f'{d.line}:{d.column}: {d.phase}: '
+                                  f'{d.message}' for d in lst)
+    etree.ElementTree(suite).write(file_path, encoding='utf-8',
+                                   xml_declaration=True, pretty_print=True)
+
+
+# PARSER WORKERS
+class _ParseWorker:
+    """A worker process that parses one source file at a time."""
+
+    __slots__ = ('process', 'conn', 'file_path', 'start_time', 'warming')
+
+    def __init__(self, include_private, warm_up_files=(), with_source=False,
+                 with_metrics=False):
+        """Start the worker process."""
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_parse_worker_main,
+            args=(child_conn, include_private, warm_up_files, with_source,
+                  with_metrics,
+                  _profiler.directory if _profiler is not None else None),
+            daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.file_path = None
+        # Warm-up files are timed from the start of the process
+        self.start_time = time.monotonic()
+        self.warming = len(warm_up_files)
+
+    def submit(self, file_path):
+        """Send a file to the worker for processing.
+
+        A worker still parsing its warm-up files keeps timing them, and
+        only starts timing the file once it is done with them (see
+        warmed).
+        """
+        self.file_path = file_path
+        if not self.warming:
+            self.start_time = time.monotonic()
+        self.conn.send(file_path)
+
+    def warmed(self):
+        """Record that the worker parsed one of its warm-up files."""
+        self.warming -= 1
+        self.start_time = time.monotonic()
+
+    def stop(self):
+        """Ask an idle worker to exit."""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        # Profiled workers need time to write their profile
+        self.process.join(timeout=1 if _profiler is None else 30)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        """Terminate the worker regardless of what it is doing."""
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+
+class _ParsePool:
+    """A pool of parser worker processes that can be cancelled.
+
+    Each worker is handed one file at a time. A worker exceeding the
+    per-file time budget is terminated and replaced, and the file is
+    reported as timed out instead of blocking the rest of the run.
+
+    The lexer and parser build their prediction DFA as they go, so the
+    first files parsed by a process are much slower than the rest. The
+    first warm_up files are therefore parsed one after the other by the
+    first worker, and those parsed successfully are then parsed first
+    by every other worker started, within the time budget, so that
+    they all handle their share of the files with a warm parser.
+    """
+
+    def __init__(self, jobs, include_private, time_budget=None, warm_up=0,
+                 with_source=False, with_metrics=False):
+        """Initialize the pool; workers are started lazily."""
+        self.jobs = max(1, jobs)
+        self.include_private = include_private
+        self.time_budget = time_budget
+        self.warm_up = warm_up
+        self.warm_up_files = ()
+        self.with_source = with_source
+        self.with_metrics = with_metrics
+
+    def _timeout(self, busy):
+        """Return the time to wait for the next worker to finish."""
+        if not self.time_budget or not busy:
+            return None
+        deadline = min(w.start_time for w in busy.values()) + \
+            self.time_budget
+        return max(0, deadline - time.monotonic())
+
+    def _cancel_warm_up(self, worker, requeued, reason):
+        """Give up warming workers after one failed to warm up.
+
+        The file handed to the worker was not parsed yet, so it is
+        handed to the next worker instead.
+        """
+        requeued.append(worker.file_path)
+        self.warm_up_files = ()
+        _logger.warning(f'A parser worker {reason} while warming up, the '
+                        'other workers start without warming up')
+
+    def map(self, file_paths):
+        """Parse the given files, yielding a ParseResult for each one.
+
+        Results are yielded in order of completion, those of the
+        warm-up files first.
+        """
+        pending = iter(file_paths)
+        warm_up = list(itertools.islice(pending, self.warm_up))
+        # The number of warm-up files not parsed yet
+        warming = len(warm_up)
+        warm_up_files = []
+        times = ([], [])
+        requeued = []
+        idle = []
+        busy = {}
+        start_time = time.monotonic()
+        try:
+            while True:
+                while len(busy) < (1 if warming else self.jobs):
+                    if warm_up:
+                        file_path = warm_up.pop(0)
+                    elif warming:
+                        break
+                    elif requeued:
+                        file_path = requeued.pop()
+                    else:
+                        file_path = next(pending, None)
+                        if file_path is None:
+                            break
+                    worker = (idle.pop() if idle
+                              else _ParseWorker(self.include_private,
+                                                self.warm_up_files,
+                                                self.with_source,
+                                                self.with_metrics))
+                    worker.submit(file_path)
+                    busy[worker.conn] = worker
+                if not busy:
+                    break
+                profiler = _profiler
+                if profiler is not None:
+                    profiler.pause()
+                ready = wait(list(busy), self._timeout(busy))
+                if profiler is not None:
+                    profiler.resume()
+                results = []
+                for conn in ready:
+                    worker = busy.pop(conn)
+                    try:
+                        message = conn.recv()
+                    except EOFError:
+                        exitcode = worker.process.exitcode
+                        worker.kill()
+                        if worker.warming:
+                            self._cancel_warm_up(
+                                worker, requeued,
+                                f'exited with code {exitcode}')
+                            continue
+                        results.append(ParseResult(
+                            worker.file_path, None,
+                            ('error', f'Worker exited with code {exitcode}'),
+                            time.monotonic() - worker.start_time, []))
+                        continue
+                    if message is None:
+                        worker.warmed()
+                        busy[conn] = worker
+                        continue
+                    app_class, error, elapsed, diagnostics = message
+                    idle.append(worker)
+                    results.append(ParseResult(worker.file_path, app_class,
+                                               error, elapsed, diagnostics))
+                if self.time_budget:
+                    now = time.monotonic()
+                    for conn, worker in list(busy.items()):
+                        elapsed = now - worker.start_time
+                        if elapsed < self.time_budget:
+                            continue
+                        del busy[conn]
+                        worker.kill()
+                        if worker.warming:
+                            self._cancel_warm_up(worker, requeued,
+                                                 'exceeded the time budget')
+                            continue
+                        results.append(ParseResult(
+                            worker.file_path, None,
+                            ('timeout', 'Time budget of '
+                             f'{self.time_budget:g} s exceeded'),
+                            elapsed, []))
+                for result in results:
+                    if warming:
+                        warming -= 1
+                        if not result.error:
+                            warm_up_files.append(result.file_path)
+                            times[0].append(result.elapsed)
+                        if not warming:
+                            self.warm_up_files = tuple(warm_up_files)
+                            _print_verbose(
+                                f'Parser warmed up on {len(warm_up_files)} '
+                                f'file(s) in '
+                                f'{(time.monotonic() - start_time):.1f} s.')
+                    elif not result.error:
+                        times[1].append(result.elapsed)
+                    yield result
+        finally:
+            for worker in busy.values():
+                worker.kill()
+            for worker in idle:
+                worker.stop()
+        if times[0] and times[1]:
+            _print_verbose(
+                'Mean parse time per file: '
+                f'{statistics.mean(times[0]) * 1000:.0f} ms for the '
+                f'{len(times[0])} warm-up file(s), '
+                f'{statistics.mean(times[1]) * 1000:.0f} ms for the '
+                f'{len(times[1])} other(s).')
+
+
+def _parse_worker_main(conn, include_private, warm_up_files=(),
+                       with_source=False, with_metrics=False,
+                       profile_dir=None):
+    """Run the parsing loop of a worker process.
+
+    Any warm-up files are parsed first, the parent being told as each
+    one is done by sending None. If a profile directory is given, the
+    worker is profiled and its profile written there when it is asked
+    to exit.
+    """
+    _reset_archives()
+    profile = None
+    if profile_dir:
+        profile = cProfile.Profile()
+        profile.enable()
+    for file_path in warm_up_files:
+        _parse_one(file_path, include_private)
+        conn.send(None)
+    while True:
+        try:
+            file_path = conn.recv()
+        except EOFError:
+            break
+        if file_path is None:
+            break
+        conn.send(_parse_one(file_path, include_private,
+                             with_source=with_source,
+                             with_metrics=with_metrics)[1:])
+    if profile is not None:
+        profile.disable()
+        _dump_profile(profile, os.path.join(profile_dir,
+                                            f'worker-{os.getpid()}.prof'))
+
+
+# CLASS SPOOL
+class _ClassSpool:
+    """A container for the parsed Application Classes.
+
+    By default all classes are kept in memory as a single batch. If a
+    batch size is given, classes are pickled to a spill directory every
+    batch_size classes, along with their type usages and imports, and
+    only the class descriptors, symbols, superclasses and source file
+    times needed to resolve hierarchies are kept in memory.
+
+    If a shard directory is given, batches are written to it instead of
+    a temporary directory, and the spool can be saved there as a shard
+    for a later merge with other shards.
+
+    The metrics flag tells whether the classes were parsed with their
+    Metrics.
+    """
+
+    def __init__(self, batch_size=None, spill_dir=None, shard_dir=None):
+        """Initialize the spool."""
+        self.batch_size = batch_size
+        self.spill_dir = spill_dir
+        self.shard_dir = shard_dir
+        self.batch = []
+        self.batch_files = []
+        self.index_files = []
+        self.descriptors = []
+        self.superclass_index = {}
+        self.symbols = {}
+        self.type_usages = []
+        self.imports = {}
+        self.sources = {}
+        self.metrics = False
+        self._temp_dir = None
+
+    @property
+    def is_spilled(self):
+        """Return whether classes are spilled to disk in batches."""
+        return bool(self.batch_size)
+
+    def __len__(self):
+        """Return the number of classes in the spool."""
+        return len(self.descriptors)
+
+    def add(self, app_class):
+        """Add an Application Class to the spool."""
+        app_class.register()
+        descr = ClassDescr(app_class.package, app_class.name, app_class.type,
+                           is_abstract=app_class.is_abstract)
+        self.descriptors.append(descr)
+        self.symbols[app_class.fqcn.lower()] = descr
+        self.type_usages.extend(app_class.get_type_usages())
+        if app_class.imports:
+            self.imports[app_class.fqcn.lower()] = app_class.imports
+        superclass = app_class.superclass
+        if superclass:
+            item = SuperclassIndexItem(app_class.fqcn, superclass)
+            self.superclass_index[item.fqcn.lower()] = item
+        self.batch.append(app_class)
+        if self.is_spilled and len(self.batch) >= self.batch_size:
+            self.spill()
+
+    def spill(self):
+        """Write the current batch and its indexes to disk and release it.
+
+        The type usages and imports of the batch are written apart, so
+        that they can be read back without the classes.
+        """
+        if self.batch:
+            if self.shard_dir:
+                directory = self.shard_dir
+            else:
+                if self._temp_dir is None:
+                    self._temp_dir = tempfile.TemporaryDirectory(
+                        prefix='appclassdoc-', dir=self.spill_dir)
+                directory = self._temp_dir.name
+            number = len(self.batch_files)
+            file_path = os.path.join(directory, f'batch-{number:05}.pkl')
+            with open(file_path, 'wb') as file:
+                pickle.dump(self.batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.batch_files.append(file_path)
+            self.batch = []
+            file_path = os.path.join(directory, f'index-{number:05}.pkl')
+            with open(file_path, 'wb') as file:
+                pickle.dump((self.type_usages, self.imports), file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            self.index_files.append(file_path)
+            self.type_usages = []
+            self.imports = {}
+
+    def batches(self):
+        """Generate the batches of Application Classes in the spool."""
+        if self.is_spilled:
+            self.spill()
+            for file_path in self.batch_files:
+                with open(file_path, 'rb') as file:
+                    yield pickle.load(file)
+        elif self.batch:
+            yield self.batch
+
+    def _indexes(self):
+        """Generate the type usages and imports of every batch."""
+        if self.is_spilled:
+            self.spill()
+            for file_path in self.index_files:
+                with open(file_path, 'rb') as file:
+                    yield pickle.load(file)
         else:
-            parse_errors += 1
-            _logger.warning(f'File "{file_path}" does not appear to contain a '
-                            'class definition')
-    if parse_errors > 0:
-        error_text = f', {parse_errors} parse error(s),'
-    else:
-        error_text = ''
-    _print_verbose(f'{len(app_classes)} class(es) parsed successfully'
-                   f'{error_text} in {(time.time() - start_time):.1f} s.')
-    if app_classes:
-        start_time = time.time()
-        _print_verbose('Resolving class hierarchies...', end='', flush=True)
-        app_classes.sort(key=lambda c: f'{c.name}:{c.package_name}')
-        superclass_index = []
-        for app_class in app_classes:
-            superclass = app_class.superclass
-            if superclass:
-                item = SuperclassIndexItem(app_class.fqcn, superclass)
-                superclass_index.append(item)
-            subclasses = AppClass.find_subclasses_by_fqcn(app_class.fqcn)
-            if subclasses:
-                app_class.subclasses = subclasses
-            app_class.sort_members()
-        # Resolve superclasses using superclass_index
-        for app_class in _app_classes_with_superclass(app_classes):
-            superclass_list = _get_superclasses_for_class(superclass_index,
-                                                          app_class.superclass)
-            if superclass_list:
-                app_class.superclasses += superclass_list
-        _print_verbose(f' Done in {(time.time() - start_time):.1f} s.')
-        api_dir = os.path.join(outputdir, 'api')
-        resources_dir = os.path.join(outputdir, 'resources')
-        pkg_idx_file = os.path.join(outputdir, 'packages.html')
-        cls_idx_file_frame = os.path.join(outputdir, 'classes-frame.html')
-        cls_idx_file_noframe = os.path.join(outputdir, 'classes-noframe.html')
-        if do_deletes:
-            # Delete API directory and index files
-            start_time = time.time()
-            _print_verbose('Deleting existing files (if found)...', end='',
-                           flush=True)
-            _remove_dir(api_dir)
-            _remove_dir(resources_dir)
-            if os.path.exists(pkg_idx_file):
-                os.remove(pkg_idx_file)
-            if os.path.exists(cls_idx_file_frame):
-                os.remove(cls_idx_file_frame)
-            if os.path.exists(cls_idx_file_noframe):
-                os.remove(cls_idx_file_noframe)
-            _print_verbose(f' Done in {(time.time() - start_time):.1f} s.')
-        # Produce per-class files
-        start_time = time.time()
-        _print_verbose('Writing files...', end='', flush=True)
-        for app_class in app_classes:
-            _write_class_file_html(outputdir, app_class)
-        _print_verbose(f' Done in {(time.time() - start_time):.1f} s.')
-        # Produce indexes
-        start_time = time.time()
-        _print_verbose('Writing indexes...', end='', flush=True)
-        _write_class_index(app_classes, cls_idx_file_frame,
-                           target='classFrame')
-        _write_class_index(app_classes, cls_idx_file_noframe)
-        packages = sorted(AppClass.package_index.keys())
-        _write_package_index(packages, pkg_idx_file)
-        for pkg in packages:
-            _write_package_overview(pkg, os.path.join(api_dir,
-                                    *pkg.split(sep=':'), '0package.html'))
-        if not os.path.exists(resources_dir):
-            resources_src = resource_filename(__name__, 'resources')
-            shutil.copytree(resources_src, resources_dir)
-            os.replace(os.path.join(resources_dir, 'index.html'),
-                       os.path.join(outputdir, 'index.html'))
-            os.replace(os.path.join(resources_dir, 'start-page.html'),
-                       os.path.join(outputdir, 'start-page.html'))
-        _print_verbose(f' Done in {(time.time() - start_time):.1f} s.')
-    else:
-        _logger.warning('No classes found')
+            yield self.type_usages, self.imports
 
+    def all_type_usages(self):
+        """Generate the type usages of all the classes in the spool.
 
-def appclassdoc_cli():
-    """The CLI for AppClassDoc."""
-    assert sys.version_info >= (3, 6), \
-           'Python 3.6+ is required to run this script'
-    parser = argparse.ArgumentParser(
-        description=('Generate API documentation for PeopleSoft Application '
-                     'Classes.'))
-    parser.add_argument(
-        '-v', '--verbosity', action='count', default=0,
+        These are (key, TypeUsage) tuples as yielded by get_type_usages.
+        """
+        for type_usages, _ in self._indexes():
+            yield from type_usages
+
+    def all_imports(self):
+        """Generate the imports of all the classes in the spool.
+
+        These are (key, imports) tuples, key being the lowercase fully
+        qualified name of a class with imports.
+        """
+        for _, imports in self._indexes():
+            yield from imports.items()
+
+    def close(self):
+        """Delete any spilled batches, unless they belong to a shard."""
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+        self.batch_files = []
+        self.index_files = []
+
+    def save(self, include_private):
+        """Save the spool to its shard directory.
+
+        Besides the batches of classes and their indexes, the shard
+        holds the lightweight data of the spool and the shard's
+        contributions to the class-level package and subclass indexes.
+        """
+        self.spill()
+        shard = {'format': _shard_format,
+                 'private': include_private,
+                 'metrics': self.metrics,
+                 'batch_size': self.batch_size,
+                 'batch_files': [os.path.basename(f)
+                                 for f in self.batch_files],
+                 'index_files': [os.path.basename(f)
+                                 for f in self.index_files],
+                 'descriptors': self.descriptors,
+                 'superclass_index': self.superclass_index,
+                 'symbols': self.symbols,
+                 'sources': self.sources,
+                 'package_index': dict(AppClass.package_index),
+                 'subclass_index': AppClass.subclass_index}
+        file_path = os.path.join(self.shard_dir, _shard_file)
+        with open(f'{file_path}.tmp', 'wb') as file:
+            pickle.dump(shard, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{file_path}.tmp', file_path)
+
+    @classmethod
+    def merge(cls, shard_dirs):
+        """Return a spool combining the contents of several shards.
+
+        The shards' contributions are added to the class-level package
+        and subclass indexes, and their batches are read in place, with
+        the largest batch size of the shards. Returns a tuple with the
+        spool and whether private members were included in the shards.
+        The spool holds metrics if all the shards do.
+        """
+        spool = cls(batch_size=1)
+        spool.metrics = True
+        include_private = None
+        for shard_dir in shard_dirs:
+            file_path = os.path.join(shard_dir, _shard_file)
+            with open(file_path, 'rb') as file:
+                shard = pickle.load(file)
+            if shard.get('format') != _shard_format:
+                raise ValueError(f'"{file_path}" is not a supported shard')
+            if include_private is None:
+                include_private = shard['private']
+            elif include_private != shard['private']:
+                raise ValueError('Shards disagree on the inclusion of private '
+                                 'members')
+            for key in shard['symbols']:
+                if key in spool.symbols:
+                    _logger.warning(f'Class "{key}" found in more than one '
+                                    f'shard (again in "{shard_dir}")')
+            spool.batch_size = max(spool.batch_size,
+                                   shard['batch_size'] or 1)
+            spool.batch_files.extend(os.path.join(shard_dir, f)
+                                     for f in shard['batch_files'])
+            spool.index_files.extend(os.path.join(shard_dir, f)
+                                     for f in shard['index_files'])
+            spool.descriptors.extend(shard['descriptors'])
+            spool.superclass_index.update(shard['superclass_index'])
+            spool.symbols.update(shard['symbols'])
+            spool.sources.update(shard['sources'])
+            spool.metrics = spool.metrics and shard['metrics']
+            for package, lst in shard['package_index'].items():
+                AppClass.package_index[package].extend(lst)
+            for fqcn, lst in shard['subclass_index'].items():
+                AppClass.subclass_index.setdefault(fqcn, []).extend(lst)
+        return spool, bool(include_private)
+
+
+class _ParseCache:
+    """A cache of parsed classes, keyed by the contents of their files.
+
+    The name of a file is part of its key, as it determines the package
+    of its class. Classes are kept pickled, so that every caller gets
+    its own copy to resolve. Files without a class definition are
+    remembered as well.
+    """
+
+    def __init__(self):
+        """Initialize the cache."""
+        self.keys = {}
+        self.classes = {}
+
+    def get(self, file_path):
+        """Look up the contents of a file.
+
+        Returns a tuple with whether they were parsed before and the
+        class parsed from them, if any.
+        """
+        digest = hashlib.sha1(os.path.basename(file_path).encode())
+        digest.update(_read_source(file_path))
+        key = digest.hexdigest()
+        self.keys[file_path] = key
+        if key not in self.classes:
+            return False, None
+        data = self.classes[key]
+        return True, pickle.loads(data) if data else None
+
+    def add(self, file_path, app_class):
+        """Remember the class parsed from a file looked up before."""
+        key = self.keys.pop(file_path, None)
+        if key:
+            self.classes[key] = pickle.dumps(
+                app_class, protocol=pickle.HIGHEST_PROTOCOL) \
+                if app_class else None
+
+
+# BUILD MANIFEST
+class _ManifestWriter:
+    """A streaming writer for the build manifest.
+
+    The manifest records the fingerprints of every class written, so
+    that two builds can be compared without parsing or rendering them
+    again, and the files of the api and source directories that belong
+    to the site, along with their precompressed siblings, so that any
+    other file found there is known to be an orphan. Entries are written
+    as classes are processed, the file list going to a temporary file
+    of its own until the manifest is closed, so memory use does not
+    depend on the size of the corpus.
+    """
+
+    def __init__(self, outputdir, include_private, compress=()):
+        """Open the manifest and write its header."""
+        self.file_path = os.path.join(outputdir, _manifest_file)
+        self.temp_path = f'{self.file_path}.tmp'
+        self.file = open(self.temp_path, 'w', encoding='utf-8')
+        self.file.write(f'{{"format": {_manifest_format}, '
+                        f'"private": {json.dumps(include_private)}, '
+                        '"classes": {')
+        self.count = 0
+        self.compress = compress
+        self.files = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.file_count = 0
+
+    def add_class(self, app_class):
+        """Write the manifest entry of an Application Class."""
+        sep = ',' if self.count else ''
+        entry = json.dumps(app_class.get_manifest_entry(), sort_keys=True)
+        self.file.write(f'{sep}\n{json.dumps(app_class.fqcn)}: {entry}')
+        self.count += 1
+
+    def add_file(self, path):
+        """List a file of the site, given as a path relative to it."""
+        for file_path in (path, *(f'{path}.{ext}' for ext in self.compress)):
+            sep = ',' if self.file_count else ''
+            self.files.write(f'{sep}\n{json.dumps(file_path)}')
+            self.file_count += 1
+
+    def close(self):
+        """Finish the manifest and move it into place."""
+        self.file.write('\n}, "files": [')
+        self.files.seek(0)
+        shutil.copyfileobj(self.files, self.file)
+        self.files.close()
+        self.file.write('\n]}\n')
+        self.file.close()
+        os.replace(self.temp_path, self.file_path)
+
+
+def _add_manifest_files(manifest, app_class, html):
+    """List the pages of a class in the build manifest.
+
+    The source page is listed if the class still links to one, which
+    it only does if it was written by this build or an earlier one.
+    """
+    if html:
+        manifest.add_file(_get_class_page(app_class.package, app_class.name))
+    if app_class.source:
+        manifest.add_file('/'.join([_source_dir, *app_class.package,
+                                    f'{app_class.name}.html']))
+
+
+def _load_manifest(path):
+    """Load a build manifest from a file or an output directory."""
+    if os.path.isdir(path):
+        path = os.path.join(path, _manifest_file)
+    with open(path, encoding='utf-8') as file:
+        manifest = json.load(file)
+    if manifest.get('format') != _manifest_format:
+        raise ValueError(f'"{path}" is not a supported build manifest')
+    return manifest
+
+
+def _diff_members(old_members, new_members):
+    """Compare the member entries of two versions of a class."""
+    added = []
+    removed = []
+    changed = []
+    for key, member in new_members.items():
+        old_member = old_members.get(key)
+        if old_member is None:
+            added.append(dict(member, key=key))
+        elif old_member['fingerprint'] != member['fingerprint']:
+            changed.append({'key': key, 'scope': member['scope'],
+                            'old': old_member['signature'],
+                            'new': member['signature']})
+    for key, member in old_members.items():
+        if key not in new_members:
+            removed.append(dict(member, key=key))
+    for lst in (added, removed, changed):
+        lst.sort(key=lambda m: m['key'].lower())
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def _diff_manifests(old, new):
+    """Return the API changes between two build manifests.
+
+    Only classes whose overall fingerprint differs are compared member
+    by member, so the time taken is proportional to the number of
+    classes plus the number of members of the changed classes.
+    """
+    old_classes = old['classes']
+    new_classes = new['classes']
+    added = []
+    changed = []
+    for fqcn, entry in new_classes.items():
+        old_entry = old_classes.get(fqcn)
+        if old_entry is None:
+            added.append({'class': fqcn, 'type': entry['type']})
+        elif old_entry['fingerprint'] != entry['fingerprint']:
+            item = {'class': fqcn, 'type': entry['type'],
+                    'declaration': (old_entry['declaration']
+                                    != entry['declaration'])}
+            item.update(_diff_members(old_entry['members'],
+                                      entry['members']))
+            changed.append(item)
+    removed = [{'class': fqcn, 'type': entry['type']}
+               for fqcn, entry in old_classes.items()
+               if fqcn not in new_classes]
+    for lst in (added, removed, changed):
+        lst.sort(key=lambda c: c['class'].lower())
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def _get_diff_xml(report, old_name, new_name):
+    """Return an XML representation of an API change report."""
+    node = etree.Element('diff', old=old_name, new=new_name)
+    for status in ('added', 'removed'):
+        status_node = etree.SubElement(node, status)
+        for item in report[status]:
+            etree.SubElement(status_node, 'class',
+                             type=item['type']).text = item['class']
+    changed_node = etree.SubElement(node, 'changed')
+    for item in report['changed']:
+        c_node = etree.SubElement(changed_node, 'class', type=item['type'],
+                                  name=item['class'])
+        if item['declaration']:
+            c_node.set('declaration', 'true')
+        for status in ('added', 'removed', 'changed'):
+            for member in item[status]:
+                m_node = etree.SubElement(c_node, 'member', status=status,
+                                          scope=member['scope'],
+                                          key=member['key'])
+                if status == 'changed':
+                    etree.SubElement(m_node, 'old').text = member['old']
+                    etree.SubElement(m_node, 'new').text = member['new']
+                else:
+                    etree.SubElement(m_node, 'new').text = member['signature']
+    return node
+
+
+# LINK CHECK
+def _get_class_page(package, name):
+    """Return the path of a class page, relative to the output directory.
+
+    package is the list of the parts of the package name.
+    """
+    return '/'.join(['api', *package, f'{name}.html'])
+
+
+def _get_member_anchors(members):
+    """Return the anchors of a class page that other pages link to.
+
+    members are the member entries of the class in the build manifest.
+    """
+    anchors = set()
+    for key, member in members.items():
+        kind, _, name = key.partition(':')
+        if kind == 'constructor':
+            anchors.add('rDetail')
+        elif kind == 'method':
+            anchors.add(f'm{name}')
+        elif kind == 'property' and member['scope'] == 'private':
+            anchors.add(f'i{name[1:]}')
+        elif kind == 'property':
+            anchors.add(f'p{name}')
+    return anchors
+
+
+def _get_class_links(app_class, resources):
+    """Return the targets of the links of a resolved class's page.
+
+    These are the links rendered by class.xsl from AppClass.get_xml,
+    derived from the model directly, as building the XML of every class
+    would take longer than checking the links. resources are the paths
+    of the stylesheet and script. Targets are relative to the output
+    directory, and may end with an anchor. Links within the page itself
+    are left out.
+    """
+    links = {'start-page.html', 'index.html', 'classes-noframe.html',
+             '/'.join(['api', *app_class.package, _package_tree_file])}
+    links.update(f'resources/{resource}' for resource in resources)
+    for sup in app_class.superclasses:
+        if sup.package:
+            links.add(_get_class_page(sup.package, sup.name))
+    for sub in app_class.subclasses:
+        links.add(_get_class_page(sub.package, sub.name))
+    key = app_class.fqcn.lower()
+    for usage in AppClass.usage_index.get(key, ()):
+        links.add(f'{_get_class_page(usage.package, usage.name)}'
+                  f'#{usage.anchor}')
+    graph = AppClass.dependency_graph
+    for path in app_class.imports:
+        path = path.lower()
+        if path.endswith(':*') and path[:-2] in graph.packages:
+            links.add('/'.join(['api',
+                                *graph.packages[path[:-2]].split(sep=':'),
+                                '0package.html']))
+        elif path in graph.names:
+            *package, name = graph.names[path].split(sep=':')
+            links.add(_get_class_page(package, name))
+    if key in graph.names:
+        for fqcn in graph.get_importers(app_class.fqcn):
+            *package, name = fqcn.split(sep=':')
+            links.add(_get_class_page(package, name))
+    types = [prop.type for prop in app_class.properties]
+    for method in itertools.chain([app_class.constructor],
+                                  app_class.methods):
+        if method:
+            types.extend(arg.type for arg in method.args or ())
+            types.append(method.type)
+    symbols = AppClass.symbol_table
+    for the_type in types:
+        if the_type and the_type.package \
+                and the_type.fqcn.lower() in symbols:
+            links.add(_get_class_page(the_type.package, the_type.name))
+    if app_class.source:
+        links.add('/'.join([_source_dir, *app_class.package,
+                            f'{app_class.name}.html']))
+    return links
+
+
+class _LinkChecker:
+    """A checker of the links between the pages of a generated site.
+
+    The pages expected in the site are the class and package pages of
+    the classes in its build manifest, and the links checked are those
+    rendered from the model, so no HTML is parsed. Every link must lead
+    to an expected page found on disk and, if it has an anchor, to a
+    member of the class in the manifest. The files found in the api and
+    source directories that are not listed in the manifest are orphans,
+    left over by earlier executions. Manifests written before files were
+    listed in them are taken to list the expected pages, along with
+    their precompressed siblings.
+    """
+
+    def __init__(self, outputdir, manifest):
+        """Index the expected pages and the files of the site."""
+        self.outputdir = outputdir
+        self.expected = set()
+        self.anchors = {}
+        self.packages = set()
+        for fqcn, entry in manifest['classes'].items():
+            *package, name = fqcn.split(sep=':')
+            page = _get_class_page(package, name)
+            self.expected.add(page)
+            self.anchors[page] = _get_member_anchors(entry['members'])
+            self.packages.add(tuple(package))
+        for package in self.packages:
+            path = '/'.join(['api', *package])
+            self.expected.add(f'{path}/0package.html')
+            self.expected.add(f'{path}/{_package_tree_file}')
+        self.files = set(manifest['files']) if 'files' in manifest else None
+        self.found = set()
+        for directory in ('api', _source_dir):
+            for base_dir, _, file_names in os.walk(
+                    os.path.join(outputdir, directory)):
+                path = os.path.relpath(base_dir, outputdir).replace(os.sep,
+                                                                    '/')
+                self.found.update(f'{path}/{file_name}'
+                                  for file_name in file_names)
+        self.static = {}
+        self.links = 0
+        self.broken = []
+
+    def _exists(self, path):
+        """Return whether a file of the site exists."""
+        if path.startswith(('api/', f'{_source_dir}/')):
+            return path in self.found
+        exists = self.static.get(path)
+        if exists is None:
+            exists = os.path.isfile(os.path.join(self.outputdir,
+                                                 *path.split('/')))
+            self.static[path] = exists
+        return exists
+
+    def check(self, page, targets):
+        """Check the links of a page to the given targets."""
+        for target in targets:
+            self.links += 1
+            path, _, anchor = target.partition('#')
+            if not self._exists(path):
+                reason = 'missing'
+            elif path.startswith(('api/', f'{_source_dir}/')) \
+                    and path not in self.expected:
+                reason = 'stale'
+            elif anchor and anchor not in self.anchors.get(path, ()):
+                reason = 'anchor'
+            else:
+                continue
+            self.broken.append(BrokenLink(page, target, reason))
+
+    def get_missing(self):
+        """Return the expected pages not found on disk."""
+        return sorted(self.expected.difference(self.found))
+
+    def get_orphans(self):
+        """Return the files found on disk that do not belong to the site."""
+        if self.files is not None:
+            return sorted(self.found.difference(self.files))
+        orphans = []
+        for path in self.found.difference(self.expected):
+            root, ext = os.path.splitext(path)
+            if ext[1:] not in _compressors or root not in self.expected:
+                orphans.append(path)
+        return sorted(orphans)
+
+
+# DEPENDENCY GRAPH
+class DependencyGraph:
+    """The import dependencies between Application Classes.
+
+    There is an edge from every class to each known class it imports,
+    wildcard imports standing for every class in the package. Classes
+    are looked up by fully qualified name, regardless of case. Every
+    build writes the graph to dependency-graph.json (and .dot) in the
+    output directory, from where it can be loaded again.
+    """
+
+    def __init__(self, names, edges):
+        """Create the graph.
+
+        names maps the lowercase fully qualified name of every class to
+        its actual name, and edges maps it to the list of (lowercase)
+        classes it imports.
+        """
+        self.names = names
+        self.edges = edges
+        self.packages = {fqcn.rsplit(':', 1)[0].lower():
+                         fqcn.rsplit(':', 1)[0] for fqcn in names.values()}
+        self._importers = None
+
+    @classmethod
+    def build(cls, symbols, imports):
+        """Build the graph from the imports of the known classes.
+
+        symbols is a dictionary of ClassDescr keyed by lowercase fully
+        qualified name, and imports an iterable of (key, imports) tuples
+        with the imports of each class, as written, keyed likewise.
+        Imports of unknown classes or packages are left out, as are
+        those of the class itself.
+        """
+        names = {}
+        packages = defaultdict(list)
+        edges = {}
+        for key, descr in symbols.items():
+            names[key] = descr.fqcn
+            packages[descr.package_name.lower()].append(key)
+            edges[key] = []
+        for key, paths in imports:
+            if key not in edges:
+                continue
+            targets = set()
+            for path in paths:
+                path = path.lower()
+                if path.endswith(':*'):
+                    targets.update(packages.get(path[:-2], ()))
+                elif path in symbols:
+                    targets.add(path)
+            targets.discard(key)
+            edges[key] = sorted(targets)
+        return cls(names, edges)
+
+    @classmethod
+    def load(cls, path):
+        """Load a graph from a file or an output directory."""
+        if os.path.isdir(path):
+            path = os.path.join(path, _graph_file)
+        with open(path, encoding='utf-8') as file:
+            try:
+                data = json.load(file)
+            except ValueError:
+                data = {}
+        if not isinstance(data, dict) or data.get('format') != _graph_format:
+            raise ValueError(f'"{path}" is not a supported dependency graph')
+        classes = data['classes']
+        names = {fqcn.lower(): fqcn for fqcn in classes}
+        edges = {fqcn.lower(): [i.lower() for i in imports]
+                 for fqcn, imports in classes.items()}
+        return cls(names, edges)
+
+    def _key(self, fqcn):
+        """Return the key of a class, which must be in the graph."""
+        key = fqcn.lower()
+        if key not in self.names:
+            raise ValueError(f'Class "{fqcn}" not found in the dependency '
+                             'graph')
+        return key
+
+    def _sorted_names(self, keys):
+        """Return the names of the given classes, sorted."""
+        return sorted((self.names[key] for key in keys), key=str.lower)
+
+    def get_imports(self, fqcn):
+        """Return the classes imported by a class."""
+        return self._sorted_names(self.edges.get(self._key(fqcn), ()))
+
+    def _get_importers(self):
+        """Return the reverse edges, indexing them on first use."""
+        if self._importers is None:
+            self._importers = defaultdict(list)
+            for key, targets in self.edges.items():
+                for target in targets:
+                    self._importers[target].append(key)
+        return self._importers
+
+    def get_importers(self, fqcn):
+        """Return the classes importing a class."""
+        return self._sorted_names(
+            self._get_importers().get(self._key(fqcn), ()))
+
+    def get_impact(self, classes, max_depth=None):
+        """Return the classes transitively affected by changes to others.
+
+        These are the classes importing any of the given classes,
+        directly or through others, up to max_depth imports away if
+        given. Returns a list of (fqcn, distance) tuples, sorted by
+        distance and name, found by a breadth-first search over the
+        reverse edges, in time linear in the size of the graph.
+        """
+        importers = self._get_importers()
+        distances = {self._key(fqcn): 0 for fqcn in classes}
+        frontier = list(distances)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for key in frontier:
+                for importer in importers.get(key, ()):
+                    if importer not in distances:
+                        distances[importer] = depth
+                        next_frontier.append(importer)
+            frontier = next_frontier
+        return sorted(((self.names[key], distance)
+                       for key, distance in distances.items() if distance),
+                      key=lambda item: (item[1], item[0].lower()))
+
+    def get_components(self):
+        """Return the strongly connected components of the graph.
+
+        Uses Tarjan's algorithm, in time linear in the size of the
+        graph, iteratively so that long import chains do not exhaust
+        the stack. Components are sorted lists of class names, given in
+        reverse topological order: each only imports classes in itself
+        or in components before it.
+        """
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in sorted(self.edges):
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.edges[root]))]
+            while work:
+                node, targets = work[-1]
+                for target in targets:
+                    if target not in index:
+                        index[target] = lowlink[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.edges.get(target,
+                                                                 ()))))
+                        break
+                    elif target in on_stack:
+                        lowlink[node] = min(lowlink[node], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            key = stack.pop()
+                            on_stack.discard(key)
+                            component.append(key)
+                            if key == node:
+                                break
+                        components.append(self._sorted_names(component))
+        return components
+
+    def get_cycles(self):
+        """Return the components of more than one class (import cycles)."""
+        return [c for c in self.get_components() if len(c) > 1]
+
+    def get_json(self, cycles=None):
+        """Return a JSON-friendly representation of the graph.
+
+        cycles is the list of import cycles, if already found.
+        """
+        if cycles is None:
+            cycles = self.get_cycles()
+        classes = OrderedDict(
+            (fqcn, self._sorted_names(self.edges.get(fqcn.lower(), ())))
+            for fqcn in self._sorted_names(self.names))
+        return {'format': _graph_format, 'classes': classes,
+                'cycles': cycles}
+
+    def get_dot(self):
+        """Return a Graphviz (DOT) representation of the graph."""
+        lines = ['digraph imports {', '  node [shape=box];']
+        for fqcn in self._sorted_names(self.names):
+            node = json.dumps(fqcn)
+            lines.append(f'  {node};')
+            for target in self._sorted_names(self.edges.get(fqcn.lower(),
+                                                             ())):
+                lines.append(f'  {node} -> {json.dumps(target)};')
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+
+# CLASS HIERARCHY
+class _ClassHierarchy:
+    """The forest of all classes by superclass, for the tree pages.
+
+    Every class hangs from its superclass (or the interface it
+    implements), and classes whose superclass is not documented hang
+    from a placeholder root named after it. The forest is built in a
+    single pass over the lightweight data of the spool, and pages are
+    streamed to disk as the trees are walked, so that no document tree
+    is ever built for them.
+    """
+
+    def __init__(self, symbols, superclass_index):
+        """Build the forest from the known classes and superclasses."""
+        self.symbols = symbols
+        self.parents = {}
+        self.children = defaultdict(list)
+        self.placeholders = {}
+        self.packages = defaultdict(list)
+        self.roots = []
+        for key, descr in symbols.items():
+            self.packages[descr.package_name].append(key)
+            item = superclass_index.get(key)
+            if item is None:
+                self.roots.append(key)
+                continue
+            parent = item.superclass.fqcn.lower()
+            self.parents[key] = parent
+            self.children[parent].append(key)
+            if parent not in symbols:
+                if parent not in self.placeholders:
+                    self.placeholders[parent] = [item.superclass.fqcn,
+                                                 'class']
+                    self.roots.append(parent)
+                if item.superclass.verb == 'implements' \
+                        or descr.type == 'interface':
+                    self.placeholders[parent][1] = 'interface'
+        self._break_cycles()
+        for lst in self.children.values():
+            lst.sort(key=self._sort_key)
+        self.roots.sort(key=self._sort_key)
+
+    def _break_cycles(self):
+        """Turn a class of every (invalid) inheritance cycle into a root.
+
+        Classes that cannot be reached from the roots are on, or below,
+        a cycle; each cycle is found by walking up from one of them.
+        """
+        reached = set()
+        self._reach(self.roots, reached)
+        if len(reached) == len(self.symbols) + len(self.placeholders):
+            return
+        for key in sorted(self.symbols):
+            if key in reached:
+                continue
+            while key not in reached:
+                reached.add(key)
+                key = self.parents[key]
+            self.children[self.parents.pop(key)].remove(key)
+            self.roots.append(key)
+            self._reach([key], reached)
+
+    def _reach(self, keys, reached):
+        """Add the given classes and their descendants to reached."""
+        stack = list(keys)
+        while stack:
+            key = stack.pop()
+            reached.add(key)
+            stack.extend(self.children.get(key, ()))
+
+    def _sort_key(self, key):
+        """Return the key by which to sort a class among its siblings."""
+        descr = self.symbols.get(key)
+        if descr is None:
+            return self.placeholders[key][0].lower()
+        return descr.sort_key.lower()
+
+    def _get_kind(self, key):
+        """Return whether the tree of a root is of classes or interfaces."""
+        descr = self.symbols.get(key)
+        return descr.type if descr else self.placeholders[key][1]
+
+    def get_ancestry(self, package):
+        """Return the classes of a package along with their ancestors."""
+        keys = set()
+        for key in self.packages[package]:
+            while key is not None and key not in keys:
+                keys.add(key)
+                key = self.parents.get(key)
+        return keys
+
+    def write_html(self, file, title, root_path, api_path, page,
+                   package=None):
+        """Write a tree page as HTML.
+
+        root_path is the relative path to the output directory, api_path
+        that to the api directory and page the path of the page within
+        the output directory. If a package is given, only its classes
+        and their ancestors are included.
+        """
+        keys = self.get_ancestry(package) if package else None
+        names = AppClass.resource_names
+        stylesheet = names.get('stylesheet.css', 'stylesheet.css')
+        script = names.get('script.js', 'script.js')
+        newline = '\n' if _pretty_print else ''
+        with etree.htmlfile(file, encoding='utf-8') as xf:
+            with xf.element('html', lang='en'):
+                head = etree.Element('head')
+                etree.SubElement(head, 'meta', {
+                    'http-equiv': 'Content-Type',
+                    'content': 'text/html; charset=utf-8'})
+                etree.SubElement(head, 'title').text = \
+                    f'{title} (PeopleSoft API)'
+                etree.SubElement(head, 'link', rel='stylesheet',
+                                 type='text/css', title='Style',
+                                 href=f'{root_path}resources/{stylesheet}')
+                etree.SubElement(head, 'script', type='text/javascript',
+                                 src=f'{root_path}resources/{script}').text \
+                    = '/**/'
+                xf.write(head, pretty_print=_pretty_print)
+                with xf.element('body'):
+                    for node in self._get_navbar(root_path, page):
+                        xf.write(node, pretty_print=_pretty_print)
+                    header = etree.Element('div', {'class': 'header'})
+                    etree.SubElement(header, 'h1', {'class': 'title'}).text \
+                        = title
+                    if package:
+                        etree.SubElement(header, 'span', {
+                            'class': 'packageHierarchyLabel'}).text = \
+                            'Package Hierarchies:'
+                        ul = etree.SubElement(header, 'ul',
+                                              {'class': 'horizontal'})
+                        etree.SubElement(etree.SubElement(ul, 'li'), 'a',
+                                         href=f'{root_path}{_tree_file}') \
+                            .text = 'All Packages'
+                    xf.write(header, pretty_print=_pretty_print)
+                    with xf.element('div', {'class': 'contentContainer'}):
+                        for kind, heading in (('class', 'Class Hierarchy'),
+                                              ('interface',
+                                               'Interface Hierarchy')):
+                            roots = [key for key in self.roots
+                                     if self._get_kind(key) == kind
+                                     and (keys is None or key in keys)]
+                            if roots:
+                                xf.write(newline)
+                                h2 = etree.Element('h2', title=heading)
+                                h2.text = heading
+                                xf.write(h2)
+                                self._write_trees(xf, roots, keys, api_path,
+                                                  newline)
+                xf.write(newline)
+
+    def _write_trees(self, xf, roots, keys, api_path, newline):
+        """Write the trees under the given roots as nested lists.
+
+        The trees are walked with an explicit stack, so that their depth
+        is not limited by that of the Python stack.
+        """
+        ul = xf.element('ul')
+        ul.__enter__()
+        stack = [(ul, None, iter(roots))]
+        while stack:
+            ul, li, keys_left = stack[-1]
+            key = next(keys_left, None)
+            if key is None:
+                stack.pop()
+                xf.write(newline)
+                ul.__exit__(None, None, None)
+                if li is not None:
+                    li.__exit__(None, None, None)
+                continue
+            if keys is not None and key not in keys:
+                continue
+            xf.write(newline)
+            li = xf.element('li', type='circle')
+            li.__enter__()
+            self._write_label(xf, key, api_path)
+            children = self.children.get(key)
+            if children:
+                ul = xf.element('ul')
+                ul.__enter__()
+                stack.append((ul, li, iter(children)))
+            else:
+                li.__exit__(None, None, None)
+
+    def _write_label(self, xf, key, api_path):
+        """Write the name of a class, linked to its page if documented."""
+        descr = self.symbols.get(key)
+        if descr is None:
+            xf.write(self.placeholders[key][0])
+            return
+        package = descr.package_name
+        xf.write(f'{package}:')
+        a = etree.Element('a', title=f'{descr.type} in {package}',
+                          href=f'{api_path}{"/".join(descr.package)}/'
+                               f'{descr.name}.html')
+        etree.SubElement(a, 'span', {'class': 'typeNameLink'}).text = \
+            descr.name
+        xf.write(a)
+
+    @classmethod
+    def _get_navbar(cls, root_path, page):
+        """Return the navigation bars of a tree page."""
+        nav = etree.Element('div', {'class': 'topNav'})
+        ul = etree.SubElement(nav, 'ul', {'class': 'navList'},
+                              title='Navigation')
+        etree.SubElement(etree.SubElement(ul, 'li'), 'a',
+                         href=f'{root_path}start-page.html').text = 'Overview'
+        etree.SubElement(ul, 'li').text = 'Class'
+        etree.SubElement(ul, 'li', {'class': 'navBarCell1Rev'}).text = 'Tree'
+        about = etree.SubElement(nav, 'div', {'class': 'aboutLanguage'})
+        etree.SubElement(about, 'strong').text = 'PeopleSoft\xa0API'
+        sub_nav = etree.Element('div', {'class': 'subNav'})
+        ul = etree.SubElement(sub_nav, 'ul', {'class': 'navList'})
+        etree.SubElement(etree.SubElement(ul, 'li'), 'a', target='_top',
+                         href=f'{root_path}index.html?{page}').text = 'Frames'
+        etree.SubElement(etree.SubElement(ul, 'li'), 'a', target='_top',
+                         href=os.path.basename(page)).text = 'No\xa0Frames'
+        ul = etree.SubElement(sub_nav, 'ul', {'class': 'navList'})
+        etree.SubElement(etree.SubElement(ul, 'li'), 'a',
+                         href=f'{root_path}classes-noframe.html').text = \
+            'All\xa0Classes'
+        return nav, sub_nav
+
+
+# MODEL DATABASE
+_database_schema = '''
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime INTEGER
+);
+CREATE TABLE types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    base TEXT NOT NULL COLLATE NOCASE,
+    package TEXT COLLATE NOCASE,
+    array_dimension INTEGER NOT NULL
+);
+CREATE TABLE classes (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER REFERENCES sources(id) ON DELETE CASCADE,
+    fqcn TEXT NOT NULL COLLATE NOCASE,
+    package TEXT NOT NULL COLLATE NOCASE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    type TEXT NOT NULL,
+    is_abstract INTEGER NOT NULL
+);
+CREATE TABLE hierarchy (
+    class_id INTEGER NOT NULL REFERENCES classes(id) ON DELETE CASCADE,
+    verb TEXT NOT NULL,
+    superclass TEXT NOT NULL COLLATE NOCASE
+);
+CREATE TABLE members (
+    id INTEGER PRIMARY KEY,
+    class_id INTEGER NOT NULL REFERENCES classes(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    scope TEXT NOT NULL,
+    is_abstract INTEGER NOT NULL,
+    type_id INTEGER REFERENCES types(id),
+    value TEXT,
+    signature TEXT NOT NULL
+);
+CREATE TABLE arguments (
+    member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type_id INTEGER NOT NULL REFERENCES types(id),
+    is_out INTEGER NOT NULL
+);
+CREATE TABLE metrics (
+    member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    loc INTEGER NOT NULL,
+    statements INTEGER NOT NULL,
+    complexity INTEGER NOT NULL,
+    nesting INTEGER NOT NULL,
+    throws INTEGER NOT NULL
+);
+CREATE TABLE descriptions (
+    class_id INTEGER NOT NULL REFERENCES classes(id) ON DELETE CASCADE,
+    member_id INTEGER REFERENCES members(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    summary TEXT,
+    full TEXT,
+    version TEXT,
+    authors TEXT,
+    params TEXT,
+    exceptions TEXT,
+    returns TEXT
+);
+CREATE INDEX classes_source ON classes(source_id);
+CREATE INDEX classes_fqcn ON classes(fqcn);
+CREATE INDEX classes_package ON classes(package);
+CREATE INDEX hierarchy_class ON hierarchy(class_id);
+CREATE INDEX hierarchy_superclass ON hierarchy(superclass);
+CREATE INDEX members_class ON members(class_id);
+CREATE INDEX members_kind ON members(kind, scope);
+CREATE INDEX members_type ON members(type_id);
+CREATE INDEX arguments_member ON arguments(member_id);
+CREATE INDEX arguments_type ON arguments(type_id);
+CREATE INDEX metrics_member ON metrics(member_id);
+CREATE INDEX descriptions_class ON descriptions(class_id);
+CREATE INDEX descriptions_member ON descriptions(member_id);
+'''
+# The scripts upgrading a database from a version to the next one
+_database_upgrades = {
+    1: '''
+CREATE TABLE metrics (
+    member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    loc INTEGER NOT NULL,
+    statements INTEGER NOT NULL,
+    complexity INTEGER NOT NULL,
+    nesting INTEGER NOT NULL,
+    throws INTEGER NOT NULL
+);
+CREATE INDEX metrics_member ON metrics(member_id);
+'''}
+
+
+def _connect_database(path):
+    """Open a model database, creating or upgrading its schema if needed.
+
+    Returns None for the schema of an unsupported database, which is
+    left untouched.
+    """
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version == 0:
+        with conn:
+            conn.executescript(_database_schema)
+            conn.execute(f'PRAGMA user_version = {_database_format}')
+    elif version in _database_upgrades:
+        with conn:
+            while version in _database_upgrades:
+                conn.executescript(_database_upgrades[version])
+                version += 1
+            conn.execute(f'PRAGMA user_version = {version}')
+    if version not in (0, _database_format):
+        conn.close()
+        raise ValueError(f'"{path}" is not a supported model database')
+    return conn
+
+
+class _ModelWriter:
+    """A streaming writer of the model database.
+
+    The database is updated incrementally, by source file: the rows of
+    the files that changed or disappeared since the last update are
+    deleted, and only the classes of new or changed files are written.
+    Rows are inserted in bulk, every _flush_size classes, and the whole
+    update happens in a single transaction.
+    """
+
+    _flush_size = 1000
+
+    def __init__(self, path, include_private, sources, metrics=False):
+        """Open the database and delete the rows of stale files.
+
+        sources maps the path of every source file to its modification
+        time. metrics tells whether the classes have Metrics.
+        """
+        self.conn = _connect_database(path)
+        self.conn.execute('BEGIN')
+        settings = {'private': json.dumps(include_private),
+                    'metrics': json.dumps(metrics)}
+        known = {row['key']: row['value']
+                 for row in self.conn.execute('SELECT key, value FROM meta')}
+        if any(known.get(key) != value for key, value in settings.items()):
+            # Every class depends on the inclusion of private members,
+            # and on the collection of metrics
+            self.conn.execute('DELETE FROM sources')
+            self.conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                  settings.items())
+        known = {row['path']: (row['id'], row['mtime'])
+                 for row in self.conn.execute(
+                     'SELECT id, path, mtime FROM sources')}
+        stale = [source_id for path, (source_id, mtime) in known.items()
+                 if sources.get(path) != mtime]
+        self.conn.executemany('DELETE FROM sources WHERE id = ?',
+                              ((source_id,) for source_id in stale))
+        self.source_ids = {}
+        self.pending = set()
+        for path, mtime in sources.items():
+            if path in known and known[path][1] == mtime:
+                continue
+            cursor = self.conn.execute(
+                'INSERT INTO sources (path, mtime) VALUES (?, ?)',
+                (path, mtime))
+            self.source_ids[path] = cursor.lastrowid
+            self.pending.add(path)
+        self.type_ids = {
+            row['name'].lower(): row['id']
+            for row in self.conn.execute('SELECT id, name FROM types')}
+        self.next_ids = {table: self.conn.execute(
+            f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}').fetchone()[0]
+            for table in ('classes', 'members', 'types')}
+        self.rows = defaultdict(list)
+        self.count = 0
+        self.written = 0
+
+    def _new_id(self, table):
+        """Allocate an id for a row of a table."""
+        new_id = self.next_ids[table]
+        self.next_ids[table] += 1
+        return new_id
+
+    def _type_id(self, the_type):
+        """Return the id of a type, adding it if new.
+
+        Type names are case insensitive, as in PeopleCode, so the first
+        spelling found is the one kept.
+        """
+        name = str(the_type)
+        type_id = self.type_ids.get(name.lower())
+        if type_id is None:
+            type_id = self._new_id('types')
+            self.type_ids[name.lower()] = type_id
+            self.rows['types'].append(
+                (type_id, name, the_type.fqcn, the_type.package_name or None,
+                 the_type.array_dimension))
+        return type_id
+
+    def _add_description(self, class_id, member_id, role, descr):
+        """Queue the row of a description, if any."""
+        if descr is not None and not descr.is_empty:
+            self.rows['descriptions'].append(
+                (class_id, member_id, role, descr.summary,
+                 '\n\n'.join(descr.full) or None, descr.version,
+                 json.dumps(descr.authors) if descr.authors else None,
+                 json.dumps(descr.params) if descr.params else None,
+                 json.dumps(descr.exceptions) if descr.exceptions else None,
+                 descr.returns))
+
+    def _add_member(self, class_id, kind, member, the_type=None, value=None,
+                    is_abstract=False):
+        """Queue the row of a member and return its id."""
+        member_id = self._new_id('members')
+        scope = getattr(member, 'scope', 'private')
+        type_id = self._type_id(the_type) if the_type else None
+        self.rows['members'].append(
+            (member_id, class_id, kind, member.name, scope, int(is_abstract),
+             type_id, value, str(member)))
+        self._add_description(class_id, member_id, 'main', member.description)
+        self._add_metrics(member_id, 'main', getattr(member, 'metrics', None))
+        return member_id
+
+    def _add_metrics(self, member_id, role, metrics):
+        """Queue the row of an implementation's metrics, if any."""
+        if metrics is not None:
+            self.rows['metrics'].append((member_id, role, *metrics))
+
+    def add_class(self, app_class):
+        """Write an Application Class, if its source file changed."""
+        if app_class.source_file not in self.pending:
+            return
+        class_id = self._new_id('classes')
+        self.rows['classes'].append(
+            (class_id, self.source_ids[app_class.source_file],
+             app_class.fqcn, app_class.package_name, app_class.name,
+             app_class.type, int(app_class.is_abstract)))
+        if app_class.superclass:
+            self.rows['hierarchy'].append(
+                (class_id, app_class.superclass.verb,
+                 app_class.superclass.fqcn))
+        self._add_description(class_id, None, 'main', app_class.description)
+        methods = [('method', m) for m in app_class.methods]
+        if app_class.constructor:
+            methods.insert(0, ('constructor', app_class.constructor))
+        for kind, method in methods:
+            member_id = self._add_member(class_id, kind, method,
+                                         the_type=method.type,
+                                         is_abstract=method.is_abstract)
+            for position, arg in enumerate(method.args or []):
+                self.rows['arguments'].append(
+                    (member_id, position, arg.name, self._type_id(arg.type),
+                     int(arg.is_out)))
+        for prop in app_class.properties:
+            member_id = self._add_member(class_id, 'property', prop,
+                                         the_type=prop.type,
+                                         is_abstract=prop.is_abstract)
+            self._add_description(class_id, member_id, 'get', prop.get_descr)
+            self._add_description(class_id, member_id, 'set', prop.set_descr)
+            self._add_metrics(member_id, 'get', prop.get_metrics)
+            self._add_metrics(member_id, 'set', prop.set_metrics)
+        for const in app_class.constants:
+            self._add_member(class_id, 'constant', const, value=const.value)
+        self.count += 1
+        self.written += 1
+        if self.count >= self._flush_size:
+            self._flush()
+
+    def _flush(self):
+        """Insert the queued rows."""
+        for table in ('types', 'classes', 'hierarchy', 'members',
+                      'arguments', 'descriptions', 'metrics'):
+            rows = self.rows.pop(table, None)
+            if rows:
+                marks = ', '.join('?' * len(rows[0]))
+                self.conn.executemany(
+                    f'INSERT INTO {table} VALUES ({marks})', rows)
+        self.count = 0
+
+    def close(self):
+        """Insert any queued rows and commit the transaction."""
+        self._flush()
+        self.conn.commit()
+        self.conn.close()
+
+
+class ModelDatabase:
+    """A query interface to a model database.
+
+    The database is written by generate_appclassdoc (and
+    merge_appclassdoc) when given a database path. Query results are
+    lists of sqlite3.Row objects, whose columns can be accessed by
+    name.
+    """
+
+    def __init__(self, path):
+        """Open the database."""
+        if not os.path.isfile(path):
+            raise ValueError(f'"{path}" not found')
+        self.conn = _connect_database(path)
+
+    def __enter__(self):
+        """Enter a runtime context."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the database when leaving a runtime context."""
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        self.conn.close()
+
+    def query(self, sql, params=()):
+        """Run an arbitrary SQL query."""
+        return self.conn.execute(sql, params).fetchall()
+
+    def find_classes(self, package=None, the_type=None, implements=None,
+                     transitive=True):
+        """Find classes by package, type and/or superclass.
+
+        implements is the fully qualified name of a class or interface
+        that the classes must extend or implement, directly or (if
+        transitive is True) through their superclasses. Returns rows
+        with the fqcn, package, name, type and is_abstract columns.
+        """
+        sql = ''
+        where = []
+        params = []
+        if implements:
+            if transitive:
+                sql = ('WITH RECURSIVE sub(id, fqcn) AS ('
+                       'SELECT c.id, c.fqcn FROM classes c JOIN hierarchy h '
+                       'ON h.class_id = c.id WHERE h.superclass = ? '
+                       'UNION SELECT c.id, c.fqcn FROM classes c '
+                       'JOIN hierarchy h ON h.class_id = c.id '
+                       'JOIN sub ON h.superclass = sub.fqcn) ')
+                where.append('c.id IN (SELECT id FROM sub)')
+            else:
+                where.append('c.id IN (SELECT class_id FROM hierarchy '
+                             'WHERE superclass = ?)')
+            params.append(implements)
+        if package:
+            where.append('c.package = ?')
+            params.append(package)
+        if the_type:
+            where.append('c.type = ?')
+            params.append(the_type)
+        sql += ('SELECT c.fqcn, c.package, c.name, c.type, c.is_abstract '
+                'FROM classes c')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return self.query(sql + ' ORDER BY c.fqcn', params)
+
+    def find_members(self, kind=None, scope=None, the_type=None, name=None,
+                     package=None, documented=None):
+        """Find class members by kind, scope, type, name and/or package.
+
+        kind is one of "constructor", "method", "property" or
+        "constant"; the_type is the (return) type of the member, as
+        written in its signature (e.g. "array of Record"). If
+        documented is True or False, only members with or without an
+        API description are returned. Returns rows with the fqcn, kind,
+        name, scope, type and signature columns.
+        """
+        where = []
+        params = []
+        for column, value in (('m.kind', kind), ('m.scope', scope),
+                              ('t.name', the_type), ('m.name', name),
+                              ('c.package', package)):
+            if value is not None:
+                where.append(f'{column} = ?')
+                params.append(value)
+        if documented is not None:
+            where.append(
+                ('' if documented else 'NOT ') + 'EXISTS (SELECT 1 FROM '
+                'descriptions d WHERE d.member_id = m.id)')
+        sql = ('SELECT c.fqcn, m.kind, m.name, m.scope, t.name AS type, '
+               'm.signature FROM members m '
+               'JOIN classes c ON c.id = m.class_id '
+               'LEFT JOIN types t ON t.id = m.type_id')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return self.query(sql + ' ORDER BY c.fqcn, m.kind, m.name', params)
+
+
+# OUTPUT FILES
+def _gzip_bytes(data):
+    """Compress data in the gzip format, with a zero timestamp."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _brotli_bytes(data):
+    """Compress data in the brotli format."""
+    return brotli.compress(data, mode=brotli.MODE_TEXT)
+
+
+_compressors = {
+    'gz': _gzip_bytes,
+    'br': _brotli_bytes,
+}
+
+
+class _OutputFiles:
+    """The writer of the files of the documentation site.
+
+    Pages are rendered and serialized by the caller, and the resulting
+    bytes are handed over through a bounded queue to a number of writer
+    threads, so that rendering and disk (or network) I/O overlap. Writer
+    threads remember the directories they have created. The fsync
+    policy is one of "none" (leave it to the operating system), "file"
+    (sync every file before closing it) or "end" (sync everything once
+    all files are written). With zero writers, files are written by the
+    caller.
+
+    If compression formats are given, every file is also written with a
+    precompressed sibling per format (e.g. "index.html.gz"), suitable
+    for serving with nginx's gzip_static and brotli_static. Compression
+    runs on a separate pool of threads. The number of files queued at
+    any stage is bounded, so memory use does not depend on the size of
+    the site.
+
+    If a _ContentStore is given, files (and their compressed siblings)
+    are stored in it and linked from their paths, and files already
+    stored are not compressed again.
+    """
+
+    fsync_policies = ('none', 'file', 'end')
+
+    def __init__(self, compress=None, writers=1, fsync='none', store=None):
+        """Validate the arguments."""
+        self.formats = sorted(set(compress or []))
+        for fmt in self.formats:
+            if fmt not in _compressors:
+                raise ValueError(f'Unsupported compression format "{fmt}"')
+        if 'br' in self.formats and brotli is None:
+            raise ValueError('The "brotli" package is required for brotli '
+                             'compression')
+        if fsync not in self.fsync_policies:
+            raise ValueError(f'Unsupported fsync policy "{fsync}"')
+        if writers < 0:
+            raise ValueError('The number of writers cannot be negative')
+        self.fsync = fsync
+        self.store = store
+        self.files = 0
+        self.bytes = 0
+        self.compressed_bytes = {fmt: 0 for fmt in self.formats}
+        self.lock = threading.Lock()
+        self.dirs = set()
+        self.error = None
+        if self.formats:
+            workers = os.cpu_count() or 1
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+            self.slots = threading.BoundedSemaphore(workers * 4)
+        else:
+            self.executor = None
+        self.aborted = False
+        self.queue = queue.Queue(maxsize=writers * 8)
+        self.writer_count = writers
+        self.writers = None
+
+    def write(self, file_path, data):
+        """Queue a file to be written (and compressed).
+
+        With a content store, return the digest of the data.
+        """
+        if self.store is None:
+            self._queue((file_path, data))
+            return None
+        digest = hashlib.sha1(data).hexdigest()
+        new, formats = self.store.reserve(
+            digest, self.formats
+            if file_path.endswith(_compressible_extensions) else [])
+        self._queue((file_path, data if new or formats else None, digest,
+                     new, formats))
+        return digest
+
+    def write_html(self, file_path, html):
+        """Serialize an HTML document and queue it to be written."""
+        return self.write(file_path, etree.tostring(
+            html, method='html', pretty_print=_pretty_print,
+            encoding='utf-8'))
+
+    def link(self, file_path, digest):
+        """Queue a file to be linked to an object of the content store."""
+        self._queue((file_path, None, digest))
+
+    def add_existing(self, file_path):
+        """Account for (and compress) a file written by other means.
+
+        With a content store, the file is replaced by a link to it.
+        """
+        compressible = file_path.endswith(_compressible_extensions)
+        if self.store is None:
+            if compressible:
+                with open(file_path, 'rb') as file:
+                    self._add(file_path, file.read())
+            return
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.sha1(data).hexdigest()
+        new, formats = self.store.reserve(
+            digest, self.formats if compressible else [])
+        if new:
+            self.store.put(digest, data)
+        self.store.link(digest, file_path)
+        if compressible:
+            self._add(file_path, data, digest, formats)
+
+    def _queue(self, item):
+        """Queue an item to be written by the writer threads."""
+        if self.error is not None:
+            raise self.error
+        if not self.writer_count:
+            self._write_item(item)
+            return
+        if self.writers is None:
+            # Started on demand, so that no threads are running when
+            # parser worker processes are forked
+            self.writers = [threading.Thread(target=self._drain, daemon=True)
+                            for _ in range(self.writer_count)]
+            for writer in self.writers:
+                writer.start()
+        self.queue.put(item)
+
+    def _drain(self):
+        """Write the files in the queue until told to stop."""
+        profiler = _profiler
+        profile = profiler.start_thread() if profiler is not None else None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is None and not self.aborted:
+                try:
+                    self._write_item(item)
+                except Exception as e:
+                    self.error = e
+            else:
+                self._release(item)
+        if profile is not None:
+            profile.disable()
+            profiler.dump(profile, 'write')
+
+    def _write_item(self, item):
+        """Write a queued item, releasing its reservations on error."""
+        try:
+            self._write(*item)
+        except BaseException:
+            self._release(item)
+            raise
+
+    def _release(self, item):
+        """Release the objects reserved for a queued item, if any.
+
+        Other writer threads may be waiting for them to be stored.
+        """
+        if len(item) == 5:
+            _, _, digest, new, formats = item
+            self.store.release(digest, new, formats)
+
+    def _write(self, file_path, data, digest=None, new=False, formats=()):
+        """Write a file, creating its directory if needed.
+
+        With a digest, the data (if new) goes to the content store, and
+        the file is linked to it.
+        """
+        if digest is not None:
+            if new:
+                self.store.put(digest, data)
+            self.store.link(digest, file_path)
+            self._add(file_path, data, digest, formats)
+            return
+        dir_name = os.path.dirname(file_path)
+        if dir_name not in self.dirs:
+            os.makedirs(dir_name, exist_ok=True)
+            self.dirs.add(dir_name)
+        with open(file_path, 'wb') as file:
+            file.write(data)
+            if self.fsync == 'file':
+                file.flush()
+                os.fsync(file.fileno())
+        self._add(file_path, data)
+
+    def _add(self, file_path, data, digest=None, formats=()):
+        """Count the bytes of a file and queue its compression.
+
+        With a digest, only the formats given are compressed, and the
+        siblings in other formats are linked to the content store.
+        """
+        size = self.store.size(digest) if digest is not None else len(data)
+        with self.lock:
+            self.files += 1
+            self.bytes += size
+        if self.executor is None or \
+                not file_path.endswith(_compressible_extensions):
+            return
+        if digest is not None:
+            for fmt in self.formats:
+                if fmt not in formats:
+                    size = self.store.link(digest, f'{file_path}.{fmt}', fmt)
+                    with self.lock:
+                        self.compressed_bytes[fmt] += size
+            if not formats:
+                return
+        self.slots.acquire()
+        future = self.executor.submit(self._compress, file_path, data, digest,
+                                      formats)
+        future.add_done_callback(self._compressed)
+
+    def _compressed(self, future):
+        """Release the slot of a finished compression, keeping its error.
+
+        Futures are not kept, so that memory use does not grow with the
+        number of files.
+        """
+        self.slots.release()
+        if not future.cancelled() and future.exception() is not None \
+                and self.error is None:
+            self.error = future.exception()
+
+    def _compress(self, file_path, data, digest=None, formats=()):
+        """Write the compressed siblings of a file.
+
+        With a digest, the formats not stored because of an error are
+        released from the content store.
+        """
+        done = 0
+        try:
+            for fmt in formats if digest is not None else self.formats:
+                compressed = _compressors[fmt](data)
+                if digest is not None:
+                    self.store.put(digest, compressed, fmt)
+                    self.store.link(digest, f'{file_path}.{fmt}', fmt)
+                else:
+                    with open(f'{file_path}.{fmt}', 'wb') as file:
+                        file.write(compressed)
+                        if self.fsync == 'file':
+                            file.flush()
+                            os.fsync(file.fileno())
+                with self.lock:
+                    self.compressed_bytes[fmt] += len(compressed)
+                done += 1
+        except BaseException:
+            if digest is not None:
+                self.store.release(digest, formats=formats[done:])
+            raise
+
+    def close(self):
+        """Wait for pending writes and compressions.
+
+        Raise the first error found, if any.
+        """
+        self._stop_writers()
+        if self.error is not None:
+            raise self.error
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            if self.error is not None:
+                raise self.error
+        if self.fsync == 'end' and hasattr(os, 'sync'):
+            os.sync()
+
+    def abort(self):
+        """Stop the writer and compression threads without raising.
+
+        Files still queued are dropped. This is meant to be called on
+        every path (e.g. in a finally clause), and does nothing more
+        once close has returned.
+        """
+        self.aborted = True
+        self._stop_writers()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def _stop_writers(self):
+        """Ask the writer threads to exit once the queue is drained."""
+        for _ in self.writers or []:
+            self.queue.put(None)
+        for writer in self.writers or []:
+            writer.join()
+        self.writers = None
+
+    def get_report(self):
+        """Return a one-line summary of the bytes written."""
+        text = f'{self.files} file(s), {_format_bytes(self.bytes)}'
+        for fmt in self.formats:
+            size = self.compressed_bytes[fmt]
+            ratio = 100 * size / self.bytes if self.bytes else 0
+            text += f'; .{fmt}: {_format_bytes(size)} ({ratio:.0f}%)'
+        return text
+
+
+class _ContentStore:
+    """A content-addressed store of output files.
+
+    Every distinct file (or compressed sibling) is stored once, under
+    the hash of its uncompressed contents, and linked from every path
+    it is written to: with hard links where the file system supports
+    them, or else by copying. Objects are reserved by the rendering
+    thread, stored by the thread writing the first file with those
+    contents, and waited for by the threads linking them, so that no
+    object is written twice. Objects that fail to be stored, or are
+    released instead, fail the threads waiting for them.
+
+    Rendered class pages are also remembered by the hash of their XML
+    input (see _write_class_file_html), so that pages identical across
+    several sites are only rendered once.
+    """
+
+    def __init__(self, directory, fsync=False):
+        """Initialize the store."""
+        self.directory = directory
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.rendered = {}
+        self.dirs = set()
+        self.hard_links = True
+        self.written = 0
+        self.written_bytes = 0
+        self.linked = 0
+
+    def _get_path(self, digest, fmt=None):
+        """Return the path of an object."""
+        name = digest[2:] if fmt is None else f'{digest[2:]}.{fmt}'
+        return os.path.join(self.directory, digest[:2], name)
+
+    def reserve(self, digest, formats=()):
+        """Reserve an object and its compressed siblings.
+
+        Returns a tuple with whether the object is new and the list of
+        formats not reserved before, which the caller is expected to
+        store with put.
+        """
+        with self.lock:
+            new = digest not in self.objects
+            if new:
+                self.objects[digest] = [None, threading.Event()]
+            formats = [fmt for fmt in formats
+                       if (digest, fmt) not in self.objects]
+            for fmt in formats:
+                self.objects[(digest, fmt)] = [None, threading.Event()]
+        return new, formats
+
+    def release(self, digest, new=False, formats=()):
+        """Give up reserved objects that will not be stored.
+
+        The threads waiting for them (or for the object itself, if new
+        is True) fail instead of waiting forever.
+        """
+        keys = [(digest, fmt) for fmt in formats]
+        if new:
+            keys.append(digest)
+        for key in keys:
+            self.objects[key][1].set()
+
+    def put(self, digest, data, fmt=None):
+        """Store the data of a reserved object, unless already on disk."""
+        entry = self.objects[digest if fmt is None else (digest, fmt)]
+        try:
+            path = self._get_path(digest, fmt)
+            if not os.path.exists(path):
+                temp_path = f'{path}.{threading.get_ident()}.tmp'
+                self._make_dir(os.path.dirname(path))
+                with open(temp_path, 'wb') as file:
+                    file.write(data)
+                    if self.fsync:
+                        file.flush()
+                        os.fsync(file.fileno())
+                os.replace(temp_path, path)
+                with self.lock:
+                    self.written += 1
+                    self.written_bytes += len(data)
+            entry[0] = len(data)
+        except BaseException as e:
+            entry[0] = e
+            raise
+        finally:
+            # Set even on error, so that linking threads fail instead
+            # of waiting forever
+            entry[1].set()
+
+    def size(self, digest, fmt=None):
+        """Return the size of an object, once stored.
+
+        If the object failed to be stored, raise the error found by the
+        thread storing it, or an OSError if it was released.
+        """
+        entry = self.objects[digest if fmt is None else (digest, fmt)]
+        entry[1].wait()
+        if isinstance(entry[0], BaseException):
+            raise entry[0]
+        if entry[0] is None:
+            raise OSError(f'Object "{self._get_path(digest, fmt)}" could not '
+                          'be stored')
+        return entry[0]
+
+    def link(self, digest, file_path, fmt=None):
+        """Link a file to an object, once stored, and return its size."""
+        size = self.size(digest, fmt)
+        path = self._get_path(digest, fmt)
+        with self.lock:
+            self.linked += 1
+        self._make_dir(os.path.dirname(file_path))
+        # Renaming a link onto another link to the same file does nothing
+        if os.path.exists(file_path) and os.path.samefile(path, file_path):
+            return size
+        temp_path = f'{file_path}.{threading.get_ident()}.tmp'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        # Files are never written in place, as they may be linked from
+        # elsewhere
+        if self.hard_links:
+            try:
+                os.link(path, temp_path)
+            except OSError:
+                self.hard_links = False
+        if not self.hard_links:
+            shutil.copyfile(path, temp_path)
+        os.replace(temp_path, file_path)
+        return size
+
+    def _make_dir(self, dir_name):
+        """Create a directory, unless created before."""
+        if dir_name not in self.dirs:
+            os.makedirs(dir_name, exist_ok=True)
+            self.dirs.add(dir_name)
+
+    def detach(self, directory):
+        """Replace the links to the store directly under a directory.
+
+        Files kept from previous executions that may be modified in
+        place (as by _fingerprint_resources) must not be shared.
+        """
+        for file_name in os.listdir(directory):
+            file_path = os.path.join(directory, file_name)
+            if os.path.isfile(file_path) and os.stat(file_path).st_nlink > 1:
+                shutil.copyfile(file_path, f'{file_path}.tmp')
+                os.replace(f'{file_path}.tmp', file_path)
+
+    def prune(self):
+        """Delete the objects no longer linked from any file.
+
+        Returns the number of objects deleted. Nothing is deleted if
+        files had to be copied instead of linked.
+        """
+        removed = 0
+        if not self.hard_links or not os.path.isdir(self.directory):
+            return removed
+        for base_dir, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                path = os.path.join(base_dir, file_name)
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def get_report(self):
+        """Return a one-line summary of the objects stored."""
+        return (f'{self.linked} file(s) linked to {len(self.objects)} '
+                f'object(s); {self.written} object(s) written, '
+                f'{_format_bytes(self.written_bytes)}')
+
+
+def _format_bytes(size):
+    """Return a human-readable byte count."""
+    for unit in ('bytes', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            break
+        size /= 1024
+    if unit == 'bytes':
+        return f'{size} bytes'
+    return f'{size:.1f} {unit}'
+
+
+def _hashed_name(path, data):
+    """Return a path with a fingerprint of data inserted in its name."""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{hashlib.sha1(data).hexdigest()[:10]}{ext}'
+
+
+def _rewrite_css_urls(data, css_dir, names):
+    """Rewrite the url() references of a stylesheet to hashed names.
+
+    css_dir is the directory of the stylesheet relative to the
+    resources directory, and names maps the original paths of the
+    resources to their hashed paths.
+    """
+    def replace(match):
+        quote, url, suffix = match.groups()
+        target = os.path.normpath(os.path.join(css_dir, url))
+        target = target.replace(os.sep, '/')
+        if target not in names:
+            return match.group(0)
+        hashed = os.path.relpath(names[target], css_dir or '.')
+        return f'url({quote}{hashed.replace(os.sep, "/")}{suffix}{quote})'
+
+    return _re_css_url.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+
+def _fingerprint_resources(outputdir, resources_dir):
+    """Write content-hashed copies of the resources.
+
+    Every file under resources_dir gets a copy named after a hash of
+    its contents (e.g. "stylesheet.0123456789.css"), so that it can be
+    cached by browsers indefinitely. Stylesheets are processed after
+    any other files, deepest first, so that the url() references they
+    contain can be rewritten to the hashed names of their targets.
+    References to the stylesheet and script in the static HTML pages
+    are rewritten as well. Hashed copies left by previous executions
+    are removed, and the mapping is written to the resource manifest.
+    Return the mapping of original to hashed paths, relative to
+    resources_dir and with forward slashes.
+    """
+    paths = []
+    stale = []
+    for base_dir, _, file_names in os.walk(resources_dir):
+        for file_name in file_names:
+            path = os.path.relpath(os.path.join(base_dir, file_name),
+                                   resources_dir).replace(os.sep, '/')
+            if _re_hashed_name.search(file_name):
+                stale.append(path)
+            elif not file_name.endswith(('.gz', '.br')):
+                paths.append(path)
+    paths.sort(key=lambda p: (p.endswith('.css'), -p.count('/'), p))
+    names = {}
+    for path in paths:
+        with open(os.path.join(resources_dir, path), 'rb') as file:
+            data = file.read()
+        if path.endswith('.css'):
+            data = _rewrite_css_urls(data, os.path.dirname(path), names)
+        names[path] = _hashed_name(path, data)
+        with open(os.path.join(resources_dir, names[path]), 'wb') as file:
+            file.write(data)
+    hashed = set(names.values())
+    for path in stale:
+        if path not in hashed:
+            os.remove(os.path.join(resources_dir, path))
+    for file_name in ('index.html', 'start-page.html'):
+        file_path = os.path.join(outputdir, file_name)
+        if os.path.exists(file_path):
+            with open(file_path, encoding='utf-8') as file:
+                text = file.read()
+            for path in ('stylesheet.css', 'script.js'):
+                if path not in names:
+                    continue
+                root, ext = os.path.splitext(path)
+                pattern = (rf'resources/{re.escape(root)}(\.[0-9a-f]{{10}})?'
+                           rf'{re.escape(ext)}')
+                text = re.sub(pattern, f'resources/{names[path]}', text)
+            with open(file_path, 'w', encoding='utf-8') as file:
+                file.write(text)
+    with open(os.path.join(outputdir, _resource_manifest_file), 'w',
+              encoding='utf-8') as file:
+        json.dump(names, file, indent=2, sort_keys=True)
+    return names
+
+
+# PREVIEW SERVER
+class _PreviewModel:
+    """The model behind the preview server.
+
+    Classes are kept in memory and pages are rendered on request, the
+    most recently used ones being kept in a cache of cache_size pages.
+    Pages are rendered concurrently, outside the lock guarding the
+    cache, but never while the model is being refreshed.
+    If a model directory is given, the model is loaded from it (if
+    present) instead of parsing every source file, and saved back to it
+    in the format of a shard whenever it changes. The other arguments
+    control the parsing of source files, as for _parse_sources.
+    """
+
+    def __init__(self, include_private, files, model_dir=None,
+                 cache_size=256, jobs=1, time_budget=None, warm_up=0,
+                 retry_budget=None, quarantine_report=None,
+                 diagnostics_report=None):
+        """Initialize an empty model."""
+        self.include_private = include_private
+        self.files = files
+        self.model_dir = model_dir
+        self.cache_size = cache_size
+        self.jobs = jobs
+        self.time_budget = time_budget
+        self.warm_up = warm_up
+        self.retry_budget = retry_budget
+        self.quarantine_report = quarantine_report
+        self.diagnostics_report = diagnostics_report
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+        self.idle = threading.Condition(self.lock)
+        self.renders = 0
+        self.refreshing = False
+        self.resolved = set()
+        self.classes = {}
+        self.sources = {}
+        self.spool = None
+
+    def load(self):
+        """Load the model from its directory and bring it up to date."""
+        shard_path = None
+        if self.model_dir:
+            shard_path = os.path.join(self.model_dir, _shard_file)
+        if shard_path and os.path.exists(shard_path):
+            AppClass.reset_indexes()
+            spool, include_private = _ClassSpool.merge([self.model_dir])
+            if include_private == self.include_private:
+                for batch in spool.batches():
+                    for app_class in batch:
+                        self.classes[app_class.fqcn.lower()] = app_class
+                self.sources = spool.sources
+                _print_verbose(f'{len(self.classes)} class(es) loaded from '
+                               f'"{self.model_dir}".')
+            else:
+                _logger.warning(f'Model in "{self.model_dir}" ignored, as it '
+                                'differs on the inclusion of private members')
+        if not self.refresh():
+            with self.lock:
+                self._reindex()
+
+    def refresh(self):
+        """Bring the model up to date with the source files.
+
+        Changed and new files are parsed again, and the classes of
+        removed files are dropped; the indexes are then rebuilt, and
+        the cached pages of the classes affected (see _get_affected),
+        of their packages and the indexes are dropped. Pages are not
+        rendered meanwhile. Return whether anything changed.
+        """
+        current = {file_path: _get_mtime(file_path)
+                   for file_path in _process_input(self.files)}
+        changed = [file_path for file_path, mtime in current.items()
+                   if self.sources.get(file_path) != mtime]
+        removed = [file_path for file_path in self.sources
+                   if file_path not in current]
+        if not (changed or removed):
+            return False
+        # Parsing registers the new classes in the shared indexes, so
+        # the pages being rendered are finished first
+        with self.lock:
+            self.refreshing = True
+            while self.renders:
+                self.idle.wait()
+        try:
+            self._update(current, changed, removed)
+        finally:
+            with self.lock:
+                self.refreshing = False
+                self.idle.notify_all()
+        return True
+
+    def _update(self, current, changed, removed):
+        """Parse the changed files and drop the classes of removed ones.
+
+        current maps the paths of the source files to their times.
+        """
+        parsed = []
+        if changed:
+            spool = _ClassSpool()
+            _parse_sources(spool, changed, self.include_private, self.jobs,
+                           self.time_budget, self.retry_budget,
+                           self.quarantine_report, self.warm_up,
+                           diagnostics_report=self.diagnostics_report)
+            parsed = spool.batch
+        stale = set(changed).union(removed)
+        with self.lock:
+            old_classes = [app_class for app_class in self.classes.values()
+                           if app_class.source_file in stale]
+            keys = {app_class.fqcn.lower()
+                    for app_class in old_classes + parsed}
+            affected = self._get_affected(keys)
+            self.classes = {key: app_class
+                            for key, app_class in self.classes.items()
+                            if app_class.source_file not in stale}
+            for app_class in parsed:
+                self.classes[app_class.fqcn.lower()] = app_class
+            for file_path in removed:
+                del self.sources[file_path]
+            for file_path in changed:
+                self.sources[file_path] = current[file_path]
+            self._reindex()
+            affected.update(self._get_affected(keys))
+            packages = {app_class.package_name.lower()
+                        for app_class in old_classes + parsed}
+            self._invalidate(affected, packages)
+            self.resolved.difference_update(affected)
+            if self.model_dir:
+                self._save()
+
+    def _get_affected(self, keys):
+        """Return the classes whose pages depend on the given classes.
+
+        These are the classes themselves, their superclasses and all
+        their descendants, the classes they use and those using them,
+        and the classes they import and those importing them. This is
+        worked out from the current indexes, so it is called both
+        before and after they are rebuilt.
+        """
+        affected = set(keys)
+        graph = AppClass.dependency_graph
+        for key in keys:
+            app_class = self.classes.get(key)
+            if app_class is not None:
+                if app_class.superclass:
+                    affected.add(app_class.superclass.fqcn.lower())
+                affected.update(usage_key for usage_key, _
+                                in app_class.get_type_usages())
+            affected.update(usage.package.fqcn(usage.name).lower()
+                            for usage in AppClass.usage_index.get(key, []))
+            if graph is not None and key in graph.names:
+                affected.update(fqcn.lower()
+                                for fqcn in graph.get_imports(key))
+                affected.update(fqcn.lower()
+                                for fqcn in graph.get_importers(key))
+        children = defaultdict(list)
+        for fqcn, descrs in AppClass.subclass_index.items():
+            children[fqcn.lower()].extend(d.fqcn.lower() for d in descrs)
+        visited = set(keys)
+        stack = list(keys)
+        while stack:
+            for child in children.get(stack.pop(), []):
+                if child not in visited:
+                    visited.add(child)
+                    affected.add(child)
+                    stack.append(child)
+        return affected
+
+    def _invalidate(self, classes, packages):
+        """Drop the cached pages of some classes and packages.
+
+        The class and package indexes are always dropped.
+        """
+        for path in list(self.cache):
+            parts = path.split('/')
+            if len(parts) < 3 or parts[0] != 'api':
+                stale = True
+            elif parts[-1] == '0package.html':
+                stale = ':'.join(parts[1:-1]).lower() in packages
+            else:
+                fqcn = ':'.join(parts[1:-1] + [parts[-1][:-5]])
+                stale = fqcn.lower() in classes
+            if stale:
+                del self.cache[path]
+
+    def _reindex(self):
+        """Rebuild the indexes and cross-references of the classes."""
+        AppClass.reset_indexes()
+        spool = _ClassSpool()
+        for key in sorted(self.classes):
+            spool.add(self.classes[key])
+        spool.sources = self.sources
+        AppClass.build_cross_references(spool.symbols,
+                                        spool.all_type_usages(),
+                                        spool.all_imports())
+        self.spool = spool
+
+    def _save(self):
+        """Save the model to its directory as a shard."""
+        os.makedirs(self.model_dir, exist_ok=True)
+        _clean_shard_dir(self.model_dir)
+        self.spool.shard_dir = self.model_dir
+        self.spool.save(self.include_private)
+
+    def get_page(self, path):
+        """Return the HTML of a page by URL path, or None if not found."""
+        with self.lock:
+            data = self.cache.get(path)
+            if data is not None:
+                self.cache.move_to_end(path)
+                return data
+            while self.refreshing:
+                self.idle.wait()
+            self.renders += 1
+        data = None
+        try:
+            html = self._render(path)
+            if html is not None:
+                data = etree.tostring(html, method='html',
+                                      pretty_print=_pretty_print,
+                                      encoding='utf-8')
+        finally:
+            with self.lock:
+                if data is not None:
+                    self.cache[path] = data
+                    if len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+                self.renders -= 1
+                self.idle.notify_all()
+        return data
+
+    def _render(self, path):
+        """Render a page by URL path, returning None if not found."""
+        if path == 'packages.html':
+            return AppClass.get_package_index_html(
+                sorted(AppClass.package_index.keys()))
+        if path in ('classes-frame.html', 'classes-noframe.html'):
+            classes = sorted(self.spool.descriptors,
+                             key=lambda c: f'{c.name}:{c.package_name}')
+            target = 'classFrame' if path == 'classes-frame.html' else ''
+            return AppClass.get_class_index_html(classes, target=target)
+        parts = path.split('/')
+        if len(parts) < 3 or parts[0] != 'api' or \
+                not parts[-1].endswith('.html'):
+            return None
+        package = parts[1:-1]
+        if parts[-1] == '0package.html':
+            pkg = ':'.join(package)
+            if pkg in AppClass.package_index:
+                return AppClass.get_package_html(pkg)
+            return None
+        key = ':'.join(package + [parts[-1][:-5]]).lower()
+        app_class = self.classes.get(key)
+        if app_class is None:
+            return None
+        with self.lock:
+            # Resolved again only once affected by a refresh
+            if key not in self.resolved:
+                _resolve_classes([app_class], self.spool.superclass_index)
+                self.resolved.add(key)
+        return app_class.get_html()
+
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    """The request handler of the preview server."""
+
+    def do_GET(self):
+        """Serve a page or a resource."""
+        path = unquote(urlsplit(self.path).path).lstrip('/')
+        if path in ('', 'index.html', 'start-page.html'):
+            self._send_resource(path or 'index.html')
+        elif path.startswith('resources/'):
+            self._send_resource(path[len('resources/'):])
+        else:
+            data = self.server.model.get_page(path)
+            if data is None:
+                self.send_error(404)
+            else:
+                self._send(data, 'text/html; charset=utf-8')
+
+    def _send_resource(self, path):
+        """Serve a file from the packaged resources."""
+        root = os.path.realpath(resource_filename(__name__, 'resources'))
+        file_path = os.path.realpath(os.path.join(root, path))
+        if not file_path.startswith(root + os.sep) or \
+                not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        content_type = mimetypes.guess_type(file_path)[0]
+        self._send(data, content_type or 'application/octet-stream')
+
+    def _send(self, data, content_type):
+        """Send a successful response."""
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """Log requests through the module's logger."""
+        _logger.info(f'{self.address_string()} - {format % args}')
+
+
+class _PreviewServer(ThreadingMixIn, HTTPServer):
+    """A multithreaded HTTP server for a preview model."""
+
+    daemon_threads = True
+
+    def __init__(self, address, model):
+        """Bind the server to an address."""
+        super().__init__(address, _PreviewHandler)
+        self.model = model
+
+
+def _watch_sources(model, interval, stop_event):
+    """Refresh the model every interval seconds until stopped."""
+    while not stop_event.wait(interval):
+        try:
+            if model.refresh():
+                _print_verbose('Model updated.')
+        except Exception:
+            _logger.exception('Error updating the model')
+
+
+# PRIVATE FUNCTIONS
+def _print_verbose(text, end='\n', flush=True):
+    """Print to stdout if verbose output is enabled."""
+    if _verbose:
+        print(text, end=end, flush=flush)
+
+
+def _flatten(lst):
+    """Generate individual items from a multiple-level list."""
+    for elem in lst:
+        if isinstance(elem, Iterable) and not isinstance(elem, (str, bytes)):
+            yield from _flatten(elem)
+        else:
+            yield elem
+
+
+def _process_file(file_path, include_private, with_source=False,
+                  with_metrics=False):
+    """Process an input file to retrieve its structure.
+
+    If with_source is True, the highlighted source of the class is
+    rendered from the token stream as well (see _highlight_source). If
+    with_metrics is True, the Metrics of the implementations are
+    computed during the same visit.
+
+    Return the Application Class, or None if parsing was aborted, with
+    the Diagnostic tuples of the syntax errors found.
+    """
+    if _logger.isEnabledFor(logging.INFO):
+        _logger.info(f'Processing input file "{file_path}"')
+    input_stream = InputStream(_read_source(file_path).decode('utf-8'))
+    listener = _DiagnosticListener(file_path)
+    lexer = PeopleCodeLexer(input_stream)
+    lexer.removeErrorListeners()
+    lexer.addErrorListener(listener)
+    token_stream = CommonTokenStream(lexer)
+    parser = PeopleCodeParser(token_stream)
+    parser.removeErrorListeners()
+    parser.addErrorListener(listener)
+    try:
+        parse_tree = parser.appClass()
+    except _SyntaxErrorLimit:
+        return None, listener.diagnostics
+    package = _get_file_package(file_path).split(sep=':')
+    if _tracer is None:
+        visitor = AppClassDocVisitor(token_stream, package,
+                                     include_private=include_private,
+                                     with_metrics=with_metrics)
+        visitor.visit(parse_tree)
+    else:
+        visitor = _TracingVisitor(token_stream, package,
+                                  include_private=include_private,
+                                  with_metrics=with_metrics)
+        visitor.visit(parse_tree)
+        _tracer.add(file_path, visitor.trace)
+    if visitor.app_class:
+        visitor.app_class.source_file = file_path
+        if with_source:
+            visitor.app_class.source = _highlight_source(input_stream,
+                                                         token_stream)
+    return visitor.app_class, listener.diagnostics
+
+
+def _highlight_source(input_stream, token_stream):
+    """Return the source of a token stream as highlighted HTML.
+
+    Every token is wrapped in a span with the class of its kind, and
+    every line starts with its number and a "line.N" anchor. The HTML
+    is returned zlib-compressed, as it is kept with the parsed class
+    until written.
+    """
+    token_stream.fill()
+    # Slicing the input directly is much faster than Token.text
+    data = input_stream.strdata
+    classes = _source_token_classes
+    parts = []
+    for token in token_stream.tokens:
+        if token.type == Token.EOF:
+            break
+        text = data[token.start:token.stop + 1].translate(_source_escapes)
+        css_class = classes.get(token.type)
+        parts.append(f'<span class="{css_class}">{text}</span>'
+                     if css_class else text)
+    lines = ''.join(parts).split('\n')
+    if len(lines) > 1 and not lines[-1]:
+        lines.pop()
+    width = len(str(len(lines)))
+    html = '\n'.join(f'<span class="sourceLineNo">{number:>{width}}</span>'
+                     f'<a name="line.{number}"></a>{line}'
+                     for number, line in enumerate(lines, 1))
+    return zlib.compress(html.encode('utf-8'), 1)
+
+
+def _get_file_package(file_path):
+    """Return the package of a source file's class, from its name."""
+    return ':'.join(os.path.basename(file_path).split(sep='.')[:-2])
+
+
+def _get_package_filter(patterns):
+    """Return a function telling whether a package matches any pattern.
+
+    Patterns are matched case-insensitively and may contain shell-style
+    wildcards. A package matching a pattern also matches its
+    subpackages.
+    """
+    patterns = [pattern.lower() for pattern in patterns]
+
+    def matches(package):
+        package = package.lower()
+        return any(fnmatch.fnmatchcase(package, pattern)
+                   or fnmatch.fnmatchcase(package, f'{pattern}:*')
+                   for pattern in patterns)
+    return matches
+
+
+def _get_mtime(file_path):
+    """Return the modification time of a file, or None if not found.
+
+    The modification time of an archive member is the one recorded in
+    the archive.
+    """
+    archive, member = _split_archive_path(file_path)
+    try:
+        if member is None:
+            return os.stat(file_path).st_mtime_ns
+        with _archive_lock:
+            return _get_archive(archive).get_mtime(member)
+    except (OSError, zipfile.BadZipFile, tarfile.TarError):
+        return None
+
+
+def _parse_one(file_path, include_private, with_source=False,
+               with_metrics=False):
+    """Process an input file, capturing any exception raised."""
+    start_time = time.monotonic()
+    try:
+        app_class, diagnostics = _process_file(file_path, include_private,
+                                               with_source=with_source,
+                                               with_metrics=with_metrics)
+        error = None
+    except Exception as e:
+        _logger.debug(traceback.format_exc())
+        app_class = None
+        diagnostics = []
+        error = ('error', f'{type(e).__name__}: {e}')
+    return ParseResult(file_path, app_class, error,
+                       time.monotonic() - start_time, diagnostics)
+
+
+def _parse_files(file_paths, include_private, jobs=1, time_budget=None,
+                 warm_up=0, with_source=False, with_metrics=False):
+    """Parse the given files, yielding a ParseResult for each one.
+
+    Files are parsed in the current process unless more than one job
+    or a per-file time budget is requested, in which case they are
+    handed to a pool of worker processes, whose workers are warmed up
+    on the first warm_up files (see _ParsePool).
+    """
+    if jobs > 1 or time_budget:
+        pool = _ParsePool(jobs, include_private, time_budget=time_budget,
+                          warm_up=warm_up, with_source=with_source,
+                          with_metrics=with_metrics)
+        yield from pool.map(file_paths)
+    else:
+        for file_path in file_paths:
+            yield _parse_one(file_path, include_private,
+                             with_source=with_source,
+                             with_metrics=with_metrics)
+
+
+def _parse_corpus(spool, file_paths, include_private, jobs=1,
+                  time_budget=None, retry_budget=None, warm_up=0, cache=None,
+                  with_source=False, with_metrics=False):
+    """Parse all classes from the given files and add them to a spool.
+
+    If a _ParseCache is given, the files parsed are added to it. If
+    with_source is True, the highlighted source of every class is kept
+    for its source page, and if with_metrics is True, the spool is
+    marked as holding the Metrics of the implementations.
+    Returns a tuple with the number of files without a class definition,
+    the list of quarantined files and the list of syntax errors found.
+    """
+    parse_errors = 0
+    quarantine = []
+    diagnostics = []
+    budget = time_budget
+    spool.metrics = with_metrics
+    while True:
+        for result in _parse_files(file_paths, include_private, jobs=jobs,
+                                   time_budget=budget, warm_up=warm_up,
+                                   with_source=with_source,
+                                   with_metrics=with_metrics):
+            if result.error:
+                reason, error = result.error
+                quarantine.append(QuarantineItem(result.file_path, reason,
+                                                 result.elapsed, error))
+                _logger.warning(f'File "{result.file_path}" quarantined: '
+                                f'{error}')
+                continue
+            spool.sources[result.file_path] = _get_mtime(result.file_path)
+            if cache is not None:
+                cache.add(result.file_path, result.app_class)
+            if result.diagnostics:
+                diagnostics.extend(result.diagnostics)
+                _log_diagnostics(result.file_path, result.diagnostics)
+            if result.app_class:
+                spool.add(result.app_class)
+            else:
+                parse_errors += 1
+                if not result.diagnostics:
+                    _logger.warning(f'File "{result.file_path}" does not '
+                                    'appear to contain a class definition')
+        # Files raising an error would only fail again
+        timed_out = [item for item in quarantine if item.reason == 'timeout']
+        if not (timed_out and retry_budget) or budget == retry_budget:
+            break
+        _print_verbose(f'Retrying {len(timed_out)} timed out file(s)...')
+        file_paths = [item.file_path for item in timed_out]
+        quarantine = [item for item in quarantine
+                      if item.reason != 'timeout']
+        budget = retry_budget
+        warm_up = 0
+    return parse_errors, quarantine, diagnostics
+
+
+def _clean_shard_dir(sharddir):
+    """Remove the files of a previous shard from a directory."""
+    for name in os.listdir(sharddir):
+        if name == _shard_file or \
+                re.fullmatch(r'(batch|index)-\d+\.pkl', name):
+            os.remove(os.path.join(sharddir, name))
+
+
+def _select_shard(file_paths, shard_index, shard_count):
+    """Yield the files belonging to a given shard.
+
+    The package name is derived from the file name in the same way as
+    in _process_file.
+    """
+    for file_path in file_paths:
+        package = os.path.basename(file_path).split(sep='.')[:-2]
+        key = ':'.join(package).lower().encode('utf-8')
+        if zlib.crc32(key) % shard_count == shard_index:
+            yield file_path
+
+
+def _write_quarantine_report(quarantine, file_path):
+    """Write the list of quarantined files as JSON."""
+    items = [{'file': item.file_path,
+              'reason': item.reason,
+              'elapsed': round(item.elapsed, 3),
+              'error': item.error} for item in quarantine]
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(items, file, indent=2)
+
+
+def _process_input(args):
+    """Process an input argument.
+
+    Globs files and directories where applicable. Zip and tar archives,
+    given directly or found in directories, are replaced with their
+    members (see _split_archive_path).
+    """
+    for arg in _flatten([glob.glob(file) for file in args]):
+        if os.path.exists(arg):
+            if os.path.isfile(arg):
+                yield from _process_input_file(arg)
+            elif os.path.isdir(arg):
+                directory = os.walk(arg)
+                for adir in directory:
+                    base_dir = adir[0]
+                    for filename in adir[2]:
+                        yield from _process_input_file(
+                            os.path.join(base_dir, filename))
+            else:
+                _logger.warning(f'"{arg}" is neither a file nor a directory, '
+                                'skipping.')
+        else:
+            _logger.warning(f'"{arg}" not found, skipping.')
+
+
+def _process_input_file(file_path):
+    """Yield an input file, or the members of a source archive."""
+    if not _is_archive(file_path):
+        yield file_path
+        return
+    try:
+        yield from _list_archive(file_path)
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        _logger.warning(f'Archive "{file_path}" could not be read, '
+                        f'skipping: {e}')
+
+
+def _write_diff_report(report, old_name, new_name, file_path):
+    """Write an API change report as HTML."""
+    if AppClass.xsl_api_diff is None:
+        xslt_file = resource_stream(__name__, 'xslt/api-diff.xsl')
+        xslt = etree.parse(xslt_file)
+        AppClass.xsl_api_diff = etree.XSLT(xslt)
+    with open(file_path, 'wb') as file:
+        doc = etree.ElementTree(_get_diff_xml(report, old_name, new_name))
+        html = AppClass.xsl_api_diff(doc)
+        html.write(file, method='html', pretty_print=True, encoding='utf-8')
+
+
+def _write_package_index(output, packages, file_path):
+    """Write the package index file."""
+    output.write_html(file_path, AppClass.get_package_index_html(packages))
+
+
+def _write_class_index(output, classes, file_path, target=''):
+    """Write the class index file."""
+    output.write_html(file_path,
+                      AppClass.get_class_index_html(classes, target=target))
+
+
+def _write_package_overview(output, package, file_path):
+    """Write a package overview file."""
+    output.write_html(file_path, AppClass.get_package_html(package))
+
+
+def _write_tree_page(output, outputdir, hierarchy, package=None):
+    """Stream a class hierarchy page to disk.
+
+    Without a package, this is the overview tree of all packages.
+    """
+    if package:
+        path = package.split(sep=':')
+        page = '/'.join(['api'] + path + [_package_tree_file])
+        title = f'Hierarchy For Package {package}'
+        api_path = '../' * len(path)
+    else:
+        page = _tree_file
+        title = 'Hierarchy For All Packages'
+        api_path = 'api/'
+    root_path = '../' * page.count('/')
+    file_path = os.path.join(outputdir, *page.split('/'))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(f'{file_path}.tmp', 'wb') as file:
+        hierarchy.write_html(file, title, root_path, api_path, page,
+                             package=package)
+    os.replace(f'{file_path}.tmp', file_path)
+    output.add_existing(file_path)
+
+
+def _write_class_file_xml(outputdir, app_class):
+    """Write a class file as XML."""
+    file_path = os.path.join(outputdir, 'api', *app_class.package,
+                             f'{app_class.name}.xml')
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb') as file:
+        doc = etree.ElementTree(app_class.get_xml())
+        doc.write(file, pretty_print=True, xml_declaration=True,
+                  encoding='utf-8')
+
+
+def _write_class_file_html(output, outputdir, app_class):
+    """Write a class file as HTML.
+
+    If the output has a content store, pages rendered before from the
+    same XML (and resource names) are linked instead of rendered again.
+    """
+    file_path = os.path.join(outputdir, 'api', *app_class.package,
+                             f'{app_class.name}.html')
+    store = output.store
+    if store is None:
+        output.write_html(file_path, app_class.get_html())
+        return
+    xml = app_class.get_xml()
+    key = hashlib.sha1(etree.tostring(xml) + repr(
+        sorted(AppClass.resource_names.items())).encode()).hexdigest()
+    digest = store.rendered.get(key)
+    if digest:
+        output.link(file_path, digest)
+    else:
+        store.rendered[key] = output.write_html(file_path,
+                                                app_class.get_html(xml))
+
+
+def _write_class_stub(output, stubs_dir, app_class):
+    """Write a PeopleCode stub of a class."""
+    file_name = '.'.join((*app_class.package, app_class.name, 'ppl'))
+    output.write(os.path.join(stubs_dir, file_name),
+                 app_class.get_stub().encode('utf-8'))
+
+
+def _write_source_page(output, source_dir, app_class):
+    """Write the highlighted source of a class as an HTML page."""
+    root_path = '../' * (len(app_class.package) + 1)
+    stylesheet = AppClass.resource_names.get('stylesheet.css',
+                                             'stylesheet.css')
+    source = zlib.decompress(app_class.source).decode('utf-8')
+    html = ('<html lang="en">\n<head>\n'
+            '<meta http-equiv="Content-Type" '
+            'content="text/html; charset=utf-8">\n'
+            f'<title>{app_class.fqcn} (PeopleSoft API)</title>\n'
+            '<link rel="stylesheet" type="text/css" '
+            f'href="{root_path}resources/{stylesheet}" title="Style">\n'
+            '</head>\n<body>\n<div class="sourceContainer">\n'
+            f'<pre>{source}</pre>\n</div>\n</body>\n</html>\n')
+    output.write(os.path.join(source_dir, *app_class.package,
+                              f'{app_class.name}.html'),
+                 html.encode('utf-8'))
+
+
+def _write_dependency_graph(output, outputdir, graph):
+    """Write the dependency graph as JSON and DOT.
+
+    Returns the import cycles found.
+    """
+    cycles = graph.get_cycles()
+    json_data = json.dumps(graph.get_json(cycles), indent=2)
+    output.write(os.path.join(outputdir, _graph_file),
+                 json_data.encode('utf-8'))
+    output.write(os.path.join(outputdir,
+                              f'{os.path.splitext(_graph_file)[0]}.dot'),
+                 graph.get_dot().encode('utf-8'))
+    return cycles
+
+
+def _get_superclasses_for_class(superclass_index, superclass):
+    """Return a list with the hierarchy of a superclass.
+
+    superclass_index is a dictionary of SuperclassIndexItem objects
+    keyed by lowercase fully qualified class name.
+    """
+    lst = []
+    seen = set()
+    key = superclass
+    while key and key.package and key.fqcn.lower() not in seen:
+        seen.add(key.fqcn.lower())
+        item = superclass_index.get(key.fqcn.lower())
+        key = item.superclass if item else None
+        if key:
+            lst.append(key)
+    return lst
+
+
+def _resolve_classes(app_classes, superclass_index):
+    """Resolve the subclasses and superclass hierarchy of each class."""
+    for app_class in app_classes:
+        subclasses = AppClass.find_subclasses_by_fqcn(app_class.fqcn)
+        app_class.subclasses = subclasses or []
+        app_class.sort_members()
+        superclass = app_class.superclass
+        if superclass:
+            app_class.superclasses[1:] = _get_superclasses_for_class(
+                superclass_index, superclass)
+
+
+def _peak_rss(who=None):
+    """Return a peak resident set size in MB.
+
+    By default, this is the peak of this process since it started (not
+    since the last call); with resource.RUSAGE_CHILDREN, it is that of
+    the largest terminated child process, such as a parser worker.
+    """
+    if resource is None:
+        return None
+    if who is None:
+        who = resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return peak / divisor
+
+
+def _memory_text():
+    """Return the peak RSS as text, if memory is being reported.
+
+    The peak of the process is a high-water mark for the whole run, so
+    the growth since the previous report is given as well, along with
+    the peak of the largest terminated worker process, if any.
+    """
+    global _last_peak_rss
+    peak = _peak_rss() if _report_memory else None
+    if peak is None:
+        return ''
+    growth = peak - _last_peak_rss
+    _last_peak_rss = peak
+    text = f' Peak RSS of the run so far: {peak:.0f} MB (+{growth:.0f} MB)'
+    children = _peak_rss(resource.RUSAGE_CHILDREN)
+    if children:
+        text += f', of the largest worker: {children:.0f} MB'
+    return text + '.'
+
+
+def _print_done(start_time):
+    """Print the time elapsed since start_time if verbose."""
+    _print_verbose(f' Done in {(time.time() - start_time):.1f} s.'
+                   f'{_memory_text()}')
+
+
+def _remove_dir(path):
+    """Delete a directory recursively."""
+    if os.path.exists(path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            raise NotADirectoryError(f'"{path}" is not a directory')
+
+
+def _remove_file(file_path):
+    """Delete a file and its precompressed siblings, if found."""
+    for path in [file_path] + [f'{file_path}.{ext}' for ext in _compressors]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _norm_path(file_path):
+    """Return a normalized absolute path, for comparisons."""
+    return os.path.normcase(os.path.abspath(file_path))
+
+
+def _is_in_scope(file_path, inputs):
+    """Return whether a file is, or is under, one of the inputs.
+
+    An archive member is in scope if its archive is.
+    """
+    norm_path = _norm_path(_split_archive_path(file_path)[0])
+    for arg in _flatten([glob.glob(file) for file in inputs]):
+        norm_arg = _norm_path(arg)
+        if norm_path == norm_arg or \
+                norm_path.startswith(norm_arg.rstrip(os.sep) + os.sep):
+            return True
+    return False
+
+
+def _git_changed_files(rev_range):
+    """Return the files changed in a range of revisions, as per git.
+
+    Renames are reported as a deletion and an addition. Paths are
+    returned relative to the current directory.
+    """
+    def git(*args):
+        return subprocess.run(
+            ['git'] + list(args), check=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+
+    top_level = git('rev-parse', '--show-toplevel').strip()
+    output = git('diff', '--name-only', '--no-renames', rev_range)
+    return [os.path.relpath(os.path.join(top_level, line))
+            for line in output.splitlines() if line]
+
+
+def _read_changed_files(file_path):
+    """Read a list of changed files, one per line ("-" for stdin)."""
+    if file_path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(file_path, encoding='utf-8') as file:
+            lines = file.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def _new_model_dir(model_dir):
+    """Create a temporary directory to build a model in."""
+    parent = os.path.dirname(os.path.abspath(model_dir))
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix='.appclassdoc-model-', dir=parent)
+
+
+def _update_model(spool, model_dir, changed_files, inputs, include_private,
+                  jobs, time_budget, retry_budget, quarantine_report,
+                  warm_up, with_source=False, with_metrics=False,
+                  diagnostics_report=None):
+    """Merge changed source files into a saved model.
+
+    The classes of the saved model in model_dir are added to the spool,
+    except for those coming from the changed files, which are parsed
+    again if they still exist (and are within the inputs). Returns a
+    SiteUpdate listing the pages affected by the changes: the changed
+    classes themselves, their superclasses and all their descendants,
+    the classes using them and the classes they use (whose "Used by"
+    sections change), the classes importing them and those they import,
+    before and after the changes, and their packages.
+    """
+    start_time = time.time()
+    _print_verbose('Loading model...', end='', flush=True)
+    old_spool, old_private = _ClassSpool.merge([model_dir])
+    _print_done(start_time)
+    if old_private != include_private:
+        raise ValueError(f'The model in "{model_dir}" differs on the '
+                         'inclusion of private members')
+    if old_spool.metrics != with_metrics:
+        raise ValueError(f'The model in "{model_dir}" differs on the '
+                         'collection of metrics')
+    AppClass.reset_indexes()
+    changed = {_norm_path(file_path) for file_path in changed_files}
+    known = {_norm_path(file_path): mtime
+             for file_path, mtime in old_spool.sources.items()}
+    to_parse = []
+    for changed_file in changed_files:
+        if os.path.isfile(changed_file):
+            file_paths = _process_input_file(changed_file)
+        elif _split_archive_path(changed_file)[1] is not None:
+            file_paths = [changed_file]
+        else:
+            continue
+        for file_path in file_paths:
+            norm_path = _norm_path(file_path)
+            mtime = _get_mtime(file_path)
+            # Only the members of a changed archive that changed count
+            if mtime is None or file_path in to_parse or \
+                    (norm_path not in changed and known.get(norm_path)
+                     == mtime):
+                continue
+            if norm_path in known or _is_in_scope(file_path, inputs):
+                to_parse.append(file_path)
+                changed.add(norm_path)
+
+    def is_changed(file_path):
+        archive, member = _split_archive_path(file_path)
+        return _norm_path(file_path) in changed or \
+            (member is not None and _norm_path(archive) in changed
+             and _get_mtime(file_path) is None)
+
+    old_classes = []
+    for batch in old_spool.batches():
+        for app_class in batch:
+            if is_changed(app_class.source_file):
+                old_classes.append(app_class)
+            else:
+                spool.add(app_class)
+    spool.sources.update(
+        (file_path, mtime) for file_path, mtime in old_spool.sources.items()
+        if not is_changed(file_path))
+    class_count = len(spool)
+    _parse_sources(spool, to_parse, include_private, jobs, time_budget,
+                   retry_budget, quarantine_report, warm_up,
+                   with_source=with_source, with_metrics=with_metrics,
+                   diagnostics_report=diagnostics_report)
+    new_classes = spool.descriptors[class_count:]
+    new_keys = {descr.fqcn.lower() for descr in new_classes}
+    old_keys = {app_class.fqcn.lower() for app_class in old_classes}
+    changed_keys = new_keys.union(old_keys)
+    affected = set(changed_keys)
+    packages = {descr.package_name for descr in new_classes}
+    for app_class in old_classes:
+        packages.add(app_class.package_name)
+        if app_class.superclass:
+            affected.add(app_class.superclass.fqcn.lower())
+        affected.update(key for key, _ in app_class.get_type_usages())
+    for key in new_keys:
+        item = spool.superclass_index.get(key)
+        if item:
+            affected.add(item.superclass.fqcn.lower())
+    for key, usage in spool.all_type_usages():
+        user_key = usage.package.fqcn(usage.name).lower()
+        if user_key in new_keys:
+            affected.add(key)
+        if key in changed_keys:
+            affected.add(user_key)
+    for graph in (DependencyGraph.build(old_spool.symbols,
+                                        old_spool.all_imports()),
+                  DependencyGraph.build(spool.symbols, spool.all_imports())):
+        for key in changed_keys.intersection(graph.names):
+            affected.update(fqcn.lower() for fqcn in graph.get_imports(key))
+            affected.update(fqcn.lower()
+                            for fqcn in graph.get_importers(key))
+    children = defaultdict(list)
+    for fqcn, descrs in AppClass.subclass_index.items():
+        children[fqcn.lower()].extend(d.fqcn.lower() for d in descrs)
+    visited = set(changed_keys)
+    stack = list(changed_keys)
+    while stack:
+        for child in children.get(stack.pop(), []):
+            if child not in visited:
+                visited.add(child)
+                affected.add(child)
+                stack.append(child)
+    removed = [(app_class.package, app_class.name)
+               for app_class in old_classes
+               if app_class.fqcn.lower() not in spool.symbols]
+    _print_verbose(f'{len(changed_files)} changed file(s), '
+                   f'{len(affected.intersection(spool.symbols))} page(s) '
+                   f'affected, {len(removed)} class(es) removed.')
+    return SiteUpdate(affected, packages, removed)
+
+
+def _load_unscoped_classes(spool, model_dir, scope, include_private,
+                           with_metrics):
+    """Add the classes of a saved model outside a scope to the spool.
+
+    The files of the packages in scope are left to be parsed again, so
+    that the spool can then replace the saved model.
+    """
+    start_time = time.time()
+    _print_verbose('Loading model...', end='', flush=True)
+    old_spool, old_private = _ClassSpool.merge([model_dir])
+    _print_done(start_time)
+    if old_private != include_private:
+        raise ValueError(f'The model in "{model_dir}" differs on the '
+                         'inclusion of private members')
+    if old_spool.metrics != with_metrics:
+        raise ValueError(f'The model in "{model_dir}" differs on the '
+                         'collection of metrics')
+    AppClass.reset_indexes()
+    for batch in old_spool.batches():
+        for app_class in batch:
+            if not scope(app_class.package_name):
+                spool.add(app_class)
+    spool.sources.update(
+        (file_path, mtime) for file_path, mtime in old_spool.sources.items()
+        if not scope(_get_file_package(file_path)))
+
+
+# PUBLIC FUNCTIONS
+def generate_appclassdoc(outputdir, include_private, do_deletes, files,
+                         verbose_output=False, jobs=1, time_budget=None,
+                         retry_budget=None, quarantine_report=None,
+                         batch_size=None, spill_dir=None, minify=False,
+                         compress=None, hash_resources=False, writers=1,
+                         fsync='none', warm_up=0, database=None,
+                         model_dir=None, changed_files=None, formats=None,
+                         trace=None, packages=None, metrics=False,
+                         diagnostics_report=None, profile_dir=None):
+    """Perform the main functionality of this module.
+
+    If jobs is greater than one or a time_budget (in seconds) is given,
+    files are parsed in worker processes. Files exceeding the budget or
+    raising an exception are quarantined and, if retry_budget is given,
+    those exceeding the budget are retried at the end with that budget.
+    Quarantined files are written to quarantine_report as JSON if a
+    path is provided. Syntax errors
+    are collected per file, parsing of a file being abandoned after
+    _max_syntax_errors of them, and written to diagnostics_report as
+    JSON, or as JUnit XML if its name ends with ".xml". When workers
+    are used, the first warm_up files are used to warm up the parser
+    before the other files are handed to them (see _parse_files).
+
+    If batch_size is given, parsed classes are spilled to disk (under
+    spill_dir, or the system's temporary directory) every batch_size
+    classes and pages are rendered batch by batch, so that memory use
+    does not grow with the size of the corpus.
+
+    If minify is True, HTML files are written without indentation. The
+    compress argument is an iterable of formats ("gz" and/or "br") in
+    which every HTML page and text resource is also written, next to
+    the original file.
+
+    If hash_resources is True, the stylesheets, script and fonts are
+    also copied under names containing a hash of their contents, and
+    all pages link to those copies, so that browsers can cache them
+    indefinitely. The mapping is written to resource-manifest.json.
+
+    Pages are written by a number of writer threads (or by the calling
+    thread if writers is zero) while the next ones are rendered. fsync
+    is the durability policy: "none", "file" (sync every file) or
+    "end" (sync once all files are written).
+
+    If a database path is given, the model is also written to a SQLite
+    database (see ModelDatabase), which is updated incrementally: only
+    the classes of source files that changed since the last update are
+    written again.
+
+    If model_dir is given, the parsed classes are saved to it (in the
+    format of a shard). A subsequent execution can then be given the
+    list of changed_files (modified, added or deleted) since, in which
+    case only those are parsed again and merged into the saved model,
+    and only the pages affected by the changes are written. If no model
+    has been saved yet, all files are processed.
+
+    formats lists the outputs to write: "html" for the documentation
+    site (the default), "stubs" for a PeopleCode stub of every class,
+    with its declaration, members and API comments but no method
+    bodies, in the stubs directory, and "source" for a page with the
+    highlighted source of every class, in the src-html directory, to
+    which the implementations of the members are linked from the class
+    pages. Source pages are rendered from the tokens of the parser, so
+    files are not read or tokenized again.
+
+    If a trace path is given, every parse tree node visited is written
+    to it as a line of JSON with its rule, depth, position and the time
+    spent in it, and a summary by rule is printed if verbose_output is
+    True. Files are then parsed in the current process.
+
+    If a list of package patterns is given (with shell-style wildcards,
+    a package also matching its subpackages), only the pages of the
+    matching packages are written, and other files in outputdir are
+    kept. Every class is still resolved against the whole corpus: if
+    model_dir holds a saved model, only the files of the matching
+    packages are parsed and the other classes are taken from the model,
+    which is then updated with the classes parsed, as are the build
+    manifest and the model database; otherwise all files are parsed.
+
+    If metrics is True, the Metrics of every method, getter and setter
+    implementation (lines of code, statements, cyclomatic complexity,
+    maximum nesting and throw statements) are computed while parsing,
+    and shown on the class pages and written to the model database.
+
+    If profile_dir is given, each phase of the build (scan, parse,
+    resolve, clean, render and indexes) is profiled with cProfile, as
+    are the writer threads ("write") and the parser worker processes. Their
+    profiles are written to profile_dir, merged into a single pstats
+    file and into collapsed stacks for flame graph tools, and the
+    functions taking the most time are printed if verbose_output is
+    True.
+    """
+    global _verbose, _report_memory, _pretty_print, _tracer, _profiler
+    _verbose = verbose_output
+    _report_memory = bool(batch_size)
+    _pretty_print = not minify
+    formats = _check_formats(formats)
+    file_list = _get_file_list(files)
+    if trace and (jobs > 1 or time_budget):
+        _logger.warning('Tracing parses files in the current process, '
+                        'ignoring the number of jobs and time budget')
+        jobs = 1
+        time_budget = None
+    scope = _get_package_filter(packages) if packages else None
+    if scope and changed_files is not None:
+        raise ValueError('Changed files cannot be processed in a '
+                         'package-scoped build')
+    if changed_files is not None:
+        if not model_dir:
+            raise ValueError('A model directory is required to process '
+                             'changed files')
+        if not os.path.exists(os.path.join(model_dir, _shard_file)):
+            _logger.warning(f'No model found in "{model_dir}", processing '
+                            'all files')
+            changed_files = None
+    output = _OutputFiles(compress, writers=writers, fsync=fsync)
+    _logger.info(f'Output directory: "{outputdir.rstrip(os.sep)}"')
+    outputdir = _prepare_dir(outputdir)
+    AppClass.reset_indexes()
+    model_temp_dir = None
+    scoped_model = scope and model_dir and \
+        os.path.exists(os.path.join(model_dir, _shard_file))
+    if model_dir:
+        model_temp_dir = _new_model_dir(model_dir)
+        spool = _ClassSpool(batch_size=batch_size or 1000,
+                            shard_dir=model_temp_dir)
+    else:
+        spool = _ClassSpool(batch_size=batch_size, spill_dir=spill_dir)
+    if trace:
+        _tracer = _Tracer(trace)
+    if profile_dir:
+        _profiler = _Profiler(profile_dir)
+    try:
+        update = None
+        if changed_files is not None:
+            _profile_phase('parse')
+            update = _update_model(spool, model_dir, changed_files,
+                                   file_list, include_private, jobs,
+                                   time_budget, retry_budget,
+                                   quarantine_report, warm_up,
+                                   with_source=('source' in formats),
+                                   with_metrics=metrics,
+                                   diagnostics_report=diagnostics_report)
+        else:
+            _profile_phase('scan')
+            file_paths = _process_input(file_list)
+            if _profiler is not None:
+                # Scanned up front, to be profiled apart from parsing
+                file_paths = list(file_paths)
+                _profile_phase('parse')
+            if scoped_model:
+                _load_unscoped_classes(spool, model_dir, scope,
+                                       include_private, metrics)
+                file_paths = (file_path for file_path in file_paths
+                              if scope(_get_file_package(file_path)))
+            _parse_sources(spool, file_paths, include_private, jobs,
+                           time_budget, retry_budget, quarantine_report,
+                           warm_up, with_source=('source' in formats),
+                           with_metrics=metrics,
+                           diagnostics_report=diagnostics_report)
+        if scope:
+            update = _get_scoped_update(outputdir, spool, scope, do_deletes)
+        if model_dir:
+            spool.save(include_private)
+        _write_site(outputdir, do_deletes, spool, include_private, output,
+                    hash_resources=hash_resources, database=database,
+                    update=update, formats=formats)
+        if model_dir:
+            _remove_dir(model_dir)
+            os.replace(model_temp_dir, model_dir)
+            model_temp_dir = None
+    finally:
+        output.abort()
+        spool.close()
+        if model_temp_dir:
+            shutil.rmtree(model_temp_dir, ignore_errors=True)
+        if _tracer is not None:
+            _tracer.close()
+            _print_verbose(_tracer.get_report())
+            _tracer = None
+        if _profiler is not None:
+            stats = _profiler.close()
+            if stats is not None:
+                _print_verbose(_get_profile_report(stats, _profiler.waited))
+            _profiler = None
+
+
+def _get_scoped_update(outputdir, spool, scope, do_deletes):
+    """Return a SiteUpdate for the packages matching a scope.
+
+    If do_deletes is True, the pages of classes no longer found in
+    those packages are removed.
+    """
+    classes = {key for key, descr in spool.symbols.items()
+               if scope(descr.package_name)}
+    packages = {package for package in AppClass.package_index
+                if scope(package)}
+    removed = []
+    if do_deletes:
+        for package in packages:
+            path = package.split(sep=':')
+            package_dir = os.path.join(outputdir, 'api', *path)
+            if not os.path.isdir(package_dir):
+                continue
+            for file_name in os.listdir(package_dir):
+                name, ext = os.path.splitext(file_name)
+                if ext == '.html' and file_name not in (
+                        '0package.html', _package_tree_file) and \
+                        f'{package}:{name}'.lower() not in spool.symbols:
+                    removed.append((path, name))
+    _print_verbose(f'{len(classes)} class(es) in {len(packages)} '
+                   'package(s) in scope.')
+    return SiteUpdate(classes, packages, removed)
+
+
+def _get_file_list(files):
+    """Return the list of input arguments, validating them."""
+    if files:
+        if type(files) is str:
+            return [files]
+        else:
+            return files
+    else:
+        raise ValueError('No files or directories provided')
+
+
+def _prepare_dir(path):
+    """Strip a trailing separator and create the directory if needed."""
+    path = path.rstrip(os.sep)
+    if os.path.exists(path) and not os.path.isdir(path):
+        raise ValueError(f'"{path}" is not a directory')
+    else:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _parse_sources(spool, file_paths, include_private, jobs, time_budget,
+                   retry_budget, quarantine_report, warm_up, cache=None,
+                   with_source=False, with_metrics=False,
+                   diagnostics_report=None):
+    """Parse the source files into the spool."""
+    start_time = time.time()
+    class_count = len(spool)
+    _print_verbose('Parsing source files...')
+    parse_errors, quarantine, diagnostics = _parse_corpus(
+        spool, file_paths, include_private, jobs=jobs,
+        time_budget=time_budget, retry_budget=retry_budget, warm_up=warm_up,
+        cache=cache, with_source=with_source, with_metrics=with_metrics)
+    if parse_errors > 0:
+        error_text = f', {parse_errors} parse error(s),'
+    else:
+        error_text = ''
+    if diagnostics:
+        file_count = len({item.file_path for item in diagnostics})
+        error_text = (f'{error_text or ","} {len(diagnostics)} syntax '
+                      f'error(s) in {file_count} file(s),')
+    if quarantine:
+        error_text += f' {len(quarantine)} file(s) quarantined,'
+    _print_verbose(f'{len(spool) - class_count} class(es) parsed successfully'
+                   f'{error_text} in {(time.time() - start_time):.1f} s.'
+                   f'{_memory_text()}')
+    for item in quarantine:
+        _print_verbose(f'  {item.file_path}: {item.reason} after '
+                       f'{item.elapsed:.1f} s ({item.error})')
+    if quarantine_report:
+        _write_quarantine_report(quarantine, quarantine_report)
+    if diagnostics_report:
+        _write_diagnostics_report(diagnostics, diagnostics_report)
+
+
+def _parse_cached(spool, file_paths, cache, include_private, jobs,
+                  time_budget, retry_budget, warm_up, with_source=False,
+                  with_metrics=False, quarantine_report=None,
+                  diagnostics_report=None):
+    """Parse the source files into the spool, reusing cached classes.
+
+    Only the files whose contents are not found in the _ParseCache are
+    parsed, and then added to it.
+    """
+    to_parse = []
+    reused = 0
+    for file_path in file_paths:
+        found, app_class = cache.get(file_path)
+        if not found:
+            to_parse.append(file_path)
+            continue
+        reused += 1
+        spool.sources[file_path] = _get_mtime(file_path)
+        if app_class:
+            app_class.source_file = file_path
+            spool.add(app_class)
+    if reused:
+        _print_verbose(f'{reused} file(s) identical to those of a previous '
+                       'version.')
+    _parse_sources(spool, to_parse, include_private, jobs, time_budget,
+                   retry_budget, quarantine_report, warm_up, cache=cache,
+                   with_source=with_source, with_metrics=with_metrics,
+                   diagnostics_report=diagnostics_report)
+
+
+def _get_version_path(file_path, name):
+    """Return the path of the report of a version, or None."""
+    if file_path is None:
+        return None
+    root, ext = os.path.splitext(file_path)
+    return f'{root}-{name}{ext}'
+
+
+def _check_formats(formats):
+    """Validate the output formats, returning the default if none."""
+    formats = list(formats or _output_formats[:1])
+    for fmt in formats:
+        if fmt not in _output_formats:
+            raise ValueError(f'Unsupported output format "{fmt}"')
+    return formats
+
+
+def _write_site(outputdir, do_deletes, spool, include_private, output,
+                hash_resources=False, database=None, update=None,
+                formats=None):
+    """Resolve the classes in the spool and write the site.
+
+    formats lists the outputs to write: "html" for the site (the
+    default), "stubs" for a PeopleCode stub per class (see
+    AppClass.get_stub), in the stubs directory, and "source" for a
+    page with the highlighted source of every class parsed with it, in
+    the src-html directory, linked from the class pages. If
+    hash_resources is True, the resources are linked under
+    content-hashed names (see _fingerprint_resources). If a database
+    path is given, the model database is updated as classes are
+    written. If a SiteUpdate is given, existing files are kept and only
+    the pages of the classes and packages listed in it are written,
+    while those of the removed classes are deleted.
+    """
+    if spool:
+        _profile_phase('resolve')
+        start_time = time.time()
+        _print_verbose('Resolving class hierarchies and cross-references...',
+                       end='', flush=True)
+        AppClass.build_cross_references(spool.symbols,
+                                        spool.all_type_usages(),
+                                        spool.all_imports())
+        spool.type_usages = []
+        if not spool.is_spilled:
+            spool.batch.sort(key=lambda c: f'{c.name}:{c.package_name}')
+            _resolve_classes(spool.batch, spool.superclass_index)
+        _print_done(start_time)
+        formats = formats or _output_formats[:1]
+        html = 'html' in formats
+        stubs_dir = os.path.join(outputdir, 'stubs') \
+            if 'stubs' in formats else None
+        source_dir = os.path.join(outputdir, _source_dir) \
+            if 'source' in formats else None
+        api_dir = os.path.join(outputdir, 'api')
+        resources_dir = os.path.join(outputdir, 'resources')
+        pkg_idx_file = os.path.join(outputdir, 'packages.html')
+        cls_idx_file_frame = os.path.join(outputdir, 'classes-frame.html')
+        cls_idx_file_noframe = os.path.join(outputdir, 'classes-noframe.html')
+        if do_deletes and update is None:
+            # Delete API directory and index files
+            _profile_phase('clean')
+            start_time = time.time()
+            _print_verbose('Deleting existing files (if found)...', end='',
+                           flush=True)
+            if html:
+                _remove_dir(api_dir)
+                _remove_dir(resources_dir)
+                stale_files = [pkg_idx_file, cls_idx_file_frame,
+                               cls_idx_file_noframe,
+                               os.path.join(outputdir, _tree_file),
+                               os.path.join(outputdir,
+                                            _resource_manifest_file)]
+                # Precompressed siblings of the top-level pages
+                for file_name in ('packages.html', 'classes-frame.html',
+                                  'classes-noframe.html', 'index.html',
+                                  'start-page.html', _tree_file):
+                    for ext in _compressors:
+                        stale_files.append(os.path.join(outputdir,
+                                                        f'{file_name}.{ext}'))
+                for file_path in stale_files:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+            if stubs_dir:
+                _remove_dir(stubs_dir)
+            if source_dir:
+                _remove_dir(source_dir)
+            _print_done(start_time)
+        # Produce per-class files
+        _profile_phase('render')
+        start_time = time.time()
+        _print_verbose('Writing files...', end='', flush=True)
+        if html and not os.path.exists(resources_dir):
+            resources_src = resource_filename(__name__, 'resources')
+            shutil.copytree(resources_src, resources_dir)
+            os.replace(os.path.join(resources_dir, 'index.html'),
+                       os.path.join(outputdir, 'index.html'))
+            os.replace(os.path.join(resources_dir, 'start-page.html'),
+                       os.path.join(outputdir, 'start-page.html'))
+        if html and hash_resources:
+            AppClass.resource_names = _fingerprint_resources(outputdir,
+                                                             resources_dir)
+        manifest = _ManifestWriter(outputdir, include_private,
+                                   compress=output.formats)
+        model = None
+        if database:
+            model = _ModelWriter(database, include_private, spool.sources,
+                                 metrics=spool.metrics)
+        no_source = 0
+        for batch in spool.batches():
+            for app_class in batch:
+                manifest.add_class(app_class)
+                if model:
+                    model.add_class(app_class)
+                if update and app_class.fqcn.lower() not in update.classes:
+                    _add_manifest_files(manifest, app_class, html)
+                    continue
+                if source_dir and app_class.source:
+                    _write_source_page(output, source_dir, app_class)
+                elif source_dir:
+                    no_source += 1
+                else:
+                    # Do not link to source pages that are not written
+                    app_class.source = None
+                if html:
+                    if spool.is_spilled:
+                        _resolve_classes([app_class], spool.superclass_index)
+                    _write_class_file_html(output, outputdir, app_class)
+                if stubs_dir:
+                    _write_class_stub(output, stubs_dir, app_class)
+                _add_manifest_files(manifest, app_class, html)
+        if html:
+            for package in sorted(AppClass.package_index):
+                path = '/'.join(['api', *package.split(sep=':')])
+                manifest.add_file(f'{path}/0package.html')
+                manifest.add_file(f'{path}/{_package_tree_file}')
+        manifest.close()
+        cycles = _write_dependency_graph(output, outputdir,
+                                         AppClass.dependency_graph)
+        if update:
+            for package, name in update.removed:
+                if html:
+                    _remove_file(os.path.join(api_dir, *package,
+                                              f'{name}.html'))
+                if stubs_dir:
+                    _remove_file(os.path.join(
+                        stubs_dir, '.'.join((*package, name, 'ppl'))))
+                if source_dir:
+                    _remove_file(os.path.join(source_dir, *package,
+                                              f'{name}.html'))
+        if model:
+            model.close()
+        _print_done(start_time)
+        if no_source:
+            _logger.warning(f'{no_source} class(es) without a source page, '
+                            'as they were parsed without it')
+        if model:
+            _print_verbose(f'{model.written} class(es) updated in the model '
+                           'database.')
+        if cycles:
+            _print_verbose(f'{len(cycles)} import cycle(s) found, the '
+                           f'largest with {max(map(len, cycles))} classes.')
+        # Produce indexes
+        _profile_phase('indexes')
+        if html:
+            start_time = time.time()
+            _print_verbose('Writing indexes...', end='', flush=True)
+            classes = sorted(spool.descriptors,
+                             key=lambda c: f'{c.name}:{c.package_name}')
+            _write_class_index(output, classes, cls_idx_file_frame,
+                               target='classFrame')
+            _write_class_index(output, classes, cls_idx_file_noframe)
+            packages = sorted(AppClass.package_index.keys())
+            _write_package_index(output, packages, pkg_idx_file)
+            for pkg in packages:
+                if update is None or pkg in update.packages:
+                    _write_package_overview(output, pkg, os.path.join(
+                        api_dir, *pkg.split(sep=':'), '0package.html'))
+            if update:
+                for pkg in update.packages.difference(packages):
+                    _remove_file(os.path.join(api_dir, *pkg.split(sep=':'),
+                                              '0package.html'))
+                    _remove_file(os.path.join(api_dir, *pkg.split(sep=':'),
+                                              _package_tree_file))
+            # The tree pages are always written in full, as the ancestry
+            # of a class can span packages
+            hierarchy = _ClassHierarchy(spool.symbols,
+                                        spool.superclass_index)
+            _write_tree_page(output, outputdir, hierarchy)
+            for pkg in packages:
+                _write_tree_page(output, outputdir, hierarchy, package=pkg)
+            for file_name in ('index.html', 'start-page.html'):
+                output.add_existing(os.path.join(outputdir, file_name))
+            for base_dir, _, file_names in os.walk(resources_dir):
+                for file_name in file_names:
+                    output.add_existing(os.path.join(base_dir, file_name))
+        output.close()
+        if html:
+            _print_done(start_time)
+        _print_verbose(f'Output: {output.get_report()}.')
+    else:
+        _logger.warning('No classes found')
+
+
+def shard_appclassdoc(sharddir, include_private, files, verbose_output=False,
+                      shard_index=0, shard_count=1, jobs=1, time_budget=None,
+                      retry_budget=None, quarantine_report=None,
+                      batch_size=None, warm_up=0, with_source=False,
+                      with_metrics=False, diagnostics_report=None):
+    """Parse a subset of the source files into a shard.
+
+    Files are assigned to shards by a stable hash of their package
+    name, so that every package ends up in exactly one of shard_count
+    shards; only the files of shard number shard_index are parsed. The
+    shard is written to sharddir, to be combined with the other shards
+    by merge_appclassdoc. If with_source is True, the highlighted source
+    of every class is kept in the shard, for a merge writing the
+    "source" format, and if with_metrics is True, the Metrics of the
+    implementations are computed. The syntax errors of the shard's files
+    are written to diagnostics_report, as in generate_appclassdoc.
+    """
+    global _verbose, _report_memory
+    _verbose = verbose_output
+    _report_memory = bool(batch_size)
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f'Shard index {shard_index} is out of range for '
+                         f'{shard_count} shard(s)')
+    file_list = _get_file_list(files)
+    sharddir = _prepare_dir(sharddir)
+    _clean_shard_dir(sharddir)
+    AppClass.reset_indexes()
+    spool = _ClassSpool(batch_size=batch_size or 1000, shard_dir=sharddir)
+    file_paths = _select_shard(_process_input(file_list), shard_index,
+                               shard_count)
+    _parse_sources(spool, file_paths, include_private, jobs, time_budget,
+                   retry_budget, quarantine_report, warm_up,
+                   with_source=with_source, with_metrics=with_metrics,
+                   diagnostics_report=diagnostics_report)
+    spool.save(include_private)
+
+
+def merge_appclassdoc(outputdir, do_deletes, shards, verbose_output=False,
+                      minify=False, compress=None, hash_resources=False,
+                      writers=1, fsync='none', database=None, formats=None):
+    """Combine several shards and write the documentation site.
+
+    Class hierarchies and cross-references are resolved across all the
+    shards before any page is written. The minify, compress,
+    hash_resources, writers, fsync, database and formats arguments are
+    as for generate_appclassdoc.
+    """
+    global _verbose, _report_memory, _pretty_print
+    _verbose = verbose_output
+    _report_memory = True
+    _pretty_print = not minify
+    formats = _check_formats(formats)
+    shard_list = _get_file_list(shards)
+    output = _OutputFiles(compress, writers=writers, fsync=fsync)
+    outputdir = _prepare_dir(outputdir)
+    AppClass.reset_indexes()
+    start_time = time.time()
+    _print_verbose('Loading shards...', end='', flush=True)
+    spool, include_private = _ClassSpool.merge(shard_list)
+    _print_done(start_time)
+    _print_verbose(f'{len(spool)} class(es) found in {len(shard_list)} '
+                   'shard(s).')
+    try:
+        _write_site(outputdir, do_deletes, spool, include_private, output,
+                    hash_resources=hash_resources, database=database,
+                    formats=formats)
+    finally:
+        output.abort()
+
+
+def versions_appclassdoc(outputdir, include_private, do_deletes, versions,
+                         verbose_output=False, jobs=1, time_budget=None,
+                         retry_budget=None, minify=False, compress=None,
+                         hash_resources=False, writers=1, fsync='none',
+                         warm_up=0, formats=None, metrics=False,
+                         quarantine_report=None, diagnostics_report=None):
+    """Generate the documentation sites of several versions of the code.
+
+    versions maps version names to lists of source files or directories
+    (or is a list of such pairs), every version being written to a
+    subdirectory of outputdir named after it. Source files identical
+    across versions are parsed once, and class pages rendered from
+    identical inputs are rendered once. Every distinct file is stored
+    once in a content-addressed store (the .store subdirectory), to
+    which the files of every version are hard-linked. Objects no longer
+    linked from any version are deleted from the store at the end.
+    Reports are written for every version, with the name of the version
+    appended to the base name of the given file (e.g. "report-dev.json"),
+    and cover the files parsed for that version. The other arguments
+    are as for generate_appclassdoc.
+    """
+    global _verbose, _report_memory, _pretty_print
+    _verbose = verbose_output
+    _report_memory = False
+    _pretty_print = not minify
+    formats = _check_formats(formats)
+    versions = OrderedDict(versions)
+    for name in versions:
+        if not name or name in (os.curdir, os.pardir, _store_dir) \
+                or re.search(r'[\\/]', name):
+            raise ValueError(f'Invalid version name "{name}"')
+    outputdir = _prepare_dir(outputdir)
+    store = _ContentStore(os.path.join(outputdir, _store_dir),
+                          fsync=(fsync == 'file'))
+    cache = _ParseCache()
+    for name, files in versions.items():
+        _print_verbose(f'Version "{name}":')
+        version_dir = _prepare_dir(os.path.join(outputdir, name))
+        if not do_deletes:
+            store.detach(version_dir)
+            for base_dir, _, _ in os.walk(os.path.join(version_dir,
+                                                       'resources')):
+                store.detach(base_dir)
+        AppClass.reset_indexes()
+        spool = _ClassSpool()
+        _parse_cached(spool, _process_input(_get_file_list(files)), cache,
+                      include_private, jobs, time_budget, retry_budget,
+                      warm_up, with_source=('source' in formats),
+                      with_metrics=metrics,
+                      quarantine_report=_get_version_path(quarantine_report,
+                                                          name),
+                      diagnostics_report=_get_version_path(
+                          diagnostics_report, name))
+        output = _OutputFiles(compress, writers=writers, fsync=fsync,
+                              store=store)
+        try:
+            _write_site(version_dir, do_deletes, spool, include_private,
+                        output, hash_resources=hash_resources,
+                        formats=formats)
+        finally:
+            output.abort()
+    removed = store.prune()
+    _print_verbose(f'Store: {store.get_report()}; {removed} unused '
+                   'object(s) deleted.')
+
+
+def serve_appclassdoc(include_private, files, verbose_output=False,
+                      host='localhost', port=8000, jobs=1, time_budget=None,
+                      model_dir=None, cache_size=256, poll_interval=2.0,
+                      warm_up=0, retry_budget=None, quarantine_report=None,
+                      diagnostics_report=None):
+    """Serve the documentation site over HTTP, rendering it on demand.
+
+    The source files are parsed (or the model is loaded from model_dir,
+    if given) and pages are only rendered when requested, keeping up to
+    cache_size of them in memory. Every poll_interval seconds (unless
+    zero) the source files are checked, and the model updated if any of
+    them changed. The parsing arguments are as for generate_appclassdoc,
+    and the reports are written again whenever files are parsed. Runs
+    until interrupted.
+    """
+    global _verbose
+    _verbose = verbose_output
+    file_list = _get_file_list(files)
+    start_time = time.time()
+    model = _PreviewModel(include_private, file_list, model_dir=model_dir,
+                          cache_size=cache_size, jobs=jobs,
+                          time_budget=time_budget, warm_up=warm_up,
+                          retry_budget=retry_budget,
+                          quarantine_report=quarantine_report,
+                          diagnostics_report=diagnostics_report)
+    model.load()
+    if not model.classes:
+        _logger.warning('No classes found')
+    server = _PreviewServer((host, port), model)
+    _print_verbose(f'{len(model.classes)} class(es) ready in '
+                   f'{(time.time() - start_time):.1f} s.')
+    print(f'Serving on http://{host}:{server.server_port}/ '
+          '(press Ctrl+C to stop)', flush=True)
+    stop_event = threading.Event()
+    if poll_interval:
+        threading.Thread(target=_watch_sources, daemon=True,
+                         args=(model, poll_interval, stop_event)).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+def diff_appclassdoc(old, new, outputdir, verbose_output=False):
+    """Write a report of the API changes between two generations.
+
+    old and new are output directories of previous executions (or the
+    build manifests within them). The report is written to outputdir
+    as api-diff.json and api-diff.html, and also returned.
+    """
+    global _verbose
+    _verbose = verbose_output
+    start_time = time.time()
+    _print_verbose('Comparing build manifests...', end='', flush=True)
+    report = _diff_manifests(_load_manifest(old), _load_manifest(new))
+    os.makedirs(outputdir, exist_ok=True)
+    with open(os.path.join(outputdir, 'api-diff.json'), 'w',
+              encoding='utf-8') as file:
+        json.dump(dict(report, old=old, new=new), file, indent=2)
+    _write_diff_report(report, old, new,
+                       os.path.join(outputdir, 'api-diff.html'))
+    _print_done(start_time)
+    _print_verbose(f'{len(report["added"])} class(es) added, '
+                   f'{len(report["removed"])} removed, '
+                   f'{len(report["changed"])} changed.')
+    return report
+
+
+def impact_appclassdoc(graph, classes, max_depth=None):
+    """Return the classes affected by changes to the given classes.
+
+    graph is the output directory of a previous execution (or the
+    dependency graph within it), and classes an iterable of fully
+    qualified class names. Returns a list of (fqcn, distance) tuples
+    with every class importing any of them, directly or through others
+    (up to max_depth imports away if given), distance being the number
+    of imports in between.
+    """
+    return DependencyGraph.load(graph).get_impact(classes,
+                                                  max_depth=max_depth)
+
+
+def check_appclassdoc(outputdir, models, prune=False, verbose_output=False):
+    """Check the links of a generated site against its model.
+
+    outputdir is the output directory of a previous execution, and
+    models the model directories or shards it was generated from. The
+    links that the class and package pages contain are derived from the
+    resolved model, and checked against the pages listed in the build
+    manifest and the files found in outputdir, without parsing any HTML.
+    Returns a dictionary with the number of pages and links checked,
+    the broken links (as BrokenLink tuples, the reason being "missing",
+    "stale" for an orphaned page or "anchor" for an unknown member), the
+    missing pages and the orphaned files in the api and source
+    directories, which are those not listed in the build manifest. If
+    prune is True, the orphaned files are deleted, along with the
+    directories left empty, unless a build is writing a new manifest,
+    as it may have written files not listed yet: they are then all
+    listed as kept.
+    """
+    global _verbose
+    _verbose = verbose_output
+    start_time = time.time()
+    _print_verbose('Loading the build manifest and model...', end='',
+                   flush=True)
+    checker = _LinkChecker(outputdir, _load_manifest(outputdir))
+    AppClass.reset_indexes()
+    spool, _ = _ClassSpool.merge(_get_file_list(models))
+    AppClass.build_cross_references(spool.symbols, spool.all_type_usages(),
+                                    spool.all_imports())
+    spool.type_usages = []
+    names = {}
+    resource_manifest = os.path.join(outputdir, _resource_manifest_file)
+    if os.path.exists(resource_manifest):
+        with open(resource_manifest, encoding='utf-8') as file:
+            names = json.load(file)
+    resources = [names.get(name, name)
+                 for name in ('stylesheet.css', 'script.js')]
+    _print_done(start_time)
+    start_time = time.time()
+    _print_verbose('Checking links...', end='', flush=True)
+    pages = 0
+    for batch in spool.batches():
+        _resolve_classes(batch, spool.superclass_index)
+        for app_class in batch:
+            page = _get_class_page(app_class.package, app_class.name)
+            if page not in checker.expected:
+                continue
+            if app_class.source:
+                checker.expected.add('/'.join([_source_dir,
+                                               *app_class.package,
+                                               f'{app_class.name}.html']))
+            checker.check(page, _get_class_links(app_class, resources))
+            pages += 1
+    for package, lst in AppClass.package_index.items():
+        path = '/'.join(['api', *package.split(sep=':')])
+        page = f'{path}/0package.html'
+        if page in checker.expected:
+            checker.check(page, {f'{path}/{descr.name}.html'
+                                 for descr in lst})
+            pages += 1
+    spool.close()
+    missing = checker.get_missing()
+    orphans = checker.get_orphans()
+    _print_done(start_time)
+    _print_verbose(f'{pages} page(s) and {checker.links} link(s) checked: '
+                   f'{len(checker.broken)} broken link(s), {len(missing)} '
+                   f'missing page(s), {len(orphans)} orphaned file(s).')
+    kept = []
+    if prune and orphans and os.path.exists(
+            os.path.join(outputdir, f'{_manifest_file}.tmp')):
+        kept = orphans
+        _logger.warning(f'{len(kept)} orphaned file(s) kept, as a build is '
+                        'writing a new build manifest (or was interrupted '
+                        'while writing it)')
+    elif prune and orphans:
+        for path in orphans:
+            os.remove(os.path.join(outputdir, *path.split('/')))
+        for directory in ('api', _source_dir):
+            for base_dir, _, _ in os.walk(os.path.join(outputdir, directory),
+                                          topdown=False):
+                if not os.listdir(base_dir):
+                    os.rmdir(base_dir)
+        _print_verbose(f'{len(orphans)} orphaned file(s) deleted.')
+    return {'pages': pages, 'links': checker.links,
+            'broken': sorted(checker.broken), 'missing': missing,
+            'orphans': orphans, 'kept': kept}
+
+
+def _configure_logging(verbosity):
+    """Configure logging according to the CLI verbosity level."""
+    if verbosity == 2:
+        logging.basicConfig(level=logging.INFO)
+    elif verbosity > 2:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig()
+
+
+def _add_verbosity_argument(parser):
+    """Add the verbosity switch to a CLI argument parser."""
+    parser.add_argument(
+        '-v', '--verbosity', action='count', default=0,
         help='increase output verbosity')
+
+
+def _diff_cli(argv):
+    """The CLI for the diff command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc diff',
+        description=('Report the API changes between two generations of the '
+                     'documentation.'))
+    _add_verbosity_argument(parser)
+    parser.add_argument(
+        '-o', '--outputdir', default=os.getcwd(),
+        help=('the output directory for the report files (defaults to the '
+              'current directory)'))
+    parser.add_argument(
+        'old', help='the output directory (or build manifest) of the old '
+                    'generation')
+    parser.add_argument(
+        'new', help='the output directory (or build manifest) of the new '
+                    'generation')
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    diff_appclassdoc(args.old, args.new, args.outputdir.rstrip(os.sep),
+                     verbose_output=(args.verbosity > 0))
+
+
+def _impact_cli(argv):
+    """The CLI for the impact command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc impact',
+        description=('List the classes transitively affected by changes to '
+                     'the given classes, by following their imports.'))
+    _add_verbosity_argument(parser)
+    parser.add_argument(
+        '-d', '--max-depth', type=int, metavar='N',
+        help='only follow up to N imports from the given classes')
+    parser.add_argument(
+        'graph', help=('the output directory (or dependency graph) of a '
+                       'previous generation'))
+    parser.add_argument(
+        'classes', metavar='fqcn', nargs='+',
+        help='the fully qualified name of a changed class')
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    try:
+        impact = impact_appclassdoc(args.graph, args.classes,
+                                    max_depth=args.max_depth)
+    except OSError as e:
+        parser.error(f'cannot read the dependency graph: {e}')
+    except ValueError as e:
+        parser.error(str(e))
+    for fqcn, distance in impact:
+        print(f'{fqcn}\t{distance}')
+    if args.verbosity > 0:
+        print(f'{len(impact)} class(es) affected.')
+
+
+def _check_cli(argv):
+    """The CLI for the check command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc check',
+        description=('Check the links of a generated site against the model '
+                     'it was generated from, and find orphaned files.'))
+    _add_verbosity_argument(parser)
+    parser.add_argument(
+        '--prune', action='store_true', default=False,
+        help='delete the orphaned files found')
+    parser.add_argument(
+        'outputdir', help='the output directory of a previous generation')
+    parser.add_argument(
+        'models', metavar='modeldir', nargs='+',
+        help=('the model directory (see --model) or the shard directories '
+              'the site was generated from'))
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    report = check_appclassdoc(args.outputdir.rstrip(os.sep), args.models,
+                               prune=args.prune,
+                               verbose_output=(args.verbosity > 0))
+    for link in report['broken']:
+        print(f'{link.reason}\t{link.page}\t{link.target}')
+    for path in report['missing']:
+        print(f'missing\t{path}')
+    kept = set(report['kept'])
+    for path in report['orphans']:
+        if path in kept:
+            print(f'kept\t{path}')
+        else:
+            print(f'{"pruned" if args.prune else "orphan"}\t{path}')
+    if report['broken'] or report['missing'] or kept or \
+            (report['orphans'] and not args.prune):
+        sys.exit(1)
+
+
+def _add_parsing_arguments(parser):
+    """Add the switches controlling the parsing of source files."""
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='the number of worker processes used to parse source files')
+    parser.add_argument(
+        '-t', '--time-budget', type=float, metavar='SECONDS',
+        help=('the maximum time allowed to parse a single file before it is '
+              'quarantined'))
+    parser.add_argument(
+        '--warm-up', type=int, default=0, metavar='N',
+        help=('parse the first N files first, one at a time, so that the '
+              'worker processes start with a warm parser'))
+    parser.add_argument(
+        '--retry-budget', type=float, metavar='SECONDS',
+        help=('retry the files quarantined for exceeding the time budget '
+              'at the end with this time budget'))
+    parser.add_argument(
+        '--quarantine-report', metavar='FILE',
+        help='write the list of quarantined files to FILE as JSON')
+    parser.add_argument(
+        '--diagnostics-report', metavar='FILE',
+        help=('write the syntax errors found to FILE as JSON, or as JUnit XML '
+              'if FILE ends with .xml'))
+
+
+def _add_output_arguments(parser, database=True):
+    """Add the switches controlling the format of the output files."""
+    parser.add_argument(
+        '-f', '--format', action='append', choices=_output_formats,
+        dest='formats',
+        help=('the output to write: "html" for the documentation site, '
+              '"stubs" for a PeopleCode stub of every class, or "source" for '
+              'highlighted source pages linked from the class pages (can be '
+              'specified more than once; defaults to "html")'))
+    parser.add_argument(
+        '-m', '--minify', action='store_true', default=False,
+        help='write HTML files without indentation')
+    parser.add_argument(
+        '-z', '--compress', action='append', choices=sorted(_compressors),
+        metavar='FORMAT',
+        help=('also write every page and text resource compressed in FORMAT '
+              '("gz" or "br"; can be specified more than once)'))
+    parser.add_argument(
+        '--hash-resources', action='store_true', default=False,
+        help=('link the stylesheets, script and fonts under content-hashed '
+              'file names, for long-lived browser caching'))
+    parser.add_argument(
+        '--writers', type=int, default=1, metavar='N',
+        help=('the number of threads writing files while pages are rendered '
+              '(0 to write them from the rendering thread; defaults to 1)'))
+    parser.add_argument(
+        '--fsync', choices=_OutputFiles.fsync_policies, default='none',
+        help=('when to flush written files to disk: never explicitly, after '
+              'each file, or once at the end (defaults to "none")'))
+    if database:
+        parser.add_argument(
+            '--database', metavar='FILE',
+            help=('also write the model to a SQLite database, updating it '
+                  'incrementally if it exists'))
+
+
+def _shard_cli(argv):
+    """The CLI for the shard command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc shard',
+        description=('Parse a subset of the source files into a shard to be '
+                     'merged later.'))
+    _add_verbosity_argument(parser)
+    parser.add_argument(
+        '-o', '--sharddir', required=True,
+        help='the output directory for the shard')
+    parser.add_argument(
+        '-i', '--shard-index', type=int, default=0, metavar='I',
+        help='the (zero-based) number of this shard (defaults to 0)')
+    parser.add_argument(
+        '-c', '--shard-count', type=int, default=1, metavar='N',
+        help='the total number of shards (defaults to 1)')
+    parser.add_argument(
+        '-p', '--private', action='store_true', default=False,
+        help='include private class members in documentation')
+    _add_parsing_arguments(parser)
+    parser.add_argument(
+        '-b', '--batch-size', type=int, metavar='N',
+        help='the number of classes per batch file (defaults to 1000)')
+    parser.add_argument(
+        '--source', action='store_true', default=False,
+        help=('keep the highlighted source of every class, for a merge '
+              'writing the "source" format'))
+    parser.add_argument(
+        '--metrics', action='store_true', default=False,
+        help=('compute the metrics of every method, getter and setter '
+              'implementation'))
+    parser.add_argument(
+        'files', metavar='file_or_dir', nargs='+',
+        help=('one or more source files or directories to process recursively '
+              '(wildcards accepted)'))
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    shard_appclassdoc(args.sharddir, args.private, args.files,
+                      verbose_output=(args.verbosity > 0),
+                      shard_index=args.shard_index,
+                      shard_count=args.shard_count, jobs=args.jobs,
+                      time_budget=args.time_budget,
+                      retry_budget=args.retry_budget,
+                      quarantine_report=args.quarantine_report,
+                      batch_size=args.batch_size, warm_up=args.warm_up,
+                      with_source=args.source, with_metrics=args.metrics,
+                      diagnostics_report=args.diagnostics_report)
+
+
+def _merge_cli(argv):
+    """The CLI for the merge command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc merge',
+        description=('Combine shards and generate the API documentation '
+                     'site.'))
+    _add_verbosity_argument(parser)
+    parser.add_argument(
+        '-o', '--outputdir', default=os.getcwd(),
+        help=('the output directory for the generated documentation files '
+              '(defaults to the current directory)'))
+    parser.add_argument(
+        '-n', '--nodelete', dest='do_deletes', action='store_false',
+        help='avoid deleting files already in the target directory')
+    _add_output_arguments(parser)
+    parser.add_argument(
+        'shards', metavar='sharddir', nargs='+',
+        help='one or more shard directories to merge')
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    merge_appclassdoc(args.outputdir, args.do_deletes, args.shards,
+                      verbose_output=(args.verbosity > 0),
+                      minify=args.minify, compress=args.compress,
+                      hash_resources=args.hash_resources,
+                      writers=args.writers, fsync=args.fsync,
+                      database=args.database, formats=args.formats)
+
+
+def _query_cli(argv):
+    """The CLI for the query command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc query',
+        description=('Query a model database. Without options, list all the '
+                     'classes.'))
+    _add_verbosity_argument(parser)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '--members', action='store_true', default=False,
+        help='list class members instead of classes')
+    group.add_argument(
+        '--sql', metavar='QUERY',
+        help='run an arbitrary SQL query')
+    parser.add_argument(
+        '--package', help='only include classes in this package')
+    parser.add_argument(
+        '--implements', metavar='FQCN',
+        help=('only include classes extending or implementing FQCN, directly '
+              'or indirectly'))
+    parser.add_argument(
+        '--kind', choices=('constructor', 'method', 'property', 'constant'),
+        help='only include members of this kind')
+    parser.add_argument(
+        '--scope', choices=('public', 'protected', 'private'),
+        help='only include members with this scope')
+    parser.add_argument(
+        '--type', dest='the_type', metavar='TYPE',
+        help='only include members of (or returning) TYPE')
+    parser.add_argument(
+        '--undocumented', action='store_true', default=False,
+        help='only include members without an API description')
+    parser.add_argument('database', help='the model database')
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    with ModelDatabase(args.database) as db:
+        if args.sql:
+            rows = db.query(args.sql)
+        elif args.members:
+            rows = db.find_members(
+                kind=args.kind, scope=args.scope, the_type=args.the_type,
+                package=args.package,
+                documented=False if args.undocumented else None)
+        else:
+            rows = db.find_classes(package=args.package,
+                                   implements=args.implements)
+        for row in rows:
+            print('\t'.join('' if v is None else str(v) for v in row))
+
+
+def _serve_cli(argv):
+    """The CLI for the serve command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc serve',
+        description=('Serve the API documentation over HTTP, rendering pages '
+                     'on demand.'))
+    _add_verbosity_argument(parser)
+    parser.add_argument(
+        '--host', default='localhost',
+        help='the host name or address to listen on (defaults to localhost)')
+    parser.add_argument(
+        '--port', type=int, default=8000,
+        help='the port to listen on (defaults to 8000)')
+    parser.add_argument(
+        '-p', '--private', action='store_true', default=False,
+        help='include private class members in documentation')
+    _add_parsing_arguments(parser)
+    parser.add_argument(
+        '--model', metavar='DIR', dest='model_dir',
+        help=('a directory in which to keep the parsed model between '
+              'executions'))
+    parser.add_argument(
+        '--cache-size', type=int, default=256, metavar='N',
+        help=('the number of rendered pages to keep in memory (defaults to '
+              '256)'))
+    parser.add_argument(
+        '--poll', type=float, default=2.0, metavar='SECONDS',
+        help=('how often to check the source files for changes (0 to '
+              'disable; defaults to 2)'))
+    parser.add_argument(
+        'files', metavar='file_or_dir', nargs='+',
+        help=('one or more source files or directories to process recursively '
+              '(wildcards accepted)'))
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    serve_appclassdoc(args.private, args.files,
+                      verbose_output=(args.verbosity > 0), host=args.host,
+                      port=args.port, jobs=args.jobs,
+                      time_budget=args.time_budget, model_dir=args.model_dir,
+                      cache_size=args.cache_size, poll_interval=args.poll,
+                      warm_up=args.warm_up, retry_budget=args.retry_budget,
+                      quarantine_report=args.quarantine_report,
+                      diagnostics_report=args.diagnostics_report)
+
+
+def _versions_cli(argv):
+    """The CLI for the versions command."""
+    parser = argparse.ArgumentParser(
+        prog='appclassdoc versions',
+        description=('Generate the API documentation of several versions of '
+                     'the source code, storing identical files once.'))
+    _add_verbosity_argument(parser)
+    parser.add_argument(
+        '-o', '--outputdir', default=os.getcwd(),
+        help=('the output directory, with a subdirectory per version '
+              '(defaults to the current directory)'))
+    parser.add_argument(
+        '-p', '--private', action='store_true', default=False,
+        help='include private class members in documentation')
+    parser.add_argument(
+        '-n', '--nodelete', dest='do_deletes', action='store_false',
+        help='avoid deleting files already in the target directories')
+    _add_parsing_arguments(parser)
+    parser.add_argument(
+        '--metrics', action='store_true', default=False,
+        help=('show the metrics of every method, getter and setter '
+              'implementation on the class pages'))
+    _add_output_arguments(parser, database=False)
+    parser.add_argument(
+        'versions', metavar='NAME=file_or_dir', nargs='+',
+        help=('the source files or directories of a version (wildcards '
+              'accepted); repeat NAME to give a version several of them'))
+    args = parser.parse_args(argv)
+    _configure_logging(args.verbosity)
+    versions = OrderedDict()
+    for arg in args.versions:
+        name, sep, path = arg.partition('=')
+        if not sep or not path:
+            parser.error(f'argument "{arg}" is not of the form '
+                         'NAME=file_or_dir')
+        versions.setdefault(name, []).append(path)
+    versions_appclassdoc(args.outputdir, args.private, args.do_deletes,
+                         versions, verbose_output=(args.verbosity > 0),
+                         jobs=args.jobs, time_budget=args.time_budget,
+                         retry_budget=args.retry_budget, minify=args.minify,
+                         compress=args.compress,
+                         hash_resources=args.hash_resources,
+                         writers=args.writers, fsync=args.fsync,
+                         warm_up=args.warm_up, formats=args.formats,
+                         metrics=args.metrics,
+                         quarantine_report=args.quarantine_report,
+                         diagnostics_report=args.diagnostics_report)
+
+
+_commands = {
+    'check': _check_cli,
+    'diff': _diff_cli,
+    'impact': _impact_cli,
+    'merge': _merge_cli,
+    'query': _query_cli,
+    'serve': _serve_cli,
+    'shard': _shard_cli,
+    'versions': _versions_cli,
+}
+
+
+def appclassdoc_cli():
+    """The CLI for AppClassDoc."""
+    assert sys.version_info >= (3, 6), \
+           'Python 3.6+ is required to run this script'
+    if len(sys.argv) > 1 and sys.argv[1] in _commands:
+        _commands[sys.argv[1]](sys.argv[2:])
+        return
+    parser = argparse.ArgumentParser(
+        description=('Generate API documentation for PeopleSoft Application '
+                     'Classes.'),
+        epilog=('Other commands: ' + ', '.join(sorted(_commands))
+                + ' (run "appclassdoc COMMAND -h" for details).'))
+    _add_verbosity_argument(parser)
     parser.add_argument(
         '-o', '--outputdir', default=os.getcwd(),
         help=('the output directory for the generated documentation files '
@@ -1387,17 +6625,72 @@ def appclassdoc_cli():
     parser.add_argument(
         '-n', '--nodelete', dest='do_deletes', action='store_false',
         help='avoid deleting files already in the target directory')
+    _add_parsing_arguments(parser)
+    parser.add_argument(
+        '-b', '--batch-size', type=int, metavar='N',
+        help=('spill parsed classes to disk every N classes to keep memory '
+              'use bounded'))
+    parser.add_argument(
+        '--spill-dir', metavar='DIR',
+        help=('the directory in which to spill batches (defaults to the '
+              "system's temporary directory)"))
+    _add_output_arguments(parser)
+    parser.add_argument(
+        '--model', metavar='DIR', dest='model_dir',
+        help=('save the parsed classes to DIR, for later executions with '
+              '--changed-from or --git-diff'))
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '--changed-from', metavar='FILE',
+        help=('only process the source files listed in FILE ("-" for '
+              'standard input), one per line, merging them into the model'))
+    group.add_argument(
+        '--git-diff', metavar='REV1..REV2',
+        help=('only process the source files changed between two git '
+              'revisions, merging them into the model'))
+    group.add_argument(
+        '--package', metavar='PATTERN', dest='packages', action='append',
+        help=('only write the pages of the packages (and subpackages) '
+              'matching PATTERN, which may contain wildcards, taking the '
+              'other classes from the model if saved (may be repeated)'))
+    parser.add_argument(
+        '--metrics', action='store_true', default=False,
+        help=('compute the metrics of every method, getter and setter '
+              'implementation, for the class pages and the model database'))
+    parser.add_argument(
+        '--trace', metavar='FILE',
+        help=('write a trace of every parse tree node visited, with its '
+              'timing, to FILE as JSON Lines (parses in a single process)'))
+    parser.add_argument(
+        '--profile', metavar='DIR',
+        help=('profile every phase of the build and every worker with '
+              'cProfile, writing the profiles, their merged pstats file and '
+              'collapsed stacks for flame graphs to DIR'))
     parser.add_argument(
         'files', metavar='file_or_dir', nargs='+',
         help=('one or more source files or directories to process recursively '
               '(wildcards accepted)'))
     args = parser.parse_args()
-    if args.verbosity == 2:
-        logging.basicConfig(level=logging.INFO)
-    elif args.verbosity > 2:
-        logging.basicConfig(level=logging.DEBUG)
+    _configure_logging(args.verbosity)
+    if args.changed_from:
+        changed_files = _read_changed_files(args.changed_from)
+    elif args.git_diff:
+        changed_files = _git_changed_files(args.git_diff)
     else:
-        logging.basicConfig()
+        changed_files = None
     generate_appclassdoc(args.outputdir.rstrip(os.sep), args.private,
                          args.do_deletes, args.files,
-                         verbose_output=(args.verbosity > 0))
+                         verbose_output=(args.verbosity > 0), jobs=args.jobs,
+                         time_budget=args.time_budget,
+                         retry_budget=args.retry_budget,
+                         quarantine_report=args.quarantine_report,
+                         batch_size=args.batch_size, spill_dir=args.spill_dir,
+                         minify=args.minify, compress=args.compress,
+                         hash_resources=args.hash_resources,
+                         writers=args.writers, fsync=args.fsync,
+                         warm_up=args.warm_up, database=args.database,
+                         model_dir=args.model_dir, changed_files=changed_files,
+                         formats=args.formats, trace=args.trace,
+                         packages=args.packages, metrics=args.metrics,
+                         diagnostics_report=args.diagnostics_report,
+                         profile_dir=args.profile)
@@ -0,0 +1,129 @@
+<?xml version="1.0" encoding="UTF-8" ?>
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+  <xsl:output method="html"/>
+
+  <xsl:template match="/">
+    <html lang="en">
+      <head>
+        <meta http-equiv="Content-Type" content="text/html; charset=utf-8"/>
+        <title>API Changes (PeopleSoft API)</title>
+        <link rel="stylesheet" type="text/css" href="resources/stylesheet.css" title="Style"/>
+      </head>
+      <body>
+        <div class="header">
+          <h1 class="title">API Changes</h1>
+          <div class="subTitle"><xsl:value-of select="concat(/diff/@old, ' &#8594; ', /diff/@new)"/></div>
+        </div>
+        <div class="contentContainer">
+          <div class="summary">
+            <ul class="blockList">
+              <li class="blockList">
+                <xsl:apply-templates select="/diff/added"/>
+                <xsl:apply-templates select="/diff/removed"/>
+                <xsl:apply-templates select="/diff/changed"/>
+              </li>
+            </ul>
+          </div>
+        </div>
+      </body>
+    </html>
+  </xsl:template>
+
+  <xsl:template match="added | removed">
+    <xsl:variable name="title">
+      <xsl:choose>
+        <xsl:when test="name() = 'added'">
+          <xsl:text>Added Classes</xsl:text>
+        </xsl:when>
+        <xsl:otherwise>
+          <xsl:text>Removed Classes</xsl:text>
+        </xsl:otherwise>
+      </xsl:choose>
+    </xsl:variable>
+
+    <ul class="blockList">
+      <li class="blockList">
+        <h3><xsl:value-of select="concat($title, ' (', count(class), ')')"/></h3>
+        <xsl:if test="class">
+          <table class="memberSummary" border="0" cellpadding="3" cellspacing="0" summary="{$title}">
+            <caption><span><xsl:value-of select="$title"/></span><span class="tabEnd"><xsl:text disable-output-escaping="yes">&amp;nbsp;</xsl:text></span></caption>
+            <tr>
+              <th class="colFirst" scope="col">Type</th>
+              <th class="colLast" scope="col">Class</th>
+            </tr>
+            <xsl:apply-templates select="class"/>
+          </table>
+        </xsl:if>
+      </li>
+    </ul>
+  </xsl:template>
+
+  <xsl:template match="added/class | removed/class">
+    <xsl:element name="tr">
+      <xsl:attribute name="class">
+        <xsl:choose>
+          <xsl:when test="position() mod 2 = 0">
+            <xsl:text>rowColor</xsl:text>
+          </xsl:when>
+          <xsl:otherwise>
+            <xsl:text>altColor</xsl:text>
+          </xsl:otherwise>
+        </xsl:choose>
+      </xsl:attribute>
+      <td class="colFirst"><code><xsl:value-of select="@type"/></code></td>
+      <td class="colLast"><code><xsl:value-of select="."/></code></td>
+    </xsl:element>
+  </xsl:template>
+
+  <xsl:template match="changed">
+    <ul class="blockList">
+      <li class="blockList">
+        <h3><xsl:value-of select="concat('Changed Classes (', count(class), ')')"/></h3>
+        <xsl:apply-templates select="class"/>
+      </li>
+    </ul>
+  </xsl:template>
+
+  <xsl:template match="changed/class">
+    <ul class="blockList">
+      <li class="blockList">
+        <h4><xsl:value-of select="@name"/></h4>
+        <xsl:if test="boolean(@declaration)">
+          <div class="block"><xsl:value-of select="concat('The ', @type, ' declaration or description changed.')"/></div>
+        </xsl:if>
+        <xsl:if test="member">
+          <table class="memberSummary" border="0" cellpadding="3" cellspacing="0" summary="Member changes table, listing added, removed and changed members">
+            <caption><span>Members</span><span class="tabEnd"><xsl:text disable-output-escaping="yes">&amp;nbsp;</xsl:text></span></caption>
+            <tr>
+              <th class="colFirst" scope="col">Change and Scope</th>
+              <th class="colLast" scope="col">Member</th>
+            </tr>
+            <xsl:apply-templates select="member"/>
+          </table>
+        </xsl:if>
+      </li>
+    </ul>
+  </xsl:template>
+
+  <xsl:template match="member">
+    <xsl:element name="tr">
+      <xsl:attribute name="class">
+        <xsl:choose>
+          <xsl:when test="position() mod 2 = 0">
+            <xsl:text>rowColor</xsl:text>
+          </xsl:when>
+          <xsl:otherwise>
+            <xsl:text>altColor</xsl:text>
+          </xsl:otherwise>
+        </xsl:choose>
+      </xsl:attribute>
+      <td class="colFirst"><code><xsl:value-of select="concat(@status, ' ', @scope)"/></code></td>
+      <td class="colLast">
+        <xsl:if test="old">
+          <div><code><del><xsl:value-of select="old"/></del></code></div>
+        </xsl:if>
+        <div><code><xsl:value-of select="new"/></code></div>
+      </td>
+    </xsl:element>
+  </xsl:template>
+</xsl:stylesheet>
@@ -3,14 +3,16 @@
   <xsl:output method="html"/>
   
   <xsl:param name="target" select="''"/>
+  <xsl:param name="stylesheet" select="'stylesheet.css'"/>
+  <xsl:param name="script" select="'script.js'"/>
   
   <xsl:template match="/">
     <html lang="en">
       <head>
         <meta http-equiv="Content-Type" content="text/html; charset=utf-8"/>
         <title>All Classes (PeopleSoft API)</title>
-        <link rel="stylesheet" type="text/css" href="resources/stylesheet.css" title="Style"/>
-        <script type="text/javascript" src="resources/script.js">/**/</script>
+        <link rel="stylesheet" type="text/css" href="resources/{$stylesheet}" title="Style"/>
+        <script type="text/javascript" src="resources/{$script}">/**/</script>
       </head>
       <body>
         <h1 class="bar"><xsl:text disable-output-escaping="yes">All&amp;nbsp;Classes</xsl:text></h1>
@@ -2,6 +2,9 @@
 <xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
   <xsl:output method="html"/>
 
+  <xsl:param name="stylesheet" select="'stylesheet.css'"/>
+  <xsl:param name="script" select="'script.js'"/>
+
   <xsl:variable name="n"><xsl:text>
 </xsl:text></xsl:variable>
 
@@ -12,6 +15,8 @@
     </xsl:call-template>
   </xsl:variable>
 
+  <xsl:variable name="sourcePath" select="concat($apiPath, '../src-html/', translate(/class/package, ':', '/'), '/', /class/name, '.html')"/>
+
   <xsl:template match="/">
     <xsl:apply-templates select="/class"/>
   </xsl:template>
@@ -35,8 +40,8 @@
       <head>
         <meta http-equiv="Content-Type" content="text/html; charset=utf-8"/>
         <title><xsl:value-of select="concat(name, ' (PeopleSoft API)')"/></title>
-        <link rel="stylesheet" type="text/css" href="{$apiPath}../resources/stylesheet.css" title="Style"/>
-        <script type="text/javascript" src="{$apiPath}../resources/script.js">/**/</script>
+        <link rel="stylesheet" type="text/css" href="{$apiPath}../resources/{$stylesheet}" title="Style"/>
+        <script type="text/javascript" src="{$apiPath}../resources/{$script}">/**/</script>
       </head>
       <body>
         <script type="text/javascript"><xsl:text disable-output-escaping="yes">
@@ -71,6 +76,7 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
           <ul class="navList" title="Navigation">
             <li><a href="{$apiPath}../start-page.html">Overview</a></li>
             <li class="navBarCell1Rev">Class</li>
+            <li><a href="package-tree.html">Tree</a></li>
           </ul>
           <div class="aboutLanguage">
             <strong><xsl:text disable-output-escaping="yes">PeopleSoft&amp;nbsp;API</xsl:text></strong>
@@ -250,10 +256,22 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
             <ul class="blockList">
               <li class="blockList">
                 <xsl:apply-templates select="subclasses"/>
+                <xsl:apply-templates select="usages"/>
+                <xsl:apply-templates select="imports"/>
+                <xsl:apply-templates select="importers"/>
                 <hr/>
                 <br/>
                 <pre><xsl:value-of select="concat(@type, ' ')"/>
-                <span class="typeNameLabel"><xsl:value-of select="name"/></span>
+                <span class="typeNameLabel">
+                  <xsl:choose>
+                    <xsl:when test="boolean(@source)">
+                      <a href="{$sourcePath}"><xsl:value-of select="name"/></a>
+                    </xsl:when>
+                    <xsl:otherwise>
+                      <xsl:value-of select="name"/>
+                    </xsl:otherwise>
+                  </xsl:choose>
+                </span>
                 <xsl:apply-templates select="hierarchy/superclass[position() = last()]"/></pre>
                 <xsl:apply-templates select="description"/>
               </li>
@@ -299,6 +317,7 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
           <ul class="navList" title="Navigation">
             <li><a href="{$apiPath}../start-page.html">Overview</a></li>
             <li class="navBarCell1Rev">Class</li>
+            <li><a href="package-tree.html">Tree</a></li>
           </ul>
           <div class="aboutLanguage">
             <strong><xsl:text disable-output-escaping="yes">PeopleSoft&amp;nbsp;API</xsl:text></strong>
@@ -545,6 +564,66 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
     </dl>
   </xsl:template>
 
+  <xsl:template match="usages">
+    <dl>
+      <dt>Used by:</dt>
+      <xsl:for-each select="usage">
+        <dd>
+          <a href="{$apiPath}{translate(package, ':', '/')}/{name}.html#{@anchor}" title="{concat(package, ':', name)}"><xsl:value-of select="concat(name, '.', member)"/></a>
+          <xsl:choose>
+            <xsl:when test="@role = 'argument'">
+              <xsl:text> (as a parameter type)</xsl:text>
+            </xsl:when>
+            <xsl:when test="@role = 'return'">
+              <xsl:text> (as a return type)</xsl:text>
+            </xsl:when>
+            <xsl:otherwise>
+              <xsl:text> (as a property type)</xsl:text>
+            </xsl:otherwise>
+          </xsl:choose>
+        </dd>
+      </xsl:for-each>
+    </dl>
+  </xsl:template>
+
+  <xsl:template match="imports">
+    <dl>
+      <dt>Imports:</dt>
+      <dd>
+          <xsl:for-each select="import">
+            <xsl:if test="position() &gt; 1">
+              <xsl:text>, </xsl:text>
+            </xsl:if>
+            <xsl:choose>
+              <xsl:when test="@kind = 'class'">
+                <a href="{$apiPath}{translate(package, ':', '/')}/{name}.html" title="class in {package}"><xsl:value-of select="concat(package, ':', name)"/></a>
+              </xsl:when>
+              <xsl:when test="@kind = 'package'">
+                <a href="{$apiPath}{translate(package, ':', '/')}/0package.html" target="packageFrame" title="package {package}"><xsl:value-of select="concat(package, ':*')"/></a>
+              </xsl:when>
+              <xsl:otherwise>
+                <xsl:value-of select="@path"/>
+              </xsl:otherwise>
+            </xsl:choose>
+          </xsl:for-each>
+      </dd>
+    </dl>
+  </xsl:template>
+
+  <xsl:template match="importers">
+    <dl>
+      <dt>Imported by:</dt>
+      <dd>
+          <xsl:for-each select="importer">
+            <xsl:if test="position() &gt; 1">
+              <xsl:text>, </xsl:text>
+            </xsl:if>
+            <a href="{$apiPath}{translate(package, ':', '/')}/{name}.html" title="class in {package}"><xsl:value-of select="name"/></a>
+          </xsl:for-each>
+      </dd>
+    </dl>
+  </xsl:template>
+
   <xsl:template match="hierarchy/superclass[position() = last()]">
     <xsl:variable name="superType">
       <xsl:choose>
@@ -931,7 +1010,7 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
         </a>
         <ul class="blockListLast">
           <li class="blockList">
-            <h4><xsl:value-of select="name"/></h4>
+            <xsl:call-template name="memberName"/>
             <pre><xsl:value-of disable-output-escaping="yes" select="concat(@scope, '&amp;nbsp;', name, '(')"/><xsl:apply-templates select="arguments/argument">
               <xsl:with-param name="indent">
                 <xsl:call-template name="dup">
@@ -942,6 +1021,7 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
               <xsl:with-param name="sep" select="concat(',', $n)"/>
             </xsl:apply-templates><xsl:text>)</xsl:text></pre>
             <xsl:apply-templates select="description"/>
+            <xsl:apply-templates select="metrics"/>
           </li>
         </ul>
       </li>
@@ -1071,9 +1151,10 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
         </xsl:choose>
       </xsl:attribute>
       <li class="blockList">
-        <h4><xsl:value-of select="name"/></h4>
+        <xsl:call-template name="memberName"/>
         <pre><xsl:value-of select="concat(@scope, ' ')"/><xsl:apply-templates select="type"/><xsl:value-of select="concat(' ', name)"/></pre>
         <xsl:apply-templates select="description"/>
+        <xsl:apply-templates select="metrics"/>
       </li>
     </xsl:element>
   </xsl:template>
@@ -1107,9 +1188,10 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
         </xsl:choose>
       </xsl:attribute>
       <li class="blockList">
-        <h4><xsl:value-of select="name"/></h4>
+        <xsl:call-template name="memberName"/>
         <pre><xsl:value-of select="concat(@scope, ' ')"/><xsl:apply-templates select="type"/><xsl:value-of select="concat(' ', name)"/></pre>
         <xsl:apply-templates select="description"/>
+        <xsl:apply-templates select="metrics"/>
       </li>
     </xsl:element>
   </xsl:template>
@@ -1143,7 +1225,7 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
         </xsl:choose>
       </xsl:attribute>
       <li class="blockList">
-        <h4><xsl:value-of select="name"/></h4>
+        <xsl:call-template name="memberName"/>
         <pre><xsl:value-of select="@scope"/><xsl:if test="boolean(@abstract)">
             <xsl:text disable-output-escaping="yes">&amp;nbsp;abstract</xsl:text>
           </xsl:if><xsl:value-of disable-output-escaping="yes" select="concat('&amp;nbsp;', name, '(')"/><xsl:apply-templates select="arguments/argument"><xsl:with-param name="indent">
@@ -1166,10 +1248,24 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
           <xsl:text> Returns </xsl:text><xsl:apply-templates select="type"/>
         </xsl:if></pre>
         <xsl:apply-templates select="description"/>
+        <xsl:apply-templates select="metrics"/>
       </li>
     </xsl:element>
   </xsl:template>
 
+  <xsl:template name="memberName">
+    <h4>
+      <xsl:choose>
+        <xsl:when test="@line">
+          <a href="{$sourcePath}#line.{@line}"><xsl:value-of select="name"/></a>
+        </xsl:when>
+        <xsl:otherwise>
+          <xsl:value-of select="name"/>
+        </xsl:otherwise>
+      </xsl:choose>
+    </h4>
+  </xsl:template>
+
   <xsl:template match="/class/description | /class/constructor/description | /class/constants/constant/description | /class/properties/property/description | /class/getters/property/description | /class/setters/property/description | /class/methods/method/description">
     <xsl:if test="summary">
       <div class="block">
@@ -1213,6 +1309,13 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
     </xsl:if>
   </xsl:template>
 
+  <xsl:template match="metrics">
+    <dl>
+      <dt><span class="simpleTagLabel">Metrics:</span></dt>
+      <dd><xsl:value-of select="concat('lines of code: ', @loc, ', statements: ', @statements, ', cyclomatic complexity: ', @complexity, ', maximum nesting: ', @nesting, ', throws: ', @throws)"/></dd>
+    </dl>
+  </xsl:template>
+
   <xsl:template match="argument">
     <xsl:param name="indent" select="''"/>
     <xsl:param name="sep" select="', '"/>
@@ -1230,9 +1333,12 @@ var activeTableTab = "activeTableTab";</xsl:text></xsl:if>
       <xsl:with-param name="count" select="number(@array_dimension)"/>
     </xsl:call-template>
     <xsl:choose>
-      <xsl:when test="package">
+      <xsl:when test="package and not(boolean(@unresolved))">
         <a href="{$apiPath}{translate(package, ':', '/')}/{name}.html" title="class in {package}"><xsl:value-of select="name"/></a>
       </xsl:when>
+      <xsl:when test="package">
+        <span title="{concat(package, ':', name)}"><xsl:value-of select="name"/></span>
+      </xsl:when>
       <xsl:otherwise>
         <xsl:value-of select="name"/>
       </xsl:otherwise>
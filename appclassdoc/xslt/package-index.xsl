@@ -1,14 +1,17 @@
 <?xml version="1.0" encoding="UTF-8" ?>
 <xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
   <xsl:output method="html"/>
+
+  <xsl:param name="stylesheet" select="'stylesheet.css'"/>
+  <xsl:param name="script" select="'script.js'"/>
   
   <xsl:template match="/">
     <html lang="en">
       <head>
         <meta http-equiv="Content-Type" content="text/html; charset=utf-8"/>
         <title>Overview List (PeopleSoft API)</title>
-        <link rel="stylesheet" type="text/css" href="resources/stylesheet.css" title="Style"/>
-        <script type="text/javascript" src="resources/script.js">/**/</script>
+        <link rel="stylesheet" type="text/css" href="resources/{$stylesheet}" title="Style"/>
+        <script type="text/javascript" src="resources/{$script}">/**/</script>
       </head>
       <body>
         <h1 title="PeopleSoft API" class="bar"><strong>PeopleSoft API</strong></h1>
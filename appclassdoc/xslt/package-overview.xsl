@@ -2,6 +2,9 @@
 <xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
   <xsl:output method="html"/>
 
+  <xsl:param name="stylesheet" select="'stylesheet.css'"/>
+  <xsl:param name="script" select="'script.js'"/>
+
   <xsl:variable name="apiPath">
     <xsl:call-template name="dup">
       <xsl:with-param name="input" select="'../'"/>
@@ -18,8 +21,8 @@
       <head>
         <meta http-equiv="Content-Type" content="text/html; charset=utf-8"/>
         <title><xsl:value-of select="concat(@name, ' (PeopleSoft API)')"/></title>
-        <link rel="stylesheet" type="text/css" href="{$apiPath}../resources/stylesheet.css" title="Style"/>
-        <script type="text/javascript" src="{$apiPath}../resources/script.js">/**/</script>
+        <link rel="stylesheet" type="text/css" href="{$apiPath}../resources/{$stylesheet}" title="Style"/>
+        <script type="text/javascript" src="{$apiPath}../resources/{$script}">/**/</script>
       </head>
       <body>
         <h1 class="bar">
@@ -0,0 +1,115 @@
+"""Benchmark the memory used by a large model.
+
+The source files are parsed once, and copies of their classes are then
+unpickled (as the main process does with the results of the parser
+workers and the batches of a shard) and added to a spool until the
+requested number of classes is reached, every copy in its own packages.
+The memory allocated meanwhile is reported, along with the time taken
+to load the classes, to build the fully qualified names and sort keys
+used throughout, and to build the cross-references.
+
+Usage: python benchmarks/bench_memory.py [-n CLASSES] [--tree DIR]
+                                         [file_or_dir ...]
+
+By default, 20,000 classes are made from the sources of the test
+suite. With --tree, the appclassdoc package is imported from the given
+checkout instead, to compare two versions on the same sources.
+"""
+
+import argparse
+import gc
+import os.path
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+
+
+_ROOT_DIR = os.path.join(os.path.dirname(__file__), os.pardir)
+_SOURCE_DIR = os.path.join(_ROOT_DIR, 'tests', 'src')
+
+
+def _parse(appclassdoc, files):
+    """Return the classes parsed from the given files, pickled."""
+    spool = appclassdoc._ClassSpool()
+    appclassdoc._parse_corpus(spool, appclassdoc._process_input(files),
+                              False)
+    return [pickle.dumps(app_class, protocol=pickle.HIGHEST_PROTOCOL)
+            for app_class in spool.batch]
+
+
+def _load(appclassdoc, data, count):
+    """Return a spool holding count classes unpickled from data."""
+    spool = appclassdoc._ClassSpool()
+    copy = 0
+    while len(spool) < count:
+        copy += 1
+        for item in data[:count - len(spool)]:
+            app_class = pickle.loads(item)
+            # Every copy in its own packages, as in a real corpus
+            app_class.package = type(app_class.package)(
+                (f'COPY{copy}', *app_class.package))
+            spool.add(app_class)
+    return spool
+
+
+def _get_indexes(spool):
+    """Return the type usages and imports of a spool.
+
+    Checkouts older than the streaming of these indexes keep them as
+    attributes.
+    """
+    if hasattr(spool, 'all_type_usages'):
+        return spool.all_type_usages(), spool.all_imports()
+    return spool.type_usages, spool.imports
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the memory used by a large model.')
+    parser.add_argument(
+        '-n', '--classes', type=int, default=20000,
+        help='the number of classes in the model')
+    parser.add_argument(
+        '--tree', metavar='DIR', default=_ROOT_DIR,
+        help='the checkout to import appclassdoc from')
+    parser.add_argument('files', nargs='*', default=[_SOURCE_DIR],
+                        metavar='file_or_dir')
+    args = parser.parse_args()
+    sys.path.insert(0, args.tree)
+    from appclassdoc import appclassdoc
+    data = _parse(appclassdoc, args.files)
+    appclassdoc.AppClass.reset_indexes()
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    spool = _load(appclassdoc, data, args.classes)
+    load_time = time.perf_counter() - start_time
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Timed without the cyclic garbage collector, whose passes over the
+    # whole model would dominate
+    gc.collect()
+    gc.disable()
+    start_time = time.perf_counter()
+    for _ in range(5):
+        [app_class.fqcn.lower() for app_class in spool.batch]
+    sorted(spool.descriptors, key=lambda c: f'{c.name}:{c.package_name}')
+    names_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    appclassdoc.AppClass.build_cross_references(
+        spool.symbols, *_get_indexes(spool))
+    index_time = time.perf_counter() - start_time
+    gc.enable()
+    print(f'Python {platform.python_version()}, {len(spool)} class(es) '
+          f'made from {len(data)}:')
+    print(f'  memory     {memory / 2 ** 20:8.1f} MiB')
+    print(f'  load       {load_time:8.2f} s')
+    print(f'  names      {names_time:8.2f} s')
+    print(f'  indexes    {index_time:8.2f} s')
+
+
+if __name__ == '__main__':
+    main()
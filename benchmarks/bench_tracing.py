@@ -0,0 +1,99 @@
+"""Benchmark the cost of visitor tracing.
+
+The source files are parsed once, and their parse trees are then visited
+repeatedly by the plain AppClassDocVisitor used when tracing is off, and
+by the _TracingVisitor used by --trace. The best time of each is
+reported, along with its ratio to the plain visitor. The plain visitor
+is also checked to carry none of the tracing wrappers, so that the
+disabled path costs nothing but the choice of the visitor class in
+_process_file.
+
+Usage: python benchmarks/bench_tracing.py [-r REPEAT] [file_or_dir ...]
+
+By default, the sources of the test suite are used.
+"""
+
+import argparse
+import gc
+import os.path
+import platform
+import sys
+import time
+
+from antlr4 import CommonTokenStream, InputStream
+from peoplecodeparser.PeopleCodeLexer import PeopleCodeLexer
+from peoplecodeparser.PeopleCodeParser import PeopleCodeParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from appclassdoc import appclassdoc  # noqa: E402
+
+
+_SOURCE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, 'tests',
+                           'src')
+
+
+def _parse(file_path):
+    """Return the token stream, package and parse tree of a file."""
+    input_stream = InputStream(
+        appclassdoc._read_source(file_path).decode('utf-8'))
+    token_stream = CommonTokenStream(PeopleCodeLexer(input_stream))
+    parser = PeopleCodeParser(token_stream)
+    parser.removeErrorListeners()
+    tree = parser.appClass()
+    package = appclassdoc._get_file_package(file_path).split(sep=':')
+    return token_stream, package, tree
+
+
+def _visit_all(make_visitor, trees):
+    """Visit every parse tree with a new visitor, returning the time."""
+    gc.collect()
+    gc.disable()
+    try:
+        start_time = time.perf_counter()
+        for token_stream, package, tree in trees:
+            make_visitor(token_stream, package).visit(tree)
+        return time.perf_counter() - start_time
+    finally:
+        gc.enable()
+
+
+def _check_plain_visitor():
+    """Check that the plain visitor has none of the tracing wrappers."""
+    for name in dir(appclassdoc.AppClassDocVisitor):
+        method = getattr(appclassdoc.AppClassDocVisitor, name)
+        if '_traced' in getattr(method, '__qualname__', ''):
+            raise AssertionError(f'{name} of the plain visitor is traced')
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the cost of visitor tracing.')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=20,
+        help='the number of times the trees are visited by each visitor')
+    parser.add_argument('files', nargs='*', default=[_SOURCE_DIR],
+                        metavar='file_or_dir')
+    args = parser.parse_args()
+    _check_plain_visitor()
+    file_paths = sorted(appclassdoc._process_input(args.files))
+    trees = [_parse(file_path) for file_path in file_paths]
+    visitors = (
+        ('plain', appclassdoc.AppClassDocVisitor),
+        ('tracing', appclassdoc._TracingVisitor),
+    )
+    times = {}
+    for _ in range(args.repeat):
+        for name, make_visitor in visitors:
+            elapsed = _visit_all(make_visitor, trees)
+            times[name] = min(times.get(name, elapsed), elapsed)
+    print(f'Python {platform.python_version()}, {len(trees)} file(s), '
+          f'best of {args.repeat}:')
+    for name, _ in visitors:
+        ratio = times[name] / times['plain']
+        print(f'  {name:<10} {times[name] * 1000:8.1f} ms  {ratio:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark the effect of warming up the parser.
+
+The source files are split in two: the first N are used to warm up the
+parser, and the others are parsed and timed one by one. Each round runs
+in a freshly spawned process, so that it starts with a cold parser, as
+the parser workers do, and parses the timed files either straight away
+or after the warm-up files, alternately. The mean and median time per
+timed file of each are reported, along with their ratio.
+
+Usage: python benchmarks/bench_warm_up.py [-w N] [-r REPEAT]
+                                          [file_or_dir ...]
+
+By default, the sources of the test suite are used, and the parser is
+warmed up on 5 of them.
+"""
+
+import argparse
+import multiprocessing
+import os.path
+import platform
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from appclassdoc import appclassdoc  # noqa: E402
+
+
+_SOURCE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, 'tests',
+                           'src')
+
+
+def _time_files(warm_up_files, file_paths):
+    """Return the time taken to parse each file, after any warm-up."""
+    for file_path in warm_up_files:
+        appclassdoc._parse_one(file_path, False)
+    return [appclassdoc._parse_one(file_path, False).elapsed
+            for file_path in file_paths]
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the effect of warming up the parser.')
+    parser.add_argument(
+        '-w', '--warm-up', type=int, default=5, metavar='N',
+        help='the number of files the parser is warmed up on')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='the number of processes run with and without warm-up')
+    parser.add_argument('files', nargs='*', default=[_SOURCE_DIR],
+                        metavar='file_or_dir')
+    args = parser.parse_args()
+    file_paths = sorted(appclassdoc._process_input(args.files))
+    warm_up_files = file_paths[:args.warm_up]
+    file_paths = file_paths[args.warm_up:]
+    if not file_paths:
+        parser.error('no files left to time after the warm-up files')
+    times = {'cold': [], 'warm': []}
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for _ in range(args.repeat):
+            times['cold'] += pool.apply(_time_files, ((), file_paths))
+            times['warm'] += pool.apply(_time_files,
+                                        (warm_up_files, file_paths))
+    print(f'Python {platform.python_version()}, {len(file_paths)} file(s) '
+          f'timed, warmed up on {len(warm_up_files)}, {args.repeat} '
+          'round(s):')
+    cold_mean = statistics.mean(times['cold'])
+    for name in ('cold', 'warm'):
+        mean = statistics.mean(times[name])
+        median = statistics.median(times[name])
+        print(f'  {name:<6} mean {mean * 1000:8.1f} ms  median '
+              f'{median * 1000:8.1f} ms  {mean / cold_mean:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
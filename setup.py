@@ -22,6 +22,7 @@ setup(
     url='https://github.com/lbaca/appclassdoc',
     packages=find_packages(),
     install_requires=['lxml', 'peoplecodeparser'],
+    extras_require={'brotli': ['brotli']},
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Environment :: Console',
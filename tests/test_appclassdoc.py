@@ -1,13 +1,96 @@
 """AppClassDoc tests."""
 
+import gzip
+import hashlib
+import json
+import os
 import os.path
+import pickle
+import pstats
 import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+from lxml import html
 
 import appclassdoc
 
 
 _TESTS_DIR = os.path.dirname(__file__)
 _SOURCE_DIR = os.path.join(_TESTS_DIR, 'src')
+_LARGEST_SOURCE = os.path.join(
+    _SOURCE_DIR, 'PTNUI', 'IBHandlers',
+    'PTNUI.IBHandlers.UniNavLandingPageHandler.ppl')
+
+# ZZ:A and ZZ:B import each other, and ZZ:UTIL:C imports ZZ:B. The two
+# packages fall in different shards when two are made.
+_SOURCES = {
+    'ZZ.A.ppl': (
+        'import ZZ:B;\n'
+        '\n'
+        '/**\n'
+        ' * The root class.\n'
+        ' */\n'
+        'class A\n'
+        '   method A();\n'
+        '   /**\n'
+        '    * Sum the numbers above 2.\n'
+        '    */\n'
+        '   method Run(&n As number) Returns number;\n'
+        'end-class;\n'
+        '\n'
+        'method A\n'
+        'end-method;\n'
+        '\n'
+        'method Run\n'
+        '   /+ &n as Number +/\n'
+        '   /+ Returns Number +/\n'
+        '   Local number &i, &t;\n'
+        '   For &i = 1 To &n\n'
+        '      If &i > 2 Then\n'
+        '         &t = &t + &i;\n'
+        '      End-If;\n'
+        '   End-For;\n'
+        '   If &t < 0 Then\n'
+        '      throw CreateException(0, 0, "negative");\n'
+        '   End-If;\n'
+        '   Return &t;\n'
+        'end-method;\n'),
+    'ZZ.B.ppl': (
+        'import ZZ:A;\n'
+        '\n'
+        'class B extends ZZ:A\n'
+        '   method B();\n'
+        '   method Go(&a As ZZ:A);\n'
+        'end-class;\n'
+        '\n'
+        'method B\n'
+        '   %Super = create ZZ:A();\n'
+        'end-method;\n'
+        '\n'
+        'method Go\n'
+        '   /+ &a as ZZ:A +/\n'
+        'end-method;\n'),
+    'ZZ.UTIL.C.ppl': (
+        'import ZZ:B;\n'
+        '\n'
+        'class C extends ZZ:B\n'
+        '   method C();\n'
+        '   method Use(&b As ZZ:B);\n'
+        'end-class;\n'
+        '\n'
+        'method C\n'
+        '   %Super = create ZZ:B();\n'
+        'end-method;\n'
+        '\n'
+        'method Use\n'
+        '   /+ &b as ZZ:B +/\n'
+        'end-method;\n'),
+}
 
 
 def test_generation():
@@ -15,3 +98,839 @@ def test_generation():
     with tempfile.TemporaryDirectory() as temp_dir:
         appclassdoc.generate_appclassdoc(temp_dir, True, True, _SOURCE_DIR,
                                          verbose_output=True)
+
+
+def _write_sources(source_dir, sources):
+    """Write source files given as a dictionary keyed by file name."""
+    for name, text in sources.items():
+        (source_dir / name).write_text(text, encoding='utf-8')
+
+
+def _make_sources(tmp_path, sources=None):
+    """Write the test sources to a new directory, returning its path."""
+    source_dir = tmp_path / 'src'
+    source_dir.mkdir()
+    _write_sources(source_dir, _SOURCES if sources is None else sources)
+    return source_dir
+
+
+def _read_pages(outputdir):
+    """Return the contents of the class and package pages by path."""
+    pages = {}
+    for dir_path, _, file_names in os.walk(os.path.join(outputdir, 'api')):
+        for file_name in file_names:
+            if not file_name.endswith('.html'):
+                continue
+            file_path = os.path.join(dir_path, file_name)
+            with open(file_path, encoding='utf-8') as file:
+                pages[os.path.relpath(file_path, outputdir)] = file.read()
+    return pages
+
+
+def test_quarantine(tmp_path, monkeypatch):
+    """Test that files failing to parse are quarantined, not retried."""
+    source_dir = _make_sources(tmp_path)
+    (source_dir / 'ZZ.Bad.ppl').write_bytes(b'class Bad\xff\n')
+    parse_files = appclassdoc.appclassdoc._parse_files
+    parsed = []
+
+    def _parse_files(file_paths, *args, **kwargs):
+        file_paths = list(file_paths)
+        parsed.append(len(file_paths))
+        return parse_files(file_paths, *args, **kwargs)
+
+    monkeypatch.setattr(appclassdoc.appclassdoc, '_parse_files',
+                        _parse_files)
+    report = tmp_path / 'quarantine.json'
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), jobs=2,
+                                     retry_budget=60,
+                                     quarantine_report=str(report))
+    assert parsed == [4]
+    items = json.loads(report.read_text(encoding='utf-8'))
+    assert [(os.path.basename(item['file']), item['reason'])
+            for item in items] == [('ZZ.Bad.ppl', 'error')]
+    assert items[0]['error'].startswith('UnicodeDecodeError')
+    assert (tmp_path / 'out' / 'api' / 'ZZ' / 'A.html').exists()
+
+
+def test_quarantine_timeout(tmp_path):
+    """Test that files exceeding the time budget are quarantined."""
+    report = tmp_path / 'quarantine.json'
+    appclassdoc.generate_appclassdoc(
+        str(tmp_path / 'out'), False, True, _LARGEST_SOURCE, jobs=2,
+        time_budget=0.01, quarantine_report=str(report))
+    items = json.loads(report.read_text(encoding='utf-8'))
+    assert [(item['file'], item['reason']) for item in items] == [
+        (_LARGEST_SOURCE, 'timeout')]
+    assert items[0]['elapsed'] >= 0.01
+
+
+def test_quarantine_retry(tmp_path):
+    """Test that timed out files are parsed again with a retry budget."""
+    report = tmp_path / 'quarantine.json'
+    appclassdoc.generate_appclassdoc(
+        str(tmp_path / 'out'), False, True, _LARGEST_SOURCE, jobs=2,
+        time_budget=0.01, retry_budget=600, quarantine_report=str(report))
+    assert json.loads(report.read_text(encoding='utf-8')) == []
+    assert (tmp_path / 'out' / 'api' / 'PTNUI' / 'IBHandlers' /
+            'UniNavLandingPageHandler.html').exists()
+
+
+def test_batch_spill(tmp_path):
+    """Test that spilling classes in batches gives the same site."""
+    source_dir = _make_sources(tmp_path)
+    spill_dir = tmp_path / 'spill'
+    spill_dir.mkdir()
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'spilled'), False, True,
+                                     str(source_dir), batch_size=1,
+                                     spill_dir=str(spill_dir))
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'single'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(tmp_path / 'spilled'))
+    assert 'api/ZZ/UTIL/C.html' in pages
+    assert pages == _read_pages(str(tmp_path / 'single'))
+    assert not list(spill_dir.iterdir())
+
+
+def test_spool_indexes(tmp_path):
+    """Test that a spilled spool reads its indexes back from disk."""
+    source_dir = _make_sources(tmp_path)
+    appclassdoc.appclassdoc.AppClass.reset_indexes()
+    spool = appclassdoc.appclassdoc._ClassSpool(batch_size=2,
+                                                spill_dir=str(tmp_path))
+    appclassdoc.appclassdoc._parse_corpus(
+        spool, sorted(str(path) for path in source_dir.iterdir()), False)
+    # Only the batch not yet spilled is in memory
+    assert [app_class.name for app_class in spool.batch] == ['C']
+    assert list(spool.imports) == ['zz:util:c']
+    assert {key for key, _ in spool.type_usages} == {'zz:b'}
+    assert dict(spool.all_imports()) == {
+        'zz:a': ['ZZ:B'], 'zz:b': ['ZZ:A'], 'zz:util:c': ['ZZ:B']}
+    assert {key for key, _ in spool.all_type_usages()} == {'zz:a', 'zz:b'}
+    assert not spool.batch and not spool.imports
+    assert len(spool.batch_files) == len(spool.index_files) == 2
+    spool.close()
+
+
+def test_diff(tmp_path):
+    """Test the report of the API changes between two generations."""
+    source_dir = _make_sources(tmp_path)
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'old'), False, True,
+                                     str(source_dir))
+    (source_dir / 'ZZ.UTIL.C.ppl').unlink()
+    _write_sources(source_dir, {
+        'ZZ.B.ppl': _SOURCES['ZZ.B.ppl'].replace(
+            '   method Go(&a As ZZ:A);\n',
+            '   method Go(&a As ZZ:B);\n   method Stop();\n'),
+        'ZZ.D.ppl': 'class D\nend-class;\n',
+    })
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'new'), False, True,
+                                     str(source_dir))
+    report = appclassdoc.diff_appclassdoc(
+        str(tmp_path / 'old'), str(tmp_path / 'new'), str(tmp_path / 'diff'))
+    assert [item['class'] for item in report['added']] == ['ZZ:D']
+    assert [item['class'] for item in report['removed']] == ['ZZ:UTIL:C']
+    assert [item['class'] for item in report['changed']] == ['ZZ:B']
+    changed = report['changed'][0]
+    assert [member['key'] for member in changed['added']] == ['method:Stop']
+    assert [(member['key'], member['old'], member['new'])
+            for member in changed['changed']] == [
+        ('method:Go', 'method Go(&a as ZZ:A)', 'method Go(&a as ZZ:B)')]
+    assert not changed['removed']
+    assert (tmp_path / 'diff' / 'api-diff.html').exists()
+
+
+
+def test_used_by(tmp_path):
+    """Test the "Used by" sections of the class pages."""
+    source_dir = _make_sources(tmp_path)
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(tmp_path / 'out'))
+    assert ('<a href="../ZZ/B.html#mGo" title="ZZ:B">B.Go</a> '
+            '(as a parameter type)') in pages['api/ZZ/A.html']
+    assert ('<a href="../ZZ/UTIL/C.html#mUse" title="ZZ:UTIL:C">C.Use</a> '
+            '(as a parameter type)') in pages['api/ZZ/B.html']
+    assert 'Used by:' not in pages['api/ZZ/UTIL/C.html']
+
+
+
+def test_shard_merge(tmp_path):
+    """Test that merged shards give the same site as a single build."""
+    source_dir = _make_sources(tmp_path)
+    shards = []
+    for index in range(2):
+        shard_dir = str(tmp_path / f'shard{index}')
+        appclassdoc.shard_appclassdoc(shard_dir, False, str(source_dir),
+                                      shard_index=index, shard_count=2)
+        shards.append(shard_dir)
+        # The two packages fall in different shards
+        assert os.path.exists(os.path.join(shard_dir, 'batch-00000.pkl'))
+    appclassdoc.merge_appclassdoc(str(tmp_path / 'merged'), True, shards)
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'single'), False, True,
+                                     str(source_dir))
+    merged = _read_pages(str(tmp_path / 'merged'))
+    assert 'api/ZZ/A.html' in merged and 'api/ZZ/UTIL/C.html' in merged
+    assert merged == _read_pages(str(tmp_path / 'single'))
+    manifests = [
+        json.loads((tmp_path / name / 'build-manifest.json').read_text(
+            encoding='utf-8')) for name in ('merged', 'single')]
+    # Classes are listed in the order of their batches
+    for manifest in manifests:
+        manifest['files'].sort()
+    assert manifests[0] == manifests[1]
+
+
+def _get_text(page):
+    """Return the text of an HTML page, without any whitespace."""
+    return ''.join(html.fromstring(page).text_content().split())
+
+
+def test_minify_compress(tmp_path):
+    """Test minified pages and their precompressed copies."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = tmp_path / 'out'
+    appclassdoc.generate_appclassdoc(str(outputdir), False, True,
+                                     str(source_dir), minify=True,
+                                     compress=['gz'])
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'pretty'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(outputdir))
+    pretty_pages = _read_pages(str(tmp_path / 'pretty'))
+    assert pages.keys() == pretty_pages.keys()
+    for path, page in pages.items():
+        assert '\n<meta' in pretty_pages[path] and '\n<meta' not in page
+        assert _get_text(page) == _get_text(pretty_pages[path])
+    file_paths = [path for path in outputdir.rglob('*')
+                  if path.is_file() and path.suffix != '.gz']
+    compressed = {path.relative_to(outputdir).as_posix()
+                  for path in file_paths
+                  if path.with_name(f'{path.name}.gz').exists()}
+    assert {'index.html', 'api/ZZ/A.html', 'resources/stylesheet.css',
+            'resources/script.js'} <= compressed
+    assert 'resources/fonts/DejaVuSans-webfont.woff' not in compressed
+    for path in file_paths:
+        if path.relative_to(outputdir).as_posix() in compressed:
+            data = path.with_name(f'{path.name}.gz').read_bytes()
+            assert gzip.decompress(data) == path.read_bytes()
+
+
+def test_brotli(tmp_path):
+    """Test the brotli copies of the pages."""
+    brotli = pytest.importorskip('brotli')
+    source_dir = _make_sources(tmp_path)
+    outputdir = tmp_path / 'out'
+    appclassdoc.generate_appclassdoc(str(outputdir), False, True,
+                                     str(source_dir), compress=['br'])
+    page = outputdir / 'api' / 'ZZ' / 'A.html'
+    data = (outputdir / 'api' / 'ZZ' / 'A.html.br').read_bytes()
+    assert brotli.decompress(data) == page.read_bytes()
+
+
+def test_brotli_missing(tmp_path, monkeypatch):
+    """Test that brotli copies require the brotli package."""
+    monkeypatch.setattr(appclassdoc.appclassdoc, 'brotli', None)
+    with pytest.raises(ValueError, match='brotli'):
+        appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                         str(_make_sources(tmp_path)),
+                                         compress=['br'])
+
+
+
+def test_hash_resources(tmp_path):
+    """Test the content-hashed copies of the resources."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = tmp_path / 'out'
+    resources_dir = outputdir / 'resources'
+    appclassdoc.generate_appclassdoc(str(outputdir), False, True,
+                                     str(source_dir), hash_resources=True)
+    names = json.loads((outputdir / 'resource-manifest.json').read_text(
+        encoding='utf-8'))
+    font = 'fonts/DejaVuSans-webfont.woff'
+    data = (resources_dir / font).read_bytes()
+    assert names[font] == (f'fonts/DejaVuSans-webfont.'
+                           f'{hashlib.sha1(data).hexdigest()[:10]}.woff')
+    assert (resources_dir / names[font]).read_bytes() == data
+    stylesheet = (resources_dir / names['stylesheet.css']).read_text(
+        encoding='utf-8')
+    assert f"@import url('{names['fonts/dejavu.css']}');" in stylesheet
+    pages = _read_pages(str(outputdir))
+    pages['start-page.html'] = (outputdir / 'start-page.html').read_text(
+        encoding='utf-8')
+    for page in pages.values():
+        assert f'resources/{names["stylesheet.css"]}' in page
+        assert 'resources/stylesheet.css' not in page
+    # A customized stylesheet kept with do_deletes False gets a new name
+    with open(resources_dir / 'stylesheet.css', 'a', encoding='utf-8') as file:
+        file.write('body { color: black; }\n')
+    appclassdoc.generate_appclassdoc(str(outputdir), False, False,
+                                     str(source_dir), hash_resources=True)
+    new_names = json.loads((outputdir / 'resource-manifest.json').read_text(
+        encoding='utf-8'))
+    assert new_names['stylesheet.css'] != names['stylesheet.css']
+    assert new_names[font] == names[font]
+    assert not (resources_dir / names['stylesheet.css']).exists()
+    page = (outputdir / 'api' / 'ZZ' / 'A.html').read_text(encoding='utf-8')
+    assert f'resources/{new_names["stylesheet.css"]}' in page
+
+
+
+@pytest.mark.parametrize('writers, fsync', [(0, 'none'), (3, 'file'),
+                                            (2, 'end')])
+def test_writers(tmp_path, writers, fsync):
+    """Test that writing pages from threads gives the same site."""
+    source_dir = _make_sources(tmp_path)
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), writers=writers,
+                                     fsync=fsync)
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'single'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(tmp_path / 'out'))
+    assert 'api/ZZ/UTIL/C.html' in pages
+    assert pages == _read_pages(str(tmp_path / 'single'))
+
+
+def test_writer_error(tmp_path):
+    """Test that a failed write stops the build and its writer threads."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = tmp_path / 'out'
+    (outputdir / 'api' / 'ZZ' / 'A.html').mkdir(parents=True)
+    threads = threading.active_count()
+    with pytest.raises(IsADirectoryError):
+        appclassdoc.generate_appclassdoc(str(outputdir), False, False,
+                                         str(source_dir), writers=3)
+    assert threading.active_count() == threads
+
+
+
+def test_preview_server(tmp_path):
+    """Test the pages served by the preview server and its cache."""
+    source_dir = _make_sources(tmp_path)
+    _write_sources(source_dir, {'ZZ.UTIL.D.ppl': 'class D\nend-class;\n'})
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(tmp_path / 'out'))
+    model_dir = str(tmp_path / 'model')
+    model = appclassdoc.appclassdoc._PreviewModel(
+        False, [str(source_dir)], model_dir=model_dir, cache_size=3)
+    model.load()
+    server = appclassdoc.appclassdoc._PreviewServer(('localhost', 0), model)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://localhost:{server.server_port}/'
+    try:
+        paths = sorted(path for path in pages
+                       if not path.endswith('package-tree.html'))
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            served = list(executor.map(
+                lambda path: urlopen(url + path).read().decode('utf-8'),
+                paths * 4))
+        assert served == [pages[path] for path in paths * 4]
+        assert len(model.cache) == 3 and model.renders == 0
+        with pytest.raises(HTTPError, match='404'):
+            urlopen(url + 'api/ZZ/Missing.html')
+        # Only the pages affected by a change are dropped from the cache
+        for path in ('api/ZZ/UTIL/C.html', 'api/ZZ/UTIL/D.html',
+                     'packages.html'):
+            urlopen(url + path).read()
+        source = source_dir / 'ZZ.A.ppl'
+        source.write_text(_SOURCES['ZZ.A.ppl'].replace('Run', 'Walk'),
+                          encoding='utf-8')
+        os.utime(source, (0, 0))
+        assert model.refresh()
+        assert list(model.cache) == ['api/ZZ/UTIL/D.html']
+        page = urlopen(url + 'api/ZZ/A.html').read().decode('utf-8')
+        assert 'Walk' in page and 'Run' not in page
+    finally:
+        server.shutdown()
+        server.server_close()
+    # The model saved on refresh is loaded without parsing any file
+    model = appclassdoc.appclassdoc._PreviewModel(
+        False, [str(source_dir)], model_dir=model_dir)
+    model.load()
+    assert sorted(model.classes) == ['zz:a', 'zz:b', 'zz:util:c',
+                                     'zz:util:d']
+    assert 'Walk' in model.get_page('api/ZZ/A.html').decode('utf-8')
+
+
+
+def test_preview_concurrency(tmp_path, monkeypatch):
+    """Test that pages are rendered outside the lock, but not refreshed."""
+    source_dir = _make_sources(tmp_path)
+    model = appclassdoc.appclassdoc._PreviewModel(False, [str(source_dir)])
+    model.load()
+    assert model.get_page('api/ZZ/A.html')
+    render = model._render
+    started = threading.Event()
+    release = threading.Event()
+
+    def _render(path):
+        if path == 'api/ZZ/B.html':
+            started.set()
+            release.wait(10)
+        return render(path)
+
+    monkeypatch.setattr(model, '_render', _render)
+    thread = threading.Thread(target=model.get_page, args=['api/ZZ/B.html'])
+    thread.start()
+    assert started.wait(10)
+    # Served from the cache, and rendered, while B is being rendered
+    assert model.get_page('api/ZZ/A.html')
+    assert model.get_page('api/ZZ/UTIL/C.html')
+    source = source_dir / 'ZZ.B.ppl'
+    source.write_text(_SOURCES['ZZ.B.ppl'].replace('Go', 'Walk'),
+                      encoding='utf-8')
+    os.utime(source, (0, 0))
+    refresh = threading.Thread(target=model.refresh)
+    refresh.start()
+    refresh.join(0.5)
+    # The refresh waits for the page being rendered
+    assert refresh.is_alive() and 'Walk' not in str(model.classes['zz:b'])
+    release.set()
+    thread.join(10)
+    refresh.join(10)
+    assert not model.refreshing and not model.renders
+    assert 'api/ZZ/B.html' not in model.cache
+    assert 'Walk' in model.get_page('api/ZZ/B.html').decode('utf-8')
+
+def test_warm_up(tmp_path, caplog):
+    file_paths = sorted(appclassdoc.appclassdoc._process_input(
+        [str(_make_sources(tmp_path))]))
+    pool = appclassdoc.appclassdoc._ParsePool(2, False, warm_up=2)
+    results = list(pool.map(file_paths))
+    assert sorted(result.file_path for result in results) == \
+        sorted(file_paths)
+    assert not any(result.error for result in results)
+    assert pool.warm_up_files == tuple(file_paths[:2])
+    # A worker exceeding the time budget while warming up is not
+    # reported against the file it was handed, which is parsed again
+    pool = appclassdoc.appclassdoc._ParsePool(1, False, time_budget=0.01)
+    pool.warm_up_files = (_LARGEST_SOURCE,)
+    results = list(pool.map(file_paths[:1]))
+    assert [result.file_path for result in results] == file_paths[:1]
+    assert pool.warm_up_files == ()
+    assert 'while warming up' in caplog.text
+
+
+
+def test_database_queries(tmp_path):
+    """Test the queries of the model database."""
+    source_dir = _make_sources(tmp_path)
+    database = str(tmp_path / 'model.db')
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), database=database)
+    with appclassdoc.ModelDatabase(database) as db:
+        rows = db.find_classes(package='ZZ')
+        assert [row['fqcn'] for row in rows] == ['ZZ:A', 'ZZ:B']
+        rows = db.find_classes(implements='ZZ:A')
+        assert [row['fqcn'] for row in rows] == ['ZZ:B', 'ZZ:UTIL:C']
+        rows = db.find_classes(implements='ZZ:A', transitive=False)
+        assert [row['fqcn'] for row in rows] == ['ZZ:B']
+        rows = db.find_members(kind='method', package='ZZ')
+        assert [(row['fqcn'], row['name']) for row in rows] == [
+            ('ZZ:A', 'Run'), ('ZZ:B', 'Go')]
+        rows = db.find_members(kind='constructor', package='ZZ:UTIL')
+        assert [row['name'] for row in rows] == ['C']
+        rows = db.find_members(the_type='number')
+        assert [row['name'] for row in rows] == ['Run']
+        rows = db.find_members(package='ZZ', documented=True)
+        assert [row['name'] for row in rows] == ['Run']
+        rows = db.find_members(package='ZZ', documented=False)
+        assert [row['name'] for row in rows] == ['A', 'B', 'Go']
+
+
+def test_database_type_case(tmp_path):
+    """Test that type names differing only in case share a row."""
+    source_dir = tmp_path / 'src'
+    source_dir.mkdir()
+    _write_sources(source_dir, {
+        'ZZ.Foo.ppl': ('class Foo\n'
+                       '   method Bar(&a As String) Returns string;\n'
+                       'end-class;\n'),
+    })
+    database = str(tmp_path / 'model.db')
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), database=database)
+    with appclassdoc.ModelDatabase(database) as db:
+        assert len(db.query('SELECT * FROM types')) == 1
+        rows = db.find_members(the_type='STRING')
+        assert [(row['fqcn'], row['name']) for row in rows] == [
+            ('ZZ:Foo', 'Bar')]
+
+
+def test_changed_files(tmp_path):
+    """Test that an incremental build matches a full one."""
+    source_dir = _make_sources(tmp_path)
+    model_dir = str(tmp_path / 'model')
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), model_dir=model_dir)
+    changed = source_dir / 'ZZ.B.ppl'
+    changed.write_text(_SOURCES['ZZ.B.ppl'].replace('Go', 'Walk'),
+                       encoding='utf-8')
+    removed = source_dir / 'ZZ.UTIL.C.ppl'
+    removed.unlink()
+    appclassdoc.generate_appclassdoc(
+        str(tmp_path / 'out'), False, True, str(source_dir),
+        model_dir=model_dir, changed_files=[str(changed), str(removed)])
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'full'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(tmp_path / 'out'))
+    assert 'api/ZZ/UTIL/C.html' not in pages
+    assert 'Walk' in pages['api/ZZ/B.html']
+    assert pages == _read_pages(str(tmp_path / 'full'))
+
+
+def test_versions(tmp_path):
+    """Test that versions share their identical files through the store."""
+    dev_dir = _make_sources(tmp_path)
+    prod_dir = tmp_path / 'prod'
+    prod_dir.mkdir()
+    _write_sources(prod_dir, dict(
+        _SOURCES, **{'ZZ.B.ppl': _SOURCES['ZZ.B.ppl'].replace('Go', 'Walk')}))
+    outputdir = str(tmp_path / 'out')
+    appclassdoc.versions_appclassdoc(
+        outputdir, False, True, {'dev': [str(dev_dir)],
+                                 'prod': [str(prod_dir)]})
+    for name, source_dir in (('dev', dev_dir), ('prod', prod_dir)):
+        appclassdoc.generate_appclassdoc(str(tmp_path / name), False, True,
+                                         str(source_dir))
+        assert _read_pages(os.path.join(outputdir, name)) == \
+            _read_pages(str(tmp_path / name))
+    dev_path = os.path.join(outputdir, 'dev', 'api', 'ZZ', 'UTIL', 'C.html')
+    prod_path = os.path.join(outputdir, 'prod', 'api', 'ZZ', 'UTIL',
+                             'C.html')
+    assert os.path.samefile(dev_path, prod_path)
+    dev_path = os.path.join(outputdir, 'dev', 'api', 'ZZ', 'B.html')
+    prod_path = os.path.join(outputdir, 'prod', 'api', 'ZZ', 'B.html')
+    assert not os.path.samefile(dev_path, prod_path)
+
+    def get_objects():
+        store_dir = os.path.join(outputdir, '.store')
+        return {os.path.join(base_dir, file_name)
+                for base_dir, _, file_names in os.walk(store_dir)
+                for file_name in file_names}
+
+    objects = get_objects()
+    # Objects only linked from a version no longer built are deleted
+    appclassdoc.versions_appclassdoc(outputdir, False, True,
+                                     {'dev': [str(dev_dir)]})
+    assert get_objects() == objects
+    for base_dir, _, file_names in os.walk(os.path.join(outputdir, 'prod')):
+        for file_name in file_names:
+            os.remove(os.path.join(base_dir, file_name))
+    appclassdoc.versions_appclassdoc(outputdir, False, True,
+                                     {'dev': [str(dev_dir)]})
+    remaining = get_objects()
+    assert remaining < objects
+    assert all(os.stat(path).st_nlink > 1 for path in remaining)
+
+
+def test_content_store_release(tmp_path):
+    """Test that threads linking a released object fail."""
+    store = appclassdoc.appclassdoc._ContentStore(str(tmp_path / 'store'))
+    assert store.reserve('ab12', ['gz']) == (True, ['gz'])
+    assert store.reserve('ab12', ['gz', 'br']) == (False, ['br'])
+    store.put('ab12', b'data')
+    store.release('ab12', formats=['gz', 'br'])
+    assert store.link('ab12', str(tmp_path / 'a.html')) == 4
+    assert store.link('ab12', str(tmp_path / 'b.html')) == 4
+    assert os.path.samefile(str(tmp_path / 'a.html'),
+                            str(tmp_path / 'b.html'))
+    with pytest.raises(OSError):
+        store.link('ab12', str(tmp_path / 'a.html.gz'), fmt='gz')
+
+
+def test_stubs(tmp_path):
+    """Test that a stub parses back to the class it was made from."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = tmp_path / 'out'
+    appclassdoc.generate_appclassdoc(str(outputdir), False, True,
+                                     str(source_dir),
+                                     formats=['html', 'stubs'])
+    assert sorted(os.listdir(str(outputdir / 'stubs'))) == sorted(_SOURCES)
+    stub = (outputdir / 'stubs' / 'ZZ.A.ppl').read_text(encoding='utf-8')
+    assert 'method Run(&n as number) Returns number;' in stub
+    assert 'For ' not in stub
+    for file_name in _SOURCES:
+        app_class = appclassdoc.appclassdoc._process_file(
+            str(source_dir / file_name), False)[0]
+        stub_class = appclassdoc.appclassdoc._process_file(
+            str(outputdir / 'stubs' / file_name), False)[0]
+        assert str(stub_class) == str(app_class)
+        assert stub_class.get_stub() == app_class.get_stub()
+    # The declaration is the same as in the class header
+    app_class.is_abstract = True
+    declaration = str(app_class).splitlines()[2]
+    assert declaration.startswith('abstract class C')
+    assert declaration in app_class.get_stub().splitlines()
+
+
+def test_trace(tmp_path):
+    """Test the trace of the visitor."""
+    source_dir = _make_sources(tmp_path)
+    trace = tmp_path / 'trace.jsonl'
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), trace=str(trace))
+    with open(str(trace), encoding='utf-8') as file:
+        records = [json.loads(line) for line in file]
+    assert {os.path.basename(r['file']) for r in records} == set(_SOURCES)
+    roots = [r for r in records if r['depth'] == 0]
+    assert [r['rule'] for r in roots] == ['AppClassProgram'] * len(_SOURCES)
+    assert {'file', 'rule', 'depth', 'line', 'column', 'elapsed'} == \
+        set(records[0])
+    # Nodes are listed as entered, under the last root listed
+    for record, previous in zip(records[1:], records):
+        assert record['depth'] <= previous['depth'] + 1
+    # The visitor used without tracing records nothing
+    visitor_class = appclassdoc.appclassdoc.AppClassDocVisitor
+    for name in dir(visitor_class):
+        qualname = getattr(getattr(visitor_class, name), '__qualname__', '')
+        assert '_traced' not in qualname
+
+
+def test_dependency_graph(tmp_path):
+    """Test the cycles and impact analysis of the dependency graph."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = str(tmp_path / 'out')
+    appclassdoc.generate_appclassdoc(outputdir, False, True,
+                                     str(source_dir))
+    graph = appclassdoc.DependencyGraph.load(outputdir)
+    assert graph.get_components() == [['ZZ:A', 'ZZ:B'], ['ZZ:UTIL:C']]
+    assert graph.get_cycles() == [['ZZ:A', 'ZZ:B']]
+    assert appclassdoc.impact_appclassdoc(outputdir, ['ZZ:A']) == [
+        ('ZZ:B', 1), ('ZZ:UTIL:C', 2)]
+    assert appclassdoc.impact_appclassdoc(outputdir, ['ZZ:UTIL:C']) == []
+    assert appclassdoc.impact_appclassdoc(outputdir, ['zz:a'],
+                                          max_depth=1) == [('ZZ:B', 1)]
+
+
+def test_tree_pages(tmp_path):
+    """Test the class hierarchy pages."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = str(tmp_path / 'out')
+    appclassdoc.generate_appclassdoc(outputdir, False, True,
+                                     str(source_dir))
+
+    def get_tree(path):
+        root = html.parse(os.path.join(outputdir, path)).getroot()
+        items = root.xpath('//li[@type="circle"]')
+        return [(len(item.xpath('ancestor::li')),
+                 item.text_content().split()[0]) for item in items]
+
+    assert get_tree('overview-tree.html') == [
+        (0, 'ZZ:A'), (1, 'ZZ:B'), (2, 'ZZ:UTIL:C')]
+    # Package trees hold the classes of the package and their ancestors
+    assert get_tree('api/ZZ/package-tree.html') == [
+        (0, 'ZZ:A'), (1, 'ZZ:B')]
+    assert get_tree('api/ZZ/UTIL/package-tree.html') == [
+        (0, 'ZZ:A'), (1, 'ZZ:B'), (2, 'ZZ:UTIL:C')]
+    root = html.parse(os.path.join(outputdir, 'api', 'ZZ', 'UTIL',
+                                   'package-tree.html')).getroot()
+    for link in root.xpath('//li[@type="circle"]/a/@href'):
+        assert os.path.isfile(os.path.join(outputdir, 'api', 'ZZ', 'UTIL',
+                                           link))
+
+
+def test_package_scope(tmp_path):
+    """Test that a package-scoped build only writes its packages."""
+    source_dir = _make_sources(tmp_path)
+    model_dir = str(tmp_path / 'model')
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), model_dir=model_dir)
+    _write_sources(source_dir, {
+        'ZZ.UTIL.E.ppl': 'import ZZ:A;\n\nclass E extends ZZ:A\nend-class;\n',
+    })
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), model_dir=model_dir,
+                                     packages=['ZZ:UTIL'])
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'full'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(tmp_path / 'out'))
+    full_pages = _read_pages(str(tmp_path / 'full'))
+    assert 'api/ZZ/UTIL/E.html' in pages
+    assert pages.keys() == full_pages.keys()
+    for path, page in pages.items():
+        if path.startswith('api/ZZ/UTIL/'):
+            assert page == full_pages[path]
+        else:
+            # Pages out of scope keep their old cross-references
+            assert 'UTIL/E.html' not in page
+    graph = appclassdoc.DependencyGraph.load(str(tmp_path / 'out'))
+    assert graph.get_importers('ZZ:A') == ['ZZ:B', 'ZZ:UTIL:E']
+
+
+def test_source_pages(tmp_path):
+    """Test the highlighted source pages and the links to them."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = str(tmp_path / 'out')
+    appclassdoc.generate_appclassdoc(outputdir, False, True,
+                                     str(source_dir),
+                                     formats=['html', 'source'])
+    class_dir = os.path.join(outputdir, 'api', 'ZZ')
+    page = html.parse(os.path.join(class_dir, 'A.html')).getroot()
+    links = [link for link in page.xpath('//a/@href')
+             if 'src-html' in link]
+    assert links
+    for link in links:
+        path, _, anchor = link.partition('#')
+        source = html.parse(os.path.join(class_dir, path)).getroot()
+        if anchor:
+            assert source.xpath(f'//a[@name="{anchor}"]')
+    source = html.parse(os.path.join(outputdir, 'src-html', 'ZZ',
+                                     'A.html')).getroot()
+    lines = (source_dir / 'ZZ.A.ppl').read_text(
+        encoding='utf-8').splitlines()
+    assert len(source.xpath('//a[starts-with(@name, "line.")]')) == \
+        len(lines)
+    assert source.xpath('//span[@class="keyword"]/text()')[:2] == \
+        ['import', 'class']
+    # The implementations are linked by the line they start at
+    line = int(links[-1].rpartition('.')[2])
+    assert lines[line - 1] == 'method Run'
+    # No source pages unless requested
+    appclassdoc.generate_appclassdoc(outputdir, False, True,
+                                     str(source_dir))
+    page = html.parse(os.path.join(class_dir, 'A.html')).getroot()
+    assert not [link for link in page.xpath('//a/@href')
+                if 'src-html' in link]
+
+
+def test_check(tmp_path):
+    """Test the link check of a site and the pruning of orphans."""
+    source_dir = _make_sources(tmp_path)
+    outputdir = tmp_path / 'out'
+    model_dir = str(tmp_path / 'model')
+    appclassdoc.generate_appclassdoc(str(outputdir), False, True,
+                                     str(source_dir), model_dir=model_dir,
+                                     compress=['gz'],
+                                     formats=['html', 'source'])
+    with open(str(outputdir / 'build-manifest.json'),
+              encoding='utf-8') as file:
+        files = json.load(file)['files']
+    assert 'api/ZZ/A.html.gz' in files
+    assert 'src-html/ZZ/UTIL/C.html' in files
+    report = appclassdoc.check_appclassdoc(str(outputdir), [model_dir])
+    assert report['pages'] and report['links']
+    assert not report['broken'] and not report['missing']
+    assert not report['orphans']
+    old = outputdir / 'api' / 'ZZ' / 'Old.html'
+    old.write_text('', encoding='utf-8')
+    (outputdir / 'api' / 'ZZ' / 'UTIL' / 'C.html').unlink()
+    # Orphans are kept while a build is writing a new manifest
+    in_progress = outputdir / 'build-manifest.json.tmp'
+    in_progress.write_text('', encoding='utf-8')
+    report = appclassdoc.check_appclassdoc(str(outputdir), [model_dir],
+                                           prune=True)
+    assert report['missing'] == ['api/ZZ/UTIL/C.html']
+    assert report['broken']
+    assert report['orphans'] == report['kept'] == ['api/ZZ/Old.html']
+    assert old.exists()
+    # Orphans are found by the manifest's file list, whatever their age
+    in_progress.unlink()
+    os.utime(str(old), (2 ** 32, 2 ** 32))
+    report = appclassdoc.check_appclassdoc(str(outputdir), [model_dir],
+                                           prune=True)
+    assert report['orphans'] == ['api/ZZ/Old.html']
+    assert not report['kept']
+    assert not old.exists()
+
+
+def test_archive_input(tmp_path):
+    """Test that archived sources give the same site as plain ones."""
+    source_dir = _make_sources(tmp_path)
+    archive = tmp_path / 'sources.zip'
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        for name, text in _SOURCES.items():
+            zip_file.writestr(f'src/{name}', text)
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'zip'), False, True,
+                                     str(archive))
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'dir'), False, True,
+                                     str(source_dir))
+    pages = _read_pages(str(tmp_path / 'zip'))
+    assert 'api/ZZ/UTIL/C.html' in pages
+    assert pages == _read_pages(str(tmp_path / 'dir'))
+
+
+def test_metrics(tmp_path):
+    """Test the metrics computed for the implementations."""
+    source_dir = _make_sources(tmp_path)
+    database = str(tmp_path / 'model.db')
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), database=database,
+                                     metrics=True)
+    with appclassdoc.ModelDatabase(database) as db:
+        rows = db.query(
+            'SELECT m.name, x.loc, x.statements, x.complexity, x.nesting, '
+            'x.throws FROM metrics x JOIN members m ON m.id = x.member_id '
+            "WHERE m.name IN ('Run', 'Go')")
+        assert sorted(tuple(row) for row in rows) == [
+            ('Go', 2, 0, 1, 0, 0), ('Run', 12, 7, 4, 2, 1)]
+
+
+def test_diagnostics_cap(tmp_path):
+    """Test that the syntax errors reported per file are capped."""
+    source_dir = _make_sources(tmp_path, {
+        'ZZ.Broken.ppl': ('class Broken\nend-class;\n\n'
+                          + 'method Foo\n   &x = ;\nend-method;\n' * 30),
+    })
+    report = tmp_path / 'diagnostics.json'
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir),
+                                     diagnostics_report=str(report))
+    items = json.loads(report.read_text(encoding='utf-8'))
+    assert [item['aborted'] for item in items] == [True]
+    assert (len(items[0]['errors'])
+            == appclassdoc.appclassdoc._max_syntax_errors)
+
+
+def test_interning(tmp_path):
+    """Test that packages and types are shared between classes."""
+    source_dir = _make_sources(tmp_path)
+    module = appclassdoc.appclassdoc
+    module.AppClass.reset_indexes()
+    a, b, c = [module._process_file(str(source_dir / file_name), False)[0]
+               for file_name in sorted(_SOURCES)]
+    assert a.package is b.package
+    assert c.superclasses[0].package is b.package
+    assert module.Type('ZZ:B') is module.Type('ZZ:B')
+    assert module.Type('ZZ:B', 1) is not module.Type('ZZ:B')
+    assert a.package.fqcn('A') is a.package.fqcn('A')
+    # Unpickled classes refer to the shared instances again
+    copy = pickle.loads(pickle.dumps(c))
+    assert copy.package is c.package
+    assert copy.superclasses[0].package is b.package
+    # Resetting the indexes empties the registries
+    module.AppClass.reset_indexes()
+    assert module.Package(('ZZ',)) == a.package
+    assert module.Package(('ZZ',)) is not a.package
+
+
+def test_profile(tmp_path):
+    """Test the profiles of a build, merged and phase by phase."""
+    source_dir = _make_sources(tmp_path)
+    profile_dir = tmp_path / 'profile'
+    appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                     str(source_dir), jobs=2,
+                                     profile_dir=str(profile_dir))
+    names = os.listdir(str(profile_dir))
+    assert 'appclassdoc.prof' in names
+    assert 'appclassdoc.collapsed' in names
+    assert 'render.prof' in names
+    assert any(name.startswith('worker-') for name in names)
+    assert not any(name.endswith('.tmp') for name in names)
+    stats = pstats.Stats(str(profile_dir / 'appclassdoc.prof'))
+    assert any(function == '_process_file'
+               for _, _, function in stats.stats)
+    with open(str(profile_dir / 'appclassdoc.collapsed'),
+              encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    assert lines and all(line.rpartition(' ')[2].isdigit()
+                         for line in lines)
+    # A directory holding other files is refused, and left untouched
+    (profile_dir / 'notes.txt').write_text('', encoding='utf-8')
+    with pytest.raises(ValueError):
+        appclassdoc.generate_appclassdoc(str(tmp_path / 'out'), False, True,
+                                         str(source_dir),
+                                         profile_dir=str(profile_dir))
+    assert sorted(os.listdir(str(profile_dir))) == sorted(
+        names + ['notes.txt'])